@@ -1,3 +0,0 @@
-#!/bin/sh
-tmux source-file "/home/user/Projects/CommandWave/commandwave_theme.tmux.conf"
-tmux attach-session -t commandwave-main
@@ -0,0 +1,96 @@
+"""
+benchmarks/attach_latency.py
+Time from starting a tmux attach to the themed status line being drawn.
+
+Attaches to a session of a private tmux server in a pseudo-terminal, the way
+ttyd does for each browser connection, and times until the status line of
+commandwave_theme.tmux.conf appears. Two attach commands are compared: the
+apply_theme script ttyd used to run (source the theme, then attach) and the
+plain attach-session it runs now that the theme is loaded once per server.
+Needs tmux on PATH.
+
+Usage: python benchmarks/attach_latency.py [--attaches N]
+"""
+
+import argparse
+import os
+import pty
+import select
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+THEME_PATH = os.path.join(ROOT, 'commandwave_theme.tmux.conf')
+# Own server socket, so no running tmux server is touched
+SOCKET_NAME = 'commandwave-attach-check'
+SESSION = 'commandwave-attach'
+# Drawn by the theme's status-left once the client is attached
+STATUS_MARKER = b'Session:'
+
+def tmux(*args):
+    """Run a command against the private tmux server."""
+    return subprocess.run(['tmux', '-L', SOCKET_NAME, *args], capture_output=True)
+
+def attach_once(command):
+    """Seconds from starting command in a pty until the status line is drawn, or None if it never is."""
+    started = time.perf_counter()
+    pid, fd = pty.fork()
+    if pid == 0:
+        os.environ['TERM'] = 'xterm-256color'
+        os.environ.pop('TMUX', None)
+        os.execvp(command[0], command)
+    output = b''
+    elapsed = None
+    try:
+        while STATUS_MARKER not in output:
+            ready, _, _ = select.select([fd], [], [], 5)
+            if not ready:
+                break
+            output += os.read(fd, 65536)
+        else:
+            elapsed = time.perf_counter() - started
+    except OSError:
+        pass
+    tmux('detach-client', '-s', SESSION)
+    os.waitpid(pid, 0)
+    os.close(fd)
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[1])
+    parser.add_argument('--attaches', type=int, default=40, help='attaches per command and run')
+    parser.add_argument('--runs', type=int, default=2)
+    args = parser.parse_args()
+
+    tmux('-f', THEME_PATH, 'new-session', '-d', '-s', SESSION, '-x', '120', '-y', '30')
+    with tempfile.NamedTemporaryFile('w', suffix='.sh', delete=False) as script:
+        # What start_ttyd_process used to generate as apply_theme_<port>.sh
+        script.write(f'#!/bin/sh\n'
+                     f'tmux -L {SOCKET_NAME} source-file "{THEME_PATH}"\n'
+                     f'tmux -L {SOCKET_NAME} attach-session -t {SESSION}\n')
+    os.chmod(script.name, 0o755)
+    commands = [('theme script', [script.name]),
+                ('plain attach', ['tmux', '-L', SOCKET_NAME, 'attach-session', '-t', SESSION])]
+    failed = 0
+    try:
+        for _ in range(args.runs):
+            for label, command in commands:
+                samples = [attach_once(command) for _ in range(args.attaches)]
+                failed += samples.count(None)
+                samples = sorted(sample for sample in samples if sample is not None)
+                if samples:
+                    print(f"{label + ':':<15}median {statistics.median(samples) * 1000:.1f}ms, "
+                          f"p90 {samples[int(len(samples) * 0.9) - 1] * 1000:.1f}ms")
+    finally:
+        tmux('kill-server')
+        os.unlink(script.name)
+
+    if failed:
+        print(f"FAILED: the status line was not drawn in {failed} attaches")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+benchmarks/bulk_create.py
+Time to create 20 terminals in one bulk request, against one terminal and 20 single creates.
+
+Times POST /api/terminals/new for one terminal, POST /api/terminals/bulk for
+20 names, and 20 POST /api/terminals/new requests one after another, the
+way the UI created a workspace before, deleting the terminals after each
+round. Start the server with --terminal-pool-size 0 so every terminal is
+cold spawned rather than taken from the warm pool.
+
+Usage: python benchmarks/bulk_create.py [--url URL] [--count N] [--rounds N]
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+import urllib.error
+import urllib.request
+
+def call(url, method='GET', body=None):
+    """Send one API request and return the decoded JSON reply, error replies included."""
+    data = json.dumps(body).encode('utf-8') if body is not None else None
+    request = urllib.request.Request(url, data=data, method=method,
+                                     headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(request, timeout=120) as response:
+            return json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return json.loads(e.read())
+
+def create_one(base, count):
+    return [call(f'{base}/api/terminals/new', 'POST', {'name': 'benchmark'})]
+
+def create_bulk(base, count):
+    reply = call(f'{base}/api/terminals/bulk', 'POST', {'names': [f'benchmark-{index}' for index in range(count)]})
+    return reply.get('terminals', [reply])
+
+def create_each(base, count):
+    return [call(f'{base}/api/terminals/new', 'POST', {'name': f'benchmark-{index}'}) for index in range(count)]
+
+def measure(base, create, count, rounds):
+    """Median seconds create takes, and the number of terminals that failed in any round."""
+    samples = []
+    failed = 0
+    for _ in range(rounds):
+        started = time.perf_counter()
+        results = create(base, count)
+        samples.append(time.perf_counter() - started)
+        failed += sum(1 for result in results if not result.get('success'))
+        for result in results:
+            if result.get('success'):
+                call(f"{base}/api/terminals/{result['id']}", 'DELETE')
+    return statistics.median(samples), failed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[1])
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--count', type=int, default=20)
+    parser.add_argument('--rounds', type=int, default=3)
+    args = parser.parse_args()
+    base = args.url.rstrip('/')
+
+    one = measure(base, create_one, 1, args.rounds)
+    bulk = measure(base, create_bulk, args.count, args.rounds)
+    each = measure(base, create_each, args.count, args.rounds)
+
+    print(f"one terminal:  {one[0]:.2f}s")
+    print(f"{f'bulk of {args.count}:':<15}{bulk[0]:.2f}s ({bulk[0] / one[0]:.1f}x one)")
+    print(f"{f'{args.count} singles:':<15}{each[0]:.2f}s ({each[0] / one[0]:.1f}x one)")
+    failures = one[1] + bulk[1] + each[1]
+    if failures:
+        print(f"FAILED: {failures} terminals could not be created")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+benchmarks/command_fanout.py
+Latency of sending one command to N terminals of a running CommandWave server.
+
+For N = 1, 10 and 100 the same no-op command is sent to N terminals, once as
+a single /api/terminals/send-batch request and once as N /send-command
+requests, the way the frontend fanned out before. Each run is timed until the
+server has accepted every command and until tmux has been handed all of
+them, by polling each terminal's /commands status. Creates the terminals it
+needs and deletes them at the end; start the server with --lazy-ttyd so 100
+terminals cost only their tmux sessions.
+
+Usage: python benchmarks/command_fanout.py [--url URL] [--sizes 1,10,100] [--rounds N]
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+import urllib.request
+
+# Typed into every terminal; does nothing in any POSIX shell
+COMMAND = ':'
+
+def call(url, method='GET', body=None):
+    """Send one API request and return the decoded JSON reply."""
+    data = json.dumps(body).encode('utf-8') if body is not None else None
+    request = urllib.request.Request(url, data=data, method=method,
+                                     headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request, timeout=60) as response:
+        return json.loads(response.read())
+
+def wait_delivered(base, expected):
+    """Poll until every terminal has delivered up to its expected sequence number."""
+    pending = dict(expected)
+    while pending:
+        for terminal_id, seq in list(pending.items()):
+            status = call(f'{base}/api/terminals/{terminal_id}/commands')['commands']
+            if status['delivered_seq'] >= seq:
+                del pending[terminal_id]
+
+def send_batch(base, terminals):
+    """One send-batch request; returns the sequence number queued per terminal."""
+    reply = call(f'{base}/api/terminals/send-batch', 'POST', {'terminals': terminals, 'command': COMMAND})
+    if not reply.get('success'):
+        raise RuntimeError(f"send-batch failed: {reply}")
+    return {result['terminal_id']: result['seqs'][-1] for result in reply['results']}
+
+def send_each(base, terminals):
+    """One send-command request per terminal; returns the sequence number queued per terminal."""
+    expected = {}
+    for terminal_id in terminals:
+        reply = call(f'{base}/api/terminals/send-command', 'POST', {'port': terminal_id, 'command': COMMAND})
+        if not reply.get('success'):
+            raise RuntimeError(f"send-command failed: {reply}")
+        expected[terminal_id] = reply['seq']
+    return expected
+
+def measure(base, send, terminals, rounds):
+    """Median seconds until accepted and until delivered over the given rounds."""
+    accepted, delivered = [], []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        expected = send(base, terminals)
+        accepted.append(time.perf_counter() - started)
+        wait_delivered(base, expected)
+        delivered.append(time.perf_counter() - started)
+    return statistics.median(accepted), statistics.median(delivered)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[1])
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--sizes', default='1,10,100', help='comma separated terminal counts')
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+    base = args.url.rstrip('/')
+    sizes = [int(size) for size in args.sizes.split(',')]
+
+    created = []
+    try:
+        for _ in range(max(sizes)):
+            reply = call(f'{base}/api/terminals/new', 'POST', {'name': 'benchmark'})
+            if not reply.get('success'):
+                print(f"FAILED: could not create a terminal: {reply.get('error')}")
+                sys.exit(1)
+            created.append(reply['id'])
+
+        print(f"{'terminals':<11}{'batch accepted':>16}{'delivered':>12}{'each accepted':>16}{'delivered':>12}")
+        for size in sizes:
+            terminals = created[:size]
+            batch = measure(base, send_batch, terminals, args.rounds)
+            each = measure(base, send_each, terminals, args.rounds)
+            print(f"{size:<11}{batch[0] * 1000:>14.1f}ms{batch[1] * 1000:>10.1f}ms"
+                  f"{each[0] * 1000:>14.1f}ms{each[1] * 1000:>10.1f}ms")
+    finally:
+        for terminal_id in created:
+            call(f'{base}/api/terminals/{terminal_id}', 'DELETE')
+
+if __name__ == '__main__':
+    main()
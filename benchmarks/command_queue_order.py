@@ -0,0 +1,158 @@
+"""
+benchmarks/command_queue_order.py
+Delivery order of the per-terminal command queue under concurrent enqueueing.
+
+First checks that repeated commands (y, Enter, Enter) are queued separately
+while a terminal's queue has room. Then several threads per terminal enqueue
+numbered commands, some of them repeats of the one before, retrying when the
+queue is full, while a fake tmux connection records what the dispatcher
+writes. The script checks that every accepted command was delivered exactly
+once, that each terminal's commands were written in sequence-number order,
+that each thread's commands kept the order it enqueued them in, and that only
+repeats were coalesced. It exits with status 1 if any check fails.
+
+Usage: python benchmarks/command_queue_order.py [--terminals N] [--threads N] [--commands N]
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import Future
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.command_queue import CommandQueue, QueueFull
+
+class FakeTmux:
+    """Records the commands written, as the tmux control connection would run them."""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.written = []
+
+    def submit_many(self, commands):
+        # One pipelined write at a time, like the control connection
+        time.sleep(self.delay)
+        pending = []
+        for args in commands:
+            self.written.append(list(args))
+            reply = Future()
+            reply.set_result([])
+            pending.append(reply)
+        return pending
+
+def command_key(number):
+    """Every third command repeats the one before it."""
+    return number - 1 if number % 3 == 2 else number
+
+def producer(queue, terminal_id, thread_id, count, sent):
+    """Enqueue count commands, retrying while the queue is full, and record their sequence numbers."""
+    for number in range(count):
+        args = ['send-keys', '-t', terminal_id, f'{thread_id}:{command_key(number)}', 'Enter']
+        while True:
+            try:
+                seq = queue.enqueue(terminal_id, args)
+                break
+            except QueueFull:
+                time.sleep(0.001)
+        sent.append((thread_id, number, seq))
+
+def check_repeats():
+    """Identical commands queued while the dispatcher is busy must each be delivered."""
+    busy = threading.Event()
+    release = threading.Event()
+    written = []
+
+    def submit_many(commands):
+        busy.set()
+        release.wait(5)
+        written.extend(list(args) for args in commands)
+        replies = [Future() for _ in commands]
+        for reply in replies:
+            reply.set_result([])
+        return replies
+
+    queue = CommandQueue(submit_many, limit=8)
+    queue.enqueue('term', ['send-keys', '-t', 'term', 'y'])
+    busy.wait(5)
+    seqs = [queue.enqueue('term', ['send-keys', '-t', 'term', 'Enter']) for _ in range(2)]
+    release.set()
+    deadline = time.time() + 5
+    while queue.status('term')['delivered_seq'] < 3 and time.time() < deadline:
+        time.sleep(0.01)
+    queue.stop()
+    if seqs != [2, 3] or [args[-1] for args in written] != ['y', 'Enter', 'Enter']:
+        return [f"repeated commands below the limit were merged: seqs {seqs}, written {written}"]
+    return []
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[1])
+    parser.add_argument('--terminals', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=8, help='producer threads per terminal')
+    parser.add_argument('--commands', type=int, default=2000, help='commands per producer thread')
+    parser.add_argument('--limit', type=int, default=64)
+    parser.add_argument('--delay', type=float, default=0.0005, help='seconds each pipelined write takes')
+    args = parser.parse_args()
+
+    failures = check_repeats()
+
+    tmux = FakeTmux(args.delay)
+    delivered = defaultdict(list)
+    queue = CommandQueue(tmux.submit_many, limit=args.limit,
+                         on_result=lambda terminal_id, seq, error: delivered[terminal_id].append(seq))
+    sent = defaultdict(list)
+    threads = [threading.Thread(target=producer, args=(queue, f'term-{terminal}', thread_id,
+                                                       args.commands, sent[f'term-{terminal}']))
+               for terminal in range(args.terminals) for thread_id in range(args.threads)]
+
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    deadline = time.time() + 60
+    while any(queue.status(terminal_id)['delivered_seq'] < queue.status(terminal_id)['last_seq']
+              for terminal_id in sent) and time.time() < deadline:
+        time.sleep(0.01)
+    elapsed = time.perf_counter() - started
+    queue.stop()
+
+    written = defaultdict(list)
+    for command in tmux.written:
+        written[command[2]].append(command[3])
+    for terminal_id, entries in sent.items():
+        accepted = sorted({seq for _, _, seq in entries})
+        seqs = delivered[terminal_id]
+        if seqs != accepted:
+            failures.append(f"{terminal_id}: {len(accepted)} commands accepted, {len(seqs)} delivered"
+                            if len(seqs) != len(accepted) else
+                            f"{terminal_id}: commands delivered out of sequence-number order")
+        # Each thread's commands, in the order the terminal received them
+        by_thread = defaultdict(list)
+        for command in written[terminal_id]:
+            thread_id, key = command.split(':')
+            by_thread[int(thread_id)].append(int(key))
+        for thread_id in range(args.threads):
+            own = [(number, seq) for thread, number, seq in entries if thread == thread_id]
+            coalesced = {number for (_, previous), (number, seq) in zip(own, own[1:]) if seq == previous}
+            if any(command_key(number) == number for number in coalesced):
+                failures.append(f"{terminal_id}: a command of thread {thread_id} that was not a repeat was coalesced")
+            expected = [command_key(number) for number, _ in own if number not in coalesced]
+            if by_thread[thread_id] != expected:
+                failures.append(f"{terminal_id}: commands of thread {thread_id} reordered or lost")
+
+    total = sum(len(seqs) for seqs in delivered.values())
+    print(f"terminals:     {args.terminals}, {args.threads} producer threads each, queue limit {args.limit}")
+    print(f"delivered:     {total} commands in {elapsed:.2f}s ({total / elapsed:.0f}/s)")
+    print(f"coalesced:     {queue.stats()['coalesced']} repeats while the queue was full")
+    for failure in failures:
+        print(f"FAILED: {failure}")
+    if failures:
+        sys.exit(1)
+    print("order:         ok")
+
+if __name__ == '__main__':
+    main()
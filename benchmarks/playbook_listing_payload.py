@@ -0,0 +1,106 @@
+"""
+benchmarks/playbook_listing_payload.py
+Payload size and serialization time of the playbook listing at 1k and 10k playbooks.
+
+Builds in-memory playbooks shaped like those the routes keep (about 3KB of
+markdown each), then serializes the old listing, every playbook with its
+content, and pages of summaries from paginate_playbooks: the first page by
+id, the first page of the most recently updated, and a prefix-filtered
+page. Finally walks every page of a sorted listing, checking that each
+playbook is listed exactly once; the script exits with status 1 if not.
+
+Usage: python benchmarks/playbook_listing_payload.py [--sizes 1000,10000]
+"""
+
+import argparse
+import itertools
+import json
+import os
+import random
+import statistics
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.playbook_utils import content_hash, paginate_playbooks
+
+def make_playbooks(count, rng):
+    """Playbooks by id, spread over 20 directories, with sizes and hashes as the routes store them."""
+    words = [''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(2, 10))) for _ in range(5000)]
+    weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(words))))
+    now = time.time()
+    playbooks = {}
+    for number in range(count):
+        lines = [f'# Playbook {number}']
+        for _ in range(6):
+            lines.append(f"## {' '.join(rng.choices(words, cum_weights=weights, k=3))}")
+            lines.extend(' '.join(rng.choices(words, cum_weights=weights, k=12)) for _ in range(5))
+        content = '\n'.join(lines)
+        playbook_id = f'dir{number % 20}/playbook_{number:05d}.md'
+        playbooks[playbook_id] = {
+            'id': playbook_id,
+            'filename': playbook_id,
+            'title': f'Playbook {number}',
+            'description': f'Steps for target {number}',
+            'content': content,
+            'size': len(content.encode('utf-8')),
+            'hash': content_hash(content),
+            'created_at': now,
+            'updated_at': now - rng.random() * 1e5
+        }
+    return playbooks
+
+def serialize(build, repeat):
+    """Median milliseconds to build and serialize a response body, and the body's size in bytes."""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = json.dumps({'success': True, **build()})
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1000, len(body.encode('utf-8'))
+
+def walk(playbooks, sort, descending):
+    """Ids of every playbook, page by page."""
+    seen = []
+    cursor = None
+    while True:
+        page = paginate_playbooks(playbooks, sort=sort, descending=descending, cursor=cursor, limit=500)
+        seen.extend(summary['id'] for summary in page['playbooks'])
+        cursor = page['next_cursor']
+        if not cursor:
+            return seen
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[1])
+    parser.add_argument('--sizes', default='1000,10000', help='comma separated playbook counts')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    failures = []
+    for size in (int(size) for size in args.sizes.split(',')):
+        playbooks = make_playbooks(size, rng)
+        runs = [
+            ('full list', lambda: {'playbooks': list(playbooks.values())}),
+            ('page by id', lambda: paginate_playbooks(playbooks)),
+            ('page by date', lambda: paginate_playbooks(playbooks, sort='updated_at', descending=True)),
+            ('prefix page', lambda: paginate_playbooks(playbooks, prefix='dir3/', limit=50)),
+        ]
+        print(f"{size} playbooks:")
+        for label, build in runs:
+            ms, size_bytes = serialize(build, args.repeat)
+            print(f"  {label + ':':<14}{size_bytes / 1e3:>10.1f} KB {ms:>9.2f}ms")
+
+        if sorted(walk(playbooks, 'title', True)) != sorted(playbooks):
+            failures.append(f"{size} playbooks: walking the pages by title did not list each playbook once")
+
+    for failure in failures:
+        print(f"FAILED: {failure}")
+    if failures:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
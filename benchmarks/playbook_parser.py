@@ -0,0 +1,82 @@
+"""
+benchmarks/playbook_parser.py
+Playbook parsing time on a 5MB playbook and on the tutorials corpus.
+
+Times the single-pass parser on a generated 5MB playbook (prose with prices
+such as "$5" between bash blocks using variables) and on every playbook under
+playbooks/tutorials: cold, parsing from scratch, and through
+process_playbook once the content hash is cached, with and without the
+caller passing the hash it already has.
+
+Usage: python benchmarks/playbook_parser.py [--megabytes N]
+"""
+
+import argparse
+import glob
+import os
+import random
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from core import playbook_utils
+from core.playbook_utils import content_hash, process_playbook
+
+def make_playbook(size, rng):
+    """A playbook of about size characters alternating prose sections and bash blocks."""
+    words = ['scan', 'the', 'target', 'host', 'with', 'nmap', 'then', 'enumerate', 'shares',
+             'and', 'users', 'costs', '$5']
+    parts = ['# Large playbook\n', 'Steps for the whole engagement.\n']
+    length = sum(map(len, parts))
+    while length < size:
+        parts.append(f"## Step\n{' '.join(rng.choices(words, k=40))}\n")
+        parts.append('```bash\nnmap -sV -p- $TARGET_IP\n'
+                     'crackmapexec smb ${TARGET_IP} -u $USER -p $PASS\n# note\n```\n')
+        length += len(parts[-2]) + len(parts[-1])
+    return ''.join(parts)
+
+def median_ms(function, repeat):
+    """Median milliseconds function takes."""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1000
+
+def report(label, contents, repeat):
+    """Print cold and cached parsing times of the given playbooks."""
+    digests = [content_hash(content) for content in contents]
+    cold = median_ms(lambda: [playbook_utils._parse_playbook(content) for content in contents], repeat)
+    for content, digest in zip(contents, digests):
+        process_playbook(content, 'benchmark.md', digest)
+    cached = median_ms(lambda: [process_playbook(content, 'benchmark.md') for content in contents], repeat)
+    known = median_ms(lambda: [process_playbook(content, 'benchmark.md', digest)
+                               for content, digest in zip(contents, digests)], repeat)
+    blocks = sum(len(playbook_utils._parse_playbook(content)['blocks']) for content in contents)
+    print(f"{label}: {len(contents)} files, {sum(map(len, contents)) / 1e6:.2f} MB, {blocks} code blocks")
+    print(f"  cold:          {cold:10.3f}ms")
+    print(f"  cached:        {cached:10.3f}ms (hashing included)")
+    print(f"  cached, hash:  {known:10.3f}ms (hash passed by the caller)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[1])
+    parser.add_argument('--megabytes', type=float, default=5)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=5)
+    args = parser.parse_args()
+
+    large = make_playbook(int(args.megabytes * 1e6), random.Random(args.seed))
+    report(f'{args.megabytes:g}MB playbook', [large], args.repeat)
+
+    tutorials = []
+    for path in sorted(glob.glob(os.path.join(ROOT, 'playbooks', 'tutorials', '*.md'))):
+        with open(path, encoding='utf-8') as f:
+            tutorials.append(f.read())
+    report('tutorials', tutorials, args.repeat * 10)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+benchmarks/playbook_search_latency.py
+Query latency of the playbook index over a 5,000-playbook library.
+
+Indexes 5,000 synthetic playbooks (headings, prose drawn from a Zipf-like
+vocabulary and a code block per section) and times PlaybookIndex.search for
+common and rare words, multi-word and quoted phrases, prefixes and queries
+without a match, against the 10ms target. A linear scan of the lowercased
+content, as the old search route did per query, is timed for comparison.
+Exits with status 1 if any query's median is over the target.
+
+Usage: python benchmarks/playbook_search_latency.py [--playbooks N] [--repeat N]
+"""
+
+import argparse
+import itertools
+import os
+import random
+import statistics
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.playbook_index import PlaybookIndex
+
+TARGET_MS = 10.0
+
+COMMANDS = ['nmap -sV -p- {ip}', 'crackmapexec smb {ip} -u user -p pass',
+            'gobuster dir -u http://{ip}/ -w wordlist.txt', 'ssh user@{ip}',
+            'hydra -L users.txt -P pass.txt ssh://{ip}']
+
+def make_library(count, rng):
+    """Playbook id to content, with words drawn so a few are very common and most are rare."""
+    words = [''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(2, 10)))
+             for _ in range(30000)]
+    weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(words))))
+    library = {}
+    for number in range(count):
+        lines = [f"# Playbook {number} {' '.join(rng.choices(words, cum_weights=weights, k=4))}"]
+        for _ in range(6):
+            lines.append(f"## {' '.join(rng.choices(words, cum_weights=weights, k=3))}")
+            lines.extend(' '.join(rng.choices(words, cum_weights=weights, k=12)) for _ in range(5))
+            lines.extend(['```bash', rng.choice(COMMANDS).format(ip=f'10.0.0.{number % 250}'), '```'])
+        library[f'playbook_{number:05d}.md'] = '\n'.join(lines)
+    return library, words
+
+def median_ms(function, repeat):
+    """Median milliseconds function takes, and its last result."""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1000, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[1])
+    parser.add_argument('--playbooks', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    library, words = make_library(args.playbooks, rng)
+    index = PlaybookIndex()
+    started = time.perf_counter()
+    for playbook_id, content in library.items():
+        index.add(playbook_id, playbook_id, content)
+    build = time.perf_counter() - started
+
+    queries = ['nmap', 'nmap -sV', 'crackmapexec smb', '"ssh user"', 'hydra -L users',
+               words[0], f'{words[5]} {words[9]}', words[20000], 'gob', 'wo', 'zzzzzz', 'playbook 42']
+    print(f"library:       {len(library)} playbooks, {sum(map(len, library.values())) / 1e6:.1f} MB, "
+          f"indexed in {build:.1f}s")
+    slow = []
+    for query in queries:
+        ms, result = median_ms(lambda: index.search(query), args.repeat)
+        if ms > TARGET_MS:
+            slow.append(query)
+        more = '+' if result['truncated'] else ''
+        print(f"{repr(query):<22} {len(result['results']):>4}{more:<1} lines, median {ms:6.2f}ms")
+
+    def linear_scan(query='nmap -sv'):
+        return [(playbook_id, line_number)
+                for playbook_id, content in library.items() if query in content.lower()
+                for line_number, line in enumerate(content.lower().split('\n')) if query in line]
+    ms, _ = median_ms(linear_scan, 3)
+    print(f"linear scan:   median {ms:.1f}ms for 'nmap -sv'")
+
+    if slow:
+        print(f"FAILED: over {TARGET_MS:g}ms: {', '.join(map(repr, slow))}")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
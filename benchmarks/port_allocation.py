@@ -0,0 +1,137 @@
+"""
+benchmarks/port_allocation.py
+Time to pick a terminal port with 90 of 100 ports in use.
+
+Binds listeners on 90 ports of a 100-port range, as running ttyd processes
+would, and times picking a free port two ways: the old linear connect_ex
+scan from the start of the range, and PortAllocator.reserve with the
+terminals' ports reserved. A second round has 10 of the busy ports held by
+foreign processes the allocator does not know about. Finally, threads
+reserve the last free ports concurrently, and the script exits with status
+1 if any port is handed out twice.
+
+Usage: python benchmarks/port_allocation.py [--start-port N] [--rounds N]
+"""
+
+import argparse
+import logging
+import os
+import selectors
+import socket
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.port_allocator import PortAllocator
+
+RANGE_SIZE = 100
+IN_USE = 90
+
+def is_port_available(port):
+    """Check if a port is available to use, as main.py does."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        return s.connect_ex(('127.0.0.1', port)) != 0
+
+def linear_scan(start_port, end_port):
+    """The scan terminals were created with before the allocator."""
+    for port in range(start_port, end_port + 1):
+        if is_port_available(port):
+            return port
+    return None
+
+def listen(port):
+    """Hold a port the way a ttyd process does."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(('127.0.0.1', port))
+    sock.listen()
+    return sock
+
+def accept_all(listeners, stop):
+    """Accept and drop probe connections, so the listen backlogs never fill up."""
+    selector = selectors.DefaultSelector()
+    for sock in listeners:
+        selector.register(sock, selectors.EVENT_READ)
+    while not stop.is_set():
+        for key, _ in selector.select(timeout=0.1):
+            key.fileobj.accept()[0].close()
+    selector.close()
+
+def time_calls(pick, done, rounds):
+    """Median and maximum seconds taken by pick, calling done with each result afterwards."""
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        port = pick()
+        samples.append(time.perf_counter() - started)
+        done(port)
+    return statistics.median(samples), max(samples)
+
+def make_allocator(start_port, end_port, terminal_ports):
+    """An allocator holding the given terminal ports, probing the OS like main.py's."""
+    allocator = PortAllocator(start_port, end_port, probe=is_port_available)
+    for port in terminal_ports:
+        allocator.reserve_port(port)
+    return allocator
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[1])
+    parser.add_argument('--start-port', type=int, default=47682)
+    parser.add_argument('--rounds', type=int, default=200)
+    args = parser.parse_args()
+    start_port, end_port = args.start_port, args.start_port + RANGE_SIZE - 1
+    # Foreign ports are skipped with a warning each
+    logging.getLogger('commandwave').setLevel(logging.ERROR)
+
+    # Busy ports spread over the range, so the linear scan has to walk most of it
+    busy = [port for index, port in enumerate(range(start_port, end_port + 1)) if index % 10 != 9][:IN_USE]
+    listeners = [listen(port) for port in busy]
+    stop = threading.Event()
+    acceptor = threading.Thread(target=accept_all, args=(listeners, stop))
+    acceptor.start()
+    failures = []
+    try:
+        scan = time_calls(lambda: linear_scan(start_port, end_port), lambda port: None, args.rounds)
+        allocator = make_allocator(start_port, end_port, busy)
+        reserve = time_calls(allocator.reserve, allocator.release, args.rounds)
+
+        # Ten of the busy ports belong to processes the allocator does not know about
+        allocator = make_allocator(start_port, end_port, busy[10:])
+        first = time_calls(allocator.reserve, allocator.release, 1)
+        foreign = time_calls(allocator.reserve, allocator.release, args.rounds)
+
+        allocator = make_allocator(start_port, end_port, busy)
+        handed_out = []
+        threads = [threading.Thread(target=lambda: handed_out.append(allocator.reserve()))
+                   for _ in range(RANGE_SIZE - IN_USE + 5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        ports = [port for port in handed_out if port is not None]
+        if len(ports) != len(set(ports)):
+            failures.append(f"ports handed out twice: {sorted(ports)}")
+        if len(ports) != RANGE_SIZE - IN_USE:
+            failures.append(f"{len(ports)} ports handed out, {RANGE_SIZE - IN_USE} were free")
+    finally:
+        stop.set()
+        acceptor.join()
+        for sock in listeners:
+            sock.close()
+
+    print(f"ports:         {IN_USE} of {RANGE_SIZE} in use, {args.rounds} rounds")
+    print(f"linear scan:   median {scan[0] * 1e6:.0f}us, max {scan[1] * 1e6:.0f}us")
+    print(f"allocator:     median {reserve[0] * 1e6:.0f}us, max {reserve[1] * 1e6:.0f}us")
+    print(f"10 foreign:    first {first[0] * 1e6:.0f}us, then median {foreign[0] * 1e6:.0f}us, "
+          f"max {foreign[1] * 1e6:.0f}us")
+    for failure in failures:
+        print(f"FAILED: {failure}")
+    if failures:
+        sys.exit(1)
+    print("concurrent:    no port handed out twice")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+benchmarks/resource_sampler_cpu.py
+CPU the per-terminal resource sampler uses with 100 terminals.
+
+Starts a private tmux server with 100 sessions, each running a shell, and
+times ResourceMonitor.sample over many samples. The CPU one sample takes,
+in this process and in the tmux server answering its pane query, divided by
+the sampling interval, is the share of a core the sampler costs; the script
+exits with status 1 if that is 1% or more. Needs tmux on PATH and Linux /proc.
+
+Usage: python benchmarks/resource_sampler_cpu.py [--terminals N] [--interval SECONDS] [--samples N]
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.resource_monitor import ResourceMonitor
+from core.tmux_control import tmux_client
+
+def process_cpu(pid):
+    """User plus system CPU seconds a process has used."""
+    with open(f'/proc/{pid}/stat', 'rb') as f:
+        fields = f.read().rsplit(b')', 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[1])
+    parser.add_argument('--terminals', type=int, default=100)
+    parser.add_argument('--interval', type=float, default=2.0, help='seconds between samples, as --resource-interval')
+    parser.add_argument('--samples', type=int, default=50)
+    args = parser.parse_args()
+
+    # The control client starts its own tmux server here, away from any running one
+    runtime_dir = tempfile.mkdtemp(prefix='commandwave-sampler-')
+    os.environ['TMUX_TMPDIR'] = runtime_dir
+    os.environ.pop('TMUX', None)
+    try:
+        sessions = {f'term-{index}': f'commandwave-bench-{index}' for index in range(args.terminals)}
+        for session in sessions.values():
+            tmux_client.run('new-session', '-d', '-s', session, 'sh')
+
+        monitor = ResourceMonitor(lambda: sessions, interval=args.interval)
+        # The first sample opens every process's /proc files
+        monitor.sample()
+        server_pid = int(tmux_client.run('display-message', '-p', '#{pid}')[0])
+        server_started = process_cpu(server_pid)
+        cpu_started = time.process_time()
+        started = time.perf_counter()
+        for _ in range(args.samples):
+            stats = monitor.sample()
+        cpu_per_sample = (time.process_time() - cpu_started) / args.samples
+        server_per_sample = (process_cpu(server_pid) - server_started) / args.samples
+        wall_per_sample = (time.perf_counter() - started) / args.samples
+        processes = monitor.stats()['processes']
+        monitor.stop()
+    finally:
+        try:
+            tmux_client.run('kill-server')
+        except Exception:
+            pass
+        tmux_client.close()
+        shutil.rmtree(runtime_dir, ignore_errors=True)
+
+    share = (cpu_per_sample + server_per_sample) / args.interval * 100
+    print(f"terminals:     {len(stats)} sampled, {processes} processes followed")
+    print(f"per sample:    {cpu_per_sample * 1000:.2f}ms CPU, {server_per_sample * 1000:.2f}ms in tmux, "
+          f"{wall_per_sample * 1000:.2f}ms wall")
+    print(f"sampler CPU:   {share:.2f}% of a core every {args.interval:g}s")
+    if share >= 1.0:
+        print("FAILED: the sampler uses 1% of a core or more")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+benchmarks/terminal_delete_load.py
+List and create latency of a running CommandWave server while terminals are being deleted.
+
+Probe threads call /api/terminals/list, and one calls /api/terminals/new, in
+a loop, first on their own and then while other threads delete a batch of terminals created
+beforehand. Slow teardowns (waiting for ttyd to exit, killing the tmux
+session) run under the deleted terminal's own lock, so the p99 of list and
+create should stay about the same in both phases. Terminals created by the
+probes are deleted at the end.
+
+Usage: python benchmarks/terminal_delete_load.py [--url URL] [--deletes N] [--seconds N]
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+import urllib.request
+
+def call(url, method='GET', body=None):
+    """Send one API request and return (seconds taken, decoded JSON reply)."""
+    data = json.dumps(body).encode('utf-8') if body is not None else None
+    request = urllib.request.Request(url, data=data, method=method,
+                                     headers={'Content-Type': 'application/json'})
+    started = time.perf_counter()
+    with urllib.request.urlopen(request, timeout=60) as response:
+        reply = json.loads(response.read())
+    return time.perf_counter() - started, reply
+
+def percentile(samples, fraction):
+    """The sample below which the given fraction of samples fall."""
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] if ordered else 0.0
+
+def probe_list(base, stop, times):
+    """List terminals until stopped."""
+    while not stop.is_set():
+        seconds, _ = call(f'{base}/api/terminals/list')
+        times.append(seconds)
+
+def probe_create(base, stop, times, created):
+    """Create terminals until stopped."""
+    while not stop.is_set():
+        seconds, reply = call(f'{base}/api/terminals/new', 'POST', {'name': 'benchmark'})
+        times.append(seconds)
+        if reply.get('success'):
+            created.append(reply['id'])
+
+def run_phase(base, seconds, probes, deleting):
+    """Probe for the given time, deleting the given terminals meanwhile; return list and create latencies."""
+    stop = threading.Event()
+    list_times, create_times, created = [], [], []
+    threads = [threading.Thread(target=probe_list, args=(base, stop, list_times)) for _ in range(probes)]
+    threads.append(threading.Thread(target=probe_create, args=(base, stop, create_times, created)))
+    # Four deleters, so several teardowns are in flight at once
+    deleters = [threading.Thread(target=lambda ids: [call(f'{base}/api/terminals/{terminal_id}', 'DELETE')
+                                                     for terminal_id in ids],
+                                 args=(deleting[index::4],))
+                for index in range(4)]
+    for thread in threads + deleters:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads + deleters:
+        thread.join()
+    return list_times, create_times, created
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[1])
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--deletes', type=int, default=40, help='terminals deleted during the second phase')
+    parser.add_argument('--probes', type=int, default=2, help='threads listing terminals')
+    parser.add_argument('--seconds', type=float, default=5.0, help='length of each phase')
+    args = parser.parse_args()
+    base = args.url.rstrip('/')
+
+    doomed = []
+    for _ in range(args.deletes):
+        _, reply = call(f'{base}/api/terminals/new', 'POST', {'name': 'benchmark-delete'})
+        if not reply.get('success'):
+            print(f"FAILED: could not create a terminal to delete: {reply.get('error')}")
+            sys.exit(1)
+        doomed.append(reply['id'])
+
+    baseline = run_phase(base, args.seconds, args.probes, [])
+    loaded = run_phase(base, args.seconds, args.probes, doomed)
+
+    for terminal_id in baseline[2] + loaded[2]:
+        call(f'{base}/api/terminals/{terminal_id}', 'DELETE')
+
+    print(f"probes:        {args.probes} listing, 1 creating, {args.seconds:.0f}s per phase, {args.deletes} deletions")
+    for label, (list_times, create_times, _) in (('idle', baseline), ('deleting', loaded)):
+        print(f"{label + ':':<15}list p50 {percentile(list_times, 0.5) * 1000:.1f}ms "
+              f"p99 {percentile(list_times, 0.99) * 1000:.1f}ms, "
+              f"create p50 {percentile(create_times, 0.5) * 1000:.1f}ms "
+              f"p99 {percentile(create_times, 0.99) * 1000:.1f}ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+benchmarks/terminal_search_speed.py
+Time to search the scrollback of 50 terminals with 50,000 lines each.
+
+Runs search_terminals over synthetic shell history served by a stand-in for
+the snapshot cache, so only the search itself is timed, first for a literal
+(an IP address planted in a few terminals) and then for a regular expression
+(any SHA-1 hash). Finally a pattern that backtracks catastrophically is
+searched with a short per-terminal timeout; the script exits with status 1
+if that search is not cut off near the timeout.
+
+Usage: python benchmarks/terminal_search_speed.py [--terminals N] [--lines N]
+"""
+
+import argparse
+import hashlib
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.terminal_search import compile_pattern, search_terminals
+
+PLANTED_IP = '10.13.37.42'
+
+class FakeCache:
+    """Serves fixed lines per terminal, as SnapshotCache.lines does after a capture."""
+
+    def __init__(self, lines):
+        self._lines = lines
+
+    def lines(self, terminal_id, tmux_session):
+        return 0, self._lines[terminal_id]
+
+def make_history(count, rng, planted):
+    """Shell-like history lines; a planted line every 10,000 lines when planted is set."""
+    words = ['ls', '-la', 'total', 'drwxr-xr-x', 'root', 'nmap', '-sV', 'open', 'tcp', 'http',
+             'Connecting', 'to', 'port', '443', 'done', 'error:', 'file', 'not', 'found']
+    lines = []
+    for number in range(count):
+        line = ' '.join(rng.choice(words) for _ in range(rng.randint(3, 12)))
+        if number % 500 == 0:
+            line = f'{line} {hashlib.sha1(str(number).encode()).hexdigest()}'
+        if planted and number % 10000 == 5000:
+            line = f'{line} {PLANTED_IP}'
+        lines.append(line)
+    return lines
+
+def run(cache, terminals, pattern, regex, pane_timeout=5.0):
+    """Search every terminal and return (seconds, result)."""
+    started = time.perf_counter()
+    result = search_terminals(cache, terminals, compile_pattern(pattern, regex=regex),
+                              pane_timeout=pane_timeout)
+    return time.perf_counter() - started, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[1])
+    parser.add_argument('--terminals', type=int, default=50)
+    parser.add_argument('--lines', type=int, default=50000, help='lines of history per terminal')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    terminals = {f'term-{index}': {'tmux_session': f'commandwave-{index}', 'name': f'Terminal {index}'}
+                 for index in range(args.terminals)}
+    cache = FakeCache({terminal_id: make_history(args.lines, rng, planted=index % 10 == 0)
+                       for index, terminal_id in enumerate(terminals)})
+
+    literal = run(cache, terminals, PLANTED_IP, regex=False)
+    pattern = run(cache, terminals, r'\b[0-9a-f]{40}\b', regex=True)
+
+    # A few terminals hold lines that make (a+)+$ backtrack exponentially
+    slow_terminals = dict(list(terminals.items())[:4])
+    slow_cache = FakeCache({terminal_id: ['a' * 20 + '!'] * 40 for terminal_id in slow_terminals})
+    pane_timeout = 0.5
+    backtrack = run(slow_cache, slow_terminals, r'(a+)+$', regex=True, pane_timeout=pane_timeout)
+
+    total_lines = args.terminals * args.lines
+    print(f"history:       {args.terminals} terminals x {args.lines} lines ({total_lines / 1e6:.1f}M lines)")
+    print(f"literal:       {literal[0]:.2f}s, {literal[1]['match_count']} matches")
+    print(f"regex:         {pattern[0]:.2f}s, {pattern[1]['match_count']} matches"
+          f"{' (truncated)' if pattern[1]['truncated'] else ''}")
+    timed_out = sum(1 for result in backtrack[1]['results'] if result.get('error') == 'timed out')
+    print(f"backtracking:  {backtrack[0]:.2f}s, {timed_out} of {len(slow_terminals)} terminals timed out "
+          f"after {pane_timeout}s")
+    if timed_out != len(slow_terminals) or backtrack[0] > pane_timeout * 4:
+        print("FAILED: a catastrophically backtracking pattern was not cut off at the per-terminal timeout")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+benchmarks/tmux_quoting.py
+Round trip of awkward arguments through tmux's command parser.
+
+Quotes each argument with quote_arg, has a private tmux server run it as
+set-buffer through source-file, the way lines written to the control
+connection are parsed, and reads the buffer back. Any argument that tmux
+changes (a ~ expanded to the home directory, a $ expanded from the
+environment, a quote or control character lost) is reported, and the script
+exits with status 1. Needs tmux on PATH.
+
+Usage: python benchmarks/tmux_quoting.py
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.tmux_control import format_command
+
+# Own server socket, so no running tmux server is touched
+SOCKET_NAME = 'commandwave-quoting-check'
+
+ARGUMENTS = [
+    '~', '~/foo', '~root/bin', 'a~b', 'cd ~/src', '~~',
+    '$HOME', '${HOME}', 'echo "$PATH"', "it's", 'back\\slash', '\\',
+    'semi;colon', ';', '#comment', '{braces}', '%1', '-dash',
+    ' ', 'tab\there', 'new\nline', 'bell\x07', 'escape\x1b[0m', '\x7f',
+    'ünïcode ✓',
+]
+
+def tmux(*args, **kwargs):
+    """Run a command against the private tmux server."""
+    return subprocess.run(['tmux', '-L', SOCKET_NAME, '-f', os.devnull, *args],
+                          capture_output=True, **kwargs)
+
+def round_trip(argument):
+    """Set a buffer to argument through tmux's parser and return what tmux stored, or its error."""
+    with tempfile.NamedTemporaryFile('w', suffix='.tmux', encoding='utf-8', delete=False) as script:
+        script.write(format_command(['set-buffer', '-b', 'quoting', '--', argument]) + '\n')
+    try:
+        tmux('delete-buffer', '-b', 'quoting')
+        result = tmux('source-file', script.name)
+        if result.returncode != 0:
+            return f"error: {result.stderr.decode('utf-8', 'replace').strip()}"
+        return tmux('show-buffer', '-b', 'quoting').stdout.decode('utf-8')
+    finally:
+        os.unlink(script.name)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[1])
+    parser.parse_args()
+
+    env = dict(os.environ)
+    env.pop('TMUX', None)
+    tmux('new-session', '-d', '-s', 'quoting', env=env)
+    try:
+        failures = []
+        for argument in ARGUMENTS:
+            stored = round_trip(argument)
+            if stored != argument:
+                failures.append(f"{argument!r} quoted as {format_command([argument])} came back as {stored!r}")
+    finally:
+        tmux('kill-server')
+
+    print(f"arguments:     {len(ARGUMENTS)}")
+    for failure in failures:
+        print(f"FAILED: {failure}")
+    if failures:
+        sys.exit(1)
+    print("round trip:    ok")
+
+if __name__ == '__main__':
+    main()
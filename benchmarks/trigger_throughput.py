@@ -0,0 +1,89 @@
+"""
+benchmarks/trigger_throughput.py
+Throughput of the output trigger engine, in MB/s on one core.
+
+Feeds synthetic terminal output through TriggerEngine.feed in chunks, the way
+the output capture thread does, with 1,000 triggers by default: mostly
+literals, some regular expressions with a fixed literal and some without.
+
+Usage: python benchmarks/trigger_throughput.py [--patterns N] [--megabytes N] [--no-aho-corasick]
+"""
+
+import argparse
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import output_triggers
+from core.output_triggers import DEFAULT_TRIGGERS, TriggerEngine
+
+# Output chunk size, as read from a pipe
+CHUNK_SIZE = 4096
+
+def make_triggers(count, rng):
+    """Default triggers, then literals, regular expressions with a fixed literal and ones without, 8:1:1."""
+    triggers = [dict(trigger) for trigger in DEFAULT_TRIGGERS]
+    while len(triggers) < count:
+        word = ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(5, 12)))
+        kind = len(triggers) % 10
+        if kind == 8:
+            triggers.append({'pattern': rf'{word}=\d+', 'regex': True})
+        elif kind == 9:
+            triggers.append({'pattern': rf'\b{word[:3]}[0-9a-f]{{8,}}\b', 'regex': True, 'ignore_case': True})
+        else:
+            triggers.append({'pattern': word, 'ignore_case': rng.random() < 0.5})
+    return triggers
+
+def make_output(size, rng, planted):
+    """Shell-like output lines with colour escapes, about size bytes; one line in a hundred has a planted word."""
+    words = ['total', 'drwxr-xr-x', 'root', 'Connecting', 'to', 'port', '443', 'done',
+             'HTTP/1.1', '200', 'OK', 'error:', 'file', 'not', 'found']
+    lines = []
+    length = 0
+    while length < size:
+        line = ' '.join(rng.choice(words) for _ in range(rng.randint(3, 12)))
+        if rng.random() < 0.01:
+            line = f'{line} {rng.choice(planted)}'
+        if rng.random() < 0.2:
+            line = f'\x1b[1;32m{line}\x1b[0m'
+        lines.append(line)
+        length += len(line) + 2
+    return '\r\n'.join(lines).encode('utf-8')[:size]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[1])
+    parser.add_argument('--patterns', type=int, default=1000)
+    parser.add_argument('--megabytes', type=int, default=16)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-aho-corasick', action='store_true',
+                        help='use the trie fallback even when pyahocorasick is installed')
+    args = parser.parse_args()
+    if args.no_aho_corasick:
+        output_triggers.ahocorasick = None
+
+    rng = random.Random(args.seed)
+    matches = []
+    engine = TriggerEngine(on_match=lambda terminal_id, match: matches.append(match))
+    triggers = make_triggers(args.patterns, rng)
+    engine.set_triggers(triggers)
+    planted = [trigger['pattern'] for trigger in triggers if not trigger.get('regex')]
+    output = make_output(args.megabytes * 1024 * 1024, rng, planted)
+
+    started = time.perf_counter()
+    for offset in range(0, len(output), CHUNK_SIZE):
+        engine.feed('benchmark', offset, output[offset:offset + CHUNK_SIZE])
+    elapsed = time.perf_counter() - started
+
+    stats = engine.stats()
+    print(f"triggers:      {stats['triggers']}")
+    print(f"aho-corasick:  {'yes' if stats['aho_corasick'] else 'no (trie fallback)'}")
+    print(f"scanned:       {len(output) / 1e6:.1f} MB in {elapsed:.2f}s")
+    print(f"throughput:    {len(output) / 1e6 / elapsed:.1f} MB/s")
+    print(f"matches:       {stats['matches']} reported, {stats['suppressed']} suppressed")
+
+if __name__ == '__main__':
+    main()
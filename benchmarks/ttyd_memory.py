@@ -0,0 +1,91 @@
+"""
+benchmarks/ttyd_memory.py
+Memory the ttyd processes of a running CommandWave server take per terminal.
+
+Creates terminals on the server, then adds up the proportional set size (PSS)
+of every ttyd process on the machine and divides it by the number of
+terminals the server lists. Run it against a server started with
+--ttyd-mode per-terminal and again with --ttyd-mode shared to compare one
+ttyd per terminal with a single ttyd for all of them. The terminals it
+created are deleted at the end. Linux only; needs to run on the server's
+machine.
+
+Usage: python benchmarks/ttyd_memory.py [--url URL] [--terminals N]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import urllib.request
+
+def call(url, method='GET', body=None):
+    """Send one API request and return the decoded JSON reply."""
+    data = json.dumps(body).encode('utf-8') if body is not None else None
+    request = urllib.request.Request(url, data=data, method=method,
+                                     headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request, timeout=60) as response:
+        return json.loads(response.read())
+
+def ttyd_pids():
+    """Pids of running ttyd processes, including ttyd scripts run by an interpreter."""
+    pids = []
+    for name in os.listdir('/proc'):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f'/proc/{name}/cmdline', 'rb') as f:
+                argv = f.read().split(b'\0')
+        except OSError:
+            continue
+        if any(os.path.basename(arg) == b'ttyd' for arg in argv[:2]):
+            pids.append(int(name))
+    return pids
+
+def memory_bytes(pid):
+    """PSS of a process, or its RSS on kernels without smaps_rollup; 0 if it is gone."""
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                if line.startswith('Pss:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        with open(f'/proc/{pid}/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        return 0
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[1])
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--terminals', type=int, default=20, help='terminals to create')
+    parser.add_argument('--settle', type=float, default=2.0, help='seconds to wait before measuring')
+    args = parser.parse_args()
+    base = args.url.rstrip('/')
+
+    created = []
+    try:
+        for _ in range(args.terminals):
+            reply = call(f'{base}/api/terminals/new', 'POST', {'name': 'benchmark'})
+            if not reply.get('success'):
+                print(f"FAILED: could not create a terminal: {reply.get('error')}")
+                sys.exit(1)
+            created.append(reply['id'])
+        time.sleep(args.settle)
+
+        terminals = len(call(f'{base}/api/terminals/list')['terminals'])
+        pids = ttyd_pids()
+        total = sum(memory_bytes(pid) for pid in pids)
+    finally:
+        for terminal_id in created:
+            call(f'{base}/api/terminals/{terminal_id}', 'DELETE')
+
+    print(f"terminals:     {terminals} ({len(created)} created)")
+    print(f"ttyd:          {len(pids)} processes, {total / 2**20:.1f} MiB")
+    print(f"per terminal:  {total / max(terminals, 1) / 2**20:.2f} MiB")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,241 @@
+"""
+core/command_queue.py
+Per-terminal command queues drained asynchronously over the tmux control connection.
+"""
+
+import logging
+import threading
+from collections import deque
+from typing import Callable, Deque, Dict, Any, List, Optional, Sequence, Tuple
+
+from core.tmux_control import TmuxError
+
+# Configure logging
+logger = logging.getLogger('commandwave')
+
+# Commands a terminal may have waiting before new ones are rejected
+DEFAULT_QUEUE_LIMIT = 64
+# Most commands written to tmux in one pipelined batch
+MAX_BATCH = 256
+
+# submit_many(commands) -> pending replies, one per command, answered in order
+SubmitMany = Callable[[Sequence[Sequence[str]]], List[Any]]
+# on_result(terminal_id, seq, error) with error None on success
+ResultCallback = Callable[[str, int, Optional[str]], None]
+
+class QueueFull(Exception):
+    """Raised when a terminal already has the maximum number of queued commands."""
+
+class _TerminalQueue:
+    """Queued commands and delivery counters of one terminal."""
+
+    def __init__(self):
+        self.commands: Deque[Tuple[int, List[str]]] = deque()
+        self.last_seq = 0
+        self.delivered_seq = 0
+        self.failed = 0
+        self.coalesced = 0
+
+class CommandQueue:
+    """
+    Accepts commands for terminals and delivers them from one dispatcher thread.
+
+    Enqueueing never touches tmux, so request threads return at once with the
+    command's sequence number. The dispatcher takes the queued commands of every
+    terminal, oldest first, and writes them to the tmux control connection as one
+    pipelined batch. tmux executes a control client's commands in the order they
+    were written, so each terminal's commands run in sequence-number order.
+
+    Each terminal's queue is bounded. Below the limit every command is queued,
+    repeats included (y, Enter, Enter are all meant). Once the queue is full, a
+    command identical to the last one still waiting is coalesced into it (a
+    double click sends once) and anything else is rejected with QueueFull.
+    """
+
+    def __init__(self, submit_many: SubmitMany, limit: int = DEFAULT_QUEUE_LIMIT,
+                 on_result: Optional[ResultCallback] = None):
+        self._submit_many = submit_many
+        self.limit = limit
+        self._on_result = on_result
+
+        self._queues: Dict[str, _TerminalQueue] = {}
+        # Terminals with commands waiting, in the order they became non-empty
+        self._ready: Deque[str] = deque()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+
+    def start(self) -> None:
+        """Start the dispatcher thread."""
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='command-dispatcher', daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stop dispatching; commands still queued are dropped."""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+    def enqueue(self, terminal_id: str, args: Sequence[str]) -> int:
+        """
+        Queue a tmux command for a terminal.
+
+        Args:
+            terminal_id: The terminal the command belongs to
+            args: The tmux command, e.g. ['send-keys', '-t', session, 'ls', 'Enter']
+
+        Returns:
+            int: The command's sequence number within the terminal, or that of the
+            identical last command a full queue coalesced it into
+
+        Raises:
+            QueueFull: If the terminal already has the maximum number of commands waiting
+        """
+        self.start()
+        args = list(args)
+        with self._cond:
+            queue = self._queues.setdefault(terminal_id, _TerminalQueue())
+            if len(queue.commands) >= self.limit:
+                if queue.commands and queue.commands[-1][1] == args:
+                    # Same command still waiting, e.g. a double click
+                    queue.coalesced += 1
+                    return queue.commands[-1][0]
+                raise QueueFull(f"Terminal {terminal_id} has {len(queue.commands)} commands waiting")
+
+            queue.last_seq += 1
+            if not queue.commands:
+                self._ready.append(terminal_id)
+            queue.commands.append((queue.last_seq, args))
+            self._cond.notify()
+            return queue.last_seq
+
+    def enqueue_batch(self, batch: Dict[str, Sequence[Sequence[str]]]) -> Dict[str, Optional[List[int]]]:
+        """
+        Queue commands for many terminals in one pass.
+
+        Every terminal's commands are queued together or not at all, so a code
+        block never runs partially; the dispatcher is woken once for the whole
+        batch and delivers it as a single pipelined write.
+
+        Args:
+            batch: The commands to queue, in order, keyed by terminal id
+
+        Returns:
+            dict: The sequence numbers of each terminal's commands, or None for a
+            terminal whose queue had no room for them
+        """
+        self.start()
+        results: Dict[str, Optional[List[int]]] = {}
+        with self._cond:
+            for terminal_id, commands in batch.items():
+                queue = self._queues.setdefault(terminal_id, _TerminalQueue())
+                if len(queue.commands) + len(commands) > self.limit:
+                    results[terminal_id] = None
+                    continue
+                if not queue.commands and commands:
+                    self._ready.append(terminal_id)
+                seqs = []
+                for args in commands:
+                    queue.last_seq += 1
+                    queue.commands.append((queue.last_seq, list(args)))
+                    seqs.append(queue.last_seq)
+                results[terminal_id] = seqs
+            self._cond.notify()
+        return results
+
+    def discard(self, terminal_id: str) -> int:
+        """
+        Forget a terminal, dropping its waiting commands.
+
+        Returns:
+            int: Number of commands dropped
+        """
+        with self._cond:
+            queue = self._queues.pop(terminal_id, None)
+        return len(queue.commands) if queue else 0
+
+    def status(self, terminal_id: str) -> Optional[Dict[str, Any]]:
+        """Get the queue depth and delivery progress of a terminal, or None if it never queued anything."""
+        with self._cond:
+            queue = self._queues.get(terminal_id)
+            if queue is None:
+                return None
+            return {
+                'queued': len(queue.commands),
+                'last_seq': queue.last_seq,
+                'delivered_seq': queue.delivered_seq,
+                'failed': queue.failed,
+                'coalesced': queue.coalesced
+            }
+
+    def stats(self) -> Dict[str, Any]:
+        """Get the queue limit and totals across terminals."""
+        with self._cond:
+            queues = list(self._queues.values())
+        return {
+            'limit': self.limit,
+            'terminals': len(queues),
+            'queued': sum(len(q.commands) for q in queues),
+            'failed': sum(q.failed for q in queues),
+            'coalesced': sum(q.coalesced for q in queues)
+        }
+
+    def _take_batch(self) -> List[Tuple[str, int, List[str]]]:
+        """Take waiting commands, oldest terminal first. Caller holds the condition."""
+        batch = []
+        while self._ready and len(batch) < MAX_BATCH:
+            terminal_id = self._ready.popleft()
+            queue = self._queues.get(terminal_id)
+            if queue is None:
+                continue
+            while queue.commands and len(batch) < MAX_BATCH:
+                seq, args = queue.commands.popleft()
+                batch.append((terminal_id, seq, args))
+            if queue.commands:
+                # Batch is full; keep the rest for the next round, ahead of newcomers
+                self._ready.appendleft(terminal_id)
+        return batch
+
+    def _run(self) -> None:
+        """Deliver queued commands in pipelined batches until stopped."""
+        while True:
+            with self._cond:
+                while not self._ready and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                batch = self._take_batch()
+            if batch:
+                self._deliver(batch)
+
+    def _deliver(self, batch: List[Tuple[str, int, List[str]]]) -> None:
+        """Write a batch to tmux, then wait for and record every reply."""
+        try:
+            pending = self._submit_many([args for _, _, args in batch])
+            errors: List[Optional[str]] = []
+            for result in pending:
+                try:
+                    result.result()
+                    errors.append(None)
+                except TmuxError as e:
+                    errors.append(str(e))
+        except TmuxError as e:
+            errors = [str(e)] * len(batch)
+
+        for (terminal_id, seq, _), error in zip(batch, errors):
+            with self._cond:
+                queue = self._queues.get(terminal_id)
+                if queue is not None:
+                    queue.delivered_seq = max(queue.delivered_seq, seq)
+                    if error:
+                        queue.failed += 1
+            if error:
+                logger.error(f"Command {seq} for terminal {terminal_id} failed: {error}")
+            if self._on_result:
+                try:
+                    self._on_result(terminal_id, seq, error)
+                except Exception as e:
+                    logger.error(f"Error reporting command {seq} for terminal {terminal_id}: {e}")
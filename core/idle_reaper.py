@@ -0,0 +1,121 @@
+"""
+core/idle_reaper.py
+Background reaper stopping ttyd processes of terminals nobody is viewing.
+"""
+
+import logging
+import threading
+import time
+from typing import Callable, Dict, Any, Iterable, Optional
+
+# Configure logging
+logger = logging.getLogger('commandwave')
+
+# Upper bound on the time between scans, in seconds
+MAX_SCAN_INTERVAL = 30.0
+
+class IdleReaper:
+    """
+    Stops ttyd for terminals that have had no viewer for idle_timeout seconds.
+
+    Presence comes from the viewer counts of the terminal rooms, so a terminal is
+    considered viewed while any client has it as its active tab. Only the ttyd
+    process is stopped; the tmux session, and with it the shell and scrollback,
+    stays alive until the terminal is opened again.
+    """
+
+    def __init__(self, running: Callable[[], Iterable[str]],
+                 viewers: Callable[[str], int],
+                 stop: Callable[[str], bool],
+                 idle_timeout: float):
+        # running() lists terminals with a live ttyd
+        self._running = running
+        # viewers(terminal_id) counts clients currently viewing a terminal
+        self._viewers = viewers
+        # stop(terminal_id) stops a terminal's ttyd, keeping its tmux session
+        self._stop = stop
+        self.idle_timeout = float(idle_timeout)
+
+        # terminal_id -> last time it was seen with a viewer (or started)
+        self._last_seen: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.reaped = 0
+
+    @property
+    def interval(self) -> float:
+        """Time between scans, a fraction of the idle timeout."""
+        return max(1.0, min(MAX_SCAN_INTERVAL, self.idle_timeout / 4))
+
+    def start(self) -> None:
+        """Start the background scan thread."""
+        if self._thread is not None or self.idle_timeout <= 0:
+            return
+        self._thread = threading.Thread(target=self._run, name='ttyd-idle-reaper', daemon=True)
+        self._thread.start()
+        logger.info(f"Idle ttyd reaper started (timeout {self.idle_timeout:.0f}s)")
+
+    def stop(self) -> None:
+        """Stop scanning."""
+        self._stopped.set()
+
+    def touch(self, terminal_id: str) -> None:
+        """Mark a terminal as just viewed, e.g. when its ttyd is (re)started."""
+        with self._lock:
+            self._last_seen[terminal_id] = time.monotonic()
+
+    def scan(self) -> int:
+        """
+        Stop ttyd for every terminal idle past the timeout.
+
+        Returns:
+            int: Number of ttyd processes stopped
+        """
+        now = time.monotonic()
+        running = set(self._running())
+        idle = []
+
+        with self._lock:
+            # Forget terminals that were closed or already stopped
+            for terminal_id in list(self._last_seen):
+                if terminal_id not in running:
+                    del self._last_seen[terminal_id]
+
+            for terminal_id in running:
+                if self._viewers(terminal_id) > 0:
+                    self._last_seen[terminal_id] = now
+                elif now - self._last_seen.setdefault(terminal_id, now) >= self.idle_timeout:
+                    idle.append(terminal_id)
+
+        stopped = 0
+        for terminal_id in idle:
+            try:
+                if self._stop(terminal_id):
+                    stopped += 1
+                    logger.info(f"Stopped idle ttyd for terminal {terminal_id}")
+            except Exception as e:
+                logger.error(f"Error stopping idle ttyd for terminal {terminal_id}: {e}")
+            with self._lock:
+                self._last_seen.pop(terminal_id, None)
+
+        self.reaped += stopped
+        return stopped
+
+    def stats(self) -> Dict[str, Any]:
+        """Get the idle timeout, tracked terminals and reap count."""
+        with self._lock:
+            tracked = len(self._last_seen)
+        return {
+            'idle_timeout': self.idle_timeout,
+            'tracked': tracked,
+            'reaped': self.reaped
+        }
+
+    def _run(self) -> None:
+        """Scan periodically until stopped."""
+        while not self._stopped.wait(self.interval):
+            try:
+                self.scan()
+            except Exception as e:
+                logger.error(f"Error scanning for idle terminals: {e}")
@@ -6,6 +6,8 @@ Handles persistent storage for notes.
 import os
 import logging
 import time
+import hashlib
+import threading
 from pathlib import Path
 import re
 
@@ -23,6 +25,44 @@ if not os.path.exists(NOTES_DIR):
     except Exception as e:
         logger.error(f"Failed to create notes directory: {e}")
 
+# Notes read or written by this process: path -> (file signature, content, ETag).
+# The signature (mtime_ns, size), or None for a missing file, catches edits made
+# outside CommandWave without re-reading unchanged files.
+_notes_cache = {}
+_notes_cache_lock = threading.Lock()
+
+def _file_signature(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+def _remember_notes(path, content):
+    """Cache notes content just read or written, with its ETag."""
+    etag = hashlib.sha1(content.encode('utf-8')).hexdigest()
+    with _notes_cache_lock:
+        _notes_cache[path] = (_file_signature(path), content, etag)
+    return content, etag
+
+def _read_notes(path):
+    """
+    Get notes content and its ETag, reading the file only if it changed.
+    
+    Returns:
+        tuple: (content, etag, read) - read is True if the file was read now
+    """
+    with _notes_cache_lock:
+        cached = _notes_cache.get(path)
+    if cached is not None and cached[0] == _file_signature(path):
+        return cached[1], cached[2], False
+    content = ''
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            content = f.read()
+    content, etag = _remember_notes(path, content)
+    return content, etag, True
+
 def get_global_notes_path():
     """Get the path to the global notes file."""
     return os.path.join(NOTES_DIR, 'global_notes.md')
@@ -45,8 +85,10 @@ def save_global_notes(content):
         bool: True if saved successfully, False otherwise
     """
     try:
-        with open(get_global_notes_path(), 'w', encoding='utf-8') as f:
+        path = get_global_notes_path()
+        with open(path, 'w', encoding='utf-8') as f:
             f.write(content)
+        _remember_notes(path, content)
         logger.info("Global notes saved to disk")
         return True
     except Exception as e:
@@ -60,19 +102,23 @@ def load_global_notes():
     Returns:
         str: The notes content or empty string if not found
     """
+    return load_global_notes_versioned()[0]
+
+def load_global_notes_versioned():
+    """
+    Load global notes and their ETag, from memory unless the file changed.
+    
+    Returns:
+        tuple: (content, etag) - content is an empty string if not found
+    """
     try:
-        path = get_global_notes_path()
-        if os.path.exists(path):
-            with open(path, 'r', encoding='utf-8') as f:
-                content = f.read()
+        content, etag, read = _read_notes(get_global_notes_path())
+        if read:
             logger.info("Global notes loaded from disk")
-            return content
-        else:
-            logger.info("No global notes file found, returning empty string")
-            return ""
+        return content, etag
     except Exception as e:
         logger.error(f"Error loading global notes: {e}")
-        return ""
+        return "", None
 
 def save_terminal_notes(terminal_name, content):
     """
@@ -86,8 +132,10 @@ def save_terminal_notes(terminal_name, content):
         bool: True if saved successfully, False otherwise
     """
     try:
-        with open(get_terminal_notes_path(terminal_name), 'w', encoding='utf-8') as f:
+        path = get_terminal_notes_path(terminal_name)
+        with open(path, 'w', encoding='utf-8') as f:
             f.write(content)
+        _remember_notes(path, content)
         logger.info(f"Notes saved for terminal {terminal_name}")
         return True
     except Exception as e:
@@ -104,19 +152,26 @@ def load_terminal_notes(terminal_name):
     Returns:
         str: The notes content or empty string if not found
     """
+    return load_terminal_notes_versioned(terminal_name)[0]
+
+def load_terminal_notes_versioned(terminal_name):
+    """
+    Load terminal-specific notes and their ETag, from memory unless the file changed.
+    
+    Args:
+        terminal_name (str): The terminal name
+        
+    Returns:
+        tuple: (content, etag) - content is an empty string if not found
+    """
     try:
-        path = get_terminal_notes_path(terminal_name)
-        if os.path.exists(path):
-            with open(path, 'r', encoding='utf-8') as f:
-                content = f.read()
+        content, etag, read = _read_notes(get_terminal_notes_path(terminal_name))
+        if read:
             logger.info(f"Notes loaded for terminal {terminal_name}")
-            return content
-        else:
-            logger.info(f"No notes file found for terminal {terminal_name}, returning empty string")
-            return ""
+        return content, etag
     except Exception as e:
         logger.error(f"Error loading notes for terminal {terminal_name}: {e}")
-        return ""
+        return "", None
 
 def list_all_notes():
     """
@@ -0,0 +1,333 @@
+"""
+core/output_capture.py
+Capture of terminal output through tmux pipe-pane into bounded per-terminal ring buffers.
+"""
+
+import logging
+import mmap
+import os
+import selectors
+import shlex
+import threading
+from typing import Callable, Dict, Any, Optional, Tuple
+
+from core.tmux_control import tmux_client, TmuxError
+
+# Configure logging
+logger = logging.getLogger('commandwave')
+
+# Default bytes of output kept per terminal
+DEFAULT_BUFFER_SIZE = 256 * 1024
+# Bytes read from a pane's pipe at a time
+READ_CHUNK = 65536
+
+# on_output(terminal_id, offset, data) for every chunk captured
+OutputCallback = Callable[[str, int, bytes], None]
+
+class RingBuffer:
+    """
+    Fixed-size byte buffer keeping the most recent output.
+
+    Positions are absolute byte offsets into everything ever written, so a
+    reader can ask for what arrived since the offset it saw last; once older
+    bytes have been overwritten, reads start at the oldest byte still held.
+    """
+
+    def __init__(self, capacity: int, path: Optional[str] = None):
+        self.capacity = capacity
+        self.path = path
+        self._file = None
+        if path:
+            # Memory-mapped file, so the buffers do not count against the heap
+            self._file = open(path, 'w+b')
+            self._file.truncate(capacity)
+            self._buf = mmap.mmap(self._file.fileno(), capacity)
+        else:
+            self._buf = bytearray(capacity)
+        # Total bytes ever written; the offset of the next byte
+        self.end = 0
+        self._lock = threading.Lock()
+
+    @property
+    def start(self) -> int:
+        """Offset of the oldest byte still held."""
+        return max(0, self.end - self.capacity)
+
+    def write(self, data: bytes) -> int:
+        """
+        Append data, overwriting the oldest bytes once full.
+
+        Returns:
+            int: The offset data was written at
+        """
+        with self._lock:
+            offset = self.end
+            self.end += len(data)
+            if len(data) > self.capacity:
+                data = data[-self.capacity:]
+            pos = (self.end - len(data)) % self.capacity
+            first = min(len(data), self.capacity - pos)
+            self._buf[pos:pos + first] = data[:first]
+            if first < len(data):
+                self._buf[0:len(data) - first] = data[first:]
+            return offset
+
+    def read(self, since: Optional[int] = None, limit: Optional[int] = None) -> Tuple[int, bytes]:
+        """
+        Read held bytes from an offset onwards.
+
+        Args:
+            since: Offset to read from; None or anything older than start reads from start
+            limit: Most bytes to return
+
+        Returns:
+            tuple: The offset of the first byte returned, and the bytes
+        """
+        with self._lock:
+            start = self.start
+            offset = start if since is None else min(max(since, start), self.end)
+            length = self.end - offset
+            if limit is not None:
+                length = min(length, max(0, limit))
+            pos = offset % self.capacity
+            first = min(length, self.capacity - pos)
+            data = bytes(self._buf[pos:pos + first])
+            if first < length:
+                data += bytes(self._buf[0:length - first])
+            return offset, data
+
+    def close(self) -> None:
+        """Release the buffer and remove its backing file, if any."""
+        if self._file is not None:
+            self._buf.close()
+            self._file.close()
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+            self._file = None
+
+class _Capture:
+    """Pipe and buffer of one captured terminal."""
+
+    def __init__(self, terminal_id: str, tmux_session: str, fifo_path: str, buffer: RingBuffer):
+        self.terminal_id = terminal_id
+        self.tmux_session = tmux_session
+        self.fifo_path = fifo_path
+        self.buffer = buffer
+        self.read_fd: Optional[int] = None
+        # Held open so the FIFO never reports EOF between pipe-pane writers
+        self.keepalive_fd: Optional[int] = None
+
+class OutputCapture:
+    """
+    Mirrors the output of terminals into bounded ring buffers.
+
+    tmux's pipe-pane copies everything a pane prints into a FIFO per terminal,
+    and one background thread reads every FIFO into that terminal's buffer. The
+    memory used per terminal is fixed by the buffer size no matter how much the
+    terminal prints. A capacity of 0 disables capture.
+    """
+
+    def __init__(self, capacity: int = 0, directory: Optional[str] = None,
+                 use_mmap: bool = False, on_output: Optional[OutputCallback] = None):
+        self.capacity = capacity
+        self.directory = directory
+        self.use_mmap = use_mmap
+        self.on_output = on_output
+
+        self._captures: Dict[str, _Capture] = {}
+        self._lock = threading.Lock()
+        self._selector = selectors.DefaultSelector()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+        self.bytes_captured = 0
+
+        # Self-pipe waking the thread when the set of FIFOs changes
+        self._wake_r, self._wake_w = os.pipe()
+        os.set_blocking(self._wake_r, False)
+        os.set_blocking(self._wake_w, False)
+        self._selector.register(self._wake_r, selectors.EVENT_READ, None)
+
+    @property
+    def enabled(self) -> bool:
+        return self.capacity > 0 and self.directory is not None
+
+    def start(self, terminal_id: str, tmux_session: str) -> bool:
+        """
+        Start capturing a terminal's output, replacing any pipe its pane already has.
+
+        Returns:
+            bool: True if the terminal is being captured
+        """
+        if not self.enabled:
+            return False
+        with self._lock:
+            if terminal_id in self._captures:
+                return True
+
+        fifo_path = os.path.join(self.directory, f'{terminal_id}.out')
+        buffer_path = os.path.join(self.directory, f'{terminal_id}.buf') if self.use_mmap else None
+        capture = _Capture(terminal_id, tmux_session, fifo_path, RingBuffer(self.capacity, buffer_path))
+        try:
+            if os.path.exists(fifo_path):
+                os.unlink(fifo_path)
+            os.mkfifo(fifo_path, 0o600)
+            capture.read_fd = os.open(fifo_path, os.O_RDONLY | os.O_NONBLOCK)
+            capture.keepalive_fd = os.open(fifo_path, os.O_WRONLY | os.O_NONBLOCK)
+        except OSError as e:
+            logger.error(f"Failed to create output pipe for terminal {terminal_id}: {e}")
+            self._release(capture)
+            return False
+
+        with self._lock:
+            self._captures[terminal_id] = capture
+            self._selector.register(capture.read_fd, selectors.EVENT_READ, terminal_id)
+        self._ensure_thread()
+
+        try:
+            # -O: only what the pane prints, not what is typed into it
+            tmux_client.run('pipe-pane', '-O', '-t', tmux_session, f'cat > {shlex.quote(fifo_path)}')
+        except TmuxError as e:
+            logger.error(f"Failed to capture output of terminal {terminal_id}: {e}")
+            self.stop(terminal_id, close_pipe=False)
+            return False
+        return True
+
+    def stop(self, terminal_id: str, close_pipe: bool = True) -> None:
+        """Stop capturing a terminal and free its buffer."""
+        with self._lock:
+            capture = self._captures.pop(terminal_id, None)
+            if capture is None:
+                return
+            try:
+                self._selector.unregister(capture.read_fd)
+            except (KeyError, ValueError):
+                pass
+        if close_pipe:
+            # pipe-pane without a command closes the pane's pipe
+            try:
+                tmux_client.submit(['pipe-pane', '-t', capture.tmux_session])
+            except TmuxError:
+                pass
+        self._release(capture)
+
+    def shutdown(self, close_pipes: bool = True) -> None:
+        """Stop capturing every terminal and the reader thread."""
+        with self._lock:
+            terminal_ids = list(self._captures)
+        for terminal_id in terminal_ids:
+            self.stop(terminal_id, close_pipe=close_pipes)
+        self._stopped = True
+        self._wake()
+
+    def read(self, terminal_id: str, since: Optional[int] = None,
+             limit: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """
+        Read a terminal's captured output.
+
+        Args:
+            terminal_id: The terminal
+            since: Offset returned as 'next' by a previous read; None reads everything held
+            limit: Most bytes to return
+
+        Returns:
+            dict: offset, next and the output, plus whether bytes after since were
+            already overwritten; None if the terminal is not being captured
+        """
+        with self._lock:
+            capture = self._captures.get(terminal_id)
+        if capture is None:
+            return None
+        offset, data = capture.buffer.read(since, limit)
+        return {
+            'offset': offset,
+            'next': offset + len(data),
+            'truncated': since is not None and offset > since,
+            'data': data
+        }
+
+    def end_offset(self, terminal_id: str) -> Optional[int]:
+        """Get the number of bytes captured from a terminal so far, or None if it is not captured."""
+        with self._lock:
+            capture = self._captures.get(terminal_id)
+        return capture.buffer.end if capture else None
+
+    def capturing(self, terminal_id: str) -> bool:
+        with self._lock:
+            return terminal_id in self._captures
+
+    def stats(self) -> Dict[str, Any]:
+        """Get the buffer size, captured terminals and bytes captured."""
+        with self._lock:
+            terminals = len(self._captures)
+        return {
+            'enabled': self.enabled,
+            'buffer_size': self.capacity,
+            'mmap': self.use_mmap,
+            'terminals': terminals,
+            'memory_bytes': terminals * self.capacity,
+            'bytes_captured': self.bytes_captured
+        }
+
+    def _ensure_thread(self) -> None:
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='output-capture', daemon=True)
+            self._thread.start()
+
+    def _wake(self) -> None:
+        try:
+            os.write(self._wake_w, b'\0')
+        except OSError:
+            pass
+
+    def _release(self, capture: _Capture) -> None:
+        """Close a capture's descriptors and remove its FIFO and buffer."""
+        for fd in (capture.read_fd, capture.keepalive_fd):
+            if fd is not None:
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+        capture.read_fd = capture.keepalive_fd = None
+        try:
+            os.unlink(capture.fifo_path)
+        except OSError:
+            pass
+        capture.buffer.close()
+
+    def _run(self) -> None:
+        """Read every FIFO into its buffer until stopped."""
+        while not self._stopped:
+            for key, _ in self._selector.select(1.0):
+                if key.data is None:
+                    try:
+                        while os.read(self._wake_r, 512):
+                            pass
+                    except BlockingIOError:
+                        pass
+                    continue
+                self._drain(key.data, key.fd)
+
+    def _drain(self, terminal_id: str, fd: int) -> None:
+        """Move whatever a FIFO holds into the terminal's buffer."""
+        with self._lock:
+            capture = self._captures.get(terminal_id)
+            if capture is None or capture.read_fd != fd:
+                return
+            try:
+                data = os.read(fd, READ_CHUNK)
+            except (BlockingIOError, OSError):
+                return
+            if not data:
+                return
+            offset = capture.buffer.write(data)
+            self.bytes_captured += len(data)
+
+        if self.on_output:
+            try:
+                self.on_output(terminal_id, offset, data)
+            except Exception as e:
+                logger.error(f"Error publishing output of terminal {terminal_id}: {e}")
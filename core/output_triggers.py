@@ -0,0 +1,441 @@
+"""
+core/output_triggers.py
+Matching of captured terminal output against trigger patterns.
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from typing import Callable, Dict, Any, Iterator, List, Optional, Tuple
+
+try:
+    from re import _parser as sre_parse
+except ImportError:
+    import sre_parse
+
+try:
+    # Optional: Aho-Corasick automaton for the literal patterns
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+# Configure logging
+logger = logging.getLogger('commandwave')
+
+# Bytes of an unfinished line kept to match patterns split across chunks
+MAX_CARRY = 1024
+# Characters of a matching line reported
+MAX_LINE_LENGTH = 500
+# Shortest literal worth checking for before running a regular expression
+MIN_REQUIRED_LITERAL = 3
+# Matches reported per terminal per second; the rest are counted as suppressed
+MAX_MATCHES_PER_SECOND = 20
+
+# Escape sequences (colours, cursor movement, titles) removed before matching
+_ESCAPE_SEQUENCE = re.compile(rb'\x1b(?:\[[0-?]*[ -/]*[@-~]|\][^\x07\x1b]*(?:\x07|\x1b\\)|[@-Z\\-_])')
+# Flags set for a whole expression, which cannot appear inside a combined one
+_GLOBAL_FLAGS = re.compile(r'\(\?[aiLmsux]+\)')
+
+DEFAULT_TRIGGERS = [
+    {'name': 'Password prompt', 'pattern': 'password:', 'regex': False, 'ignore_case': True},
+    {'name': 'Permission denied', 'pattern': 'Permission denied', 'regex': False, 'ignore_case': False},
+    {'name': 'NTLM hash', 'regex': True, 'ignore_case': False,
+     'pattern': r'[^\s:]+::[^\s:]*:[0-9a-fA-F]{16}:[0-9a-fA-F]{32}:[0-9a-fA-F]+'},
+    {'name': 'NTLM hash', 'regex': True, 'ignore_case': False,
+     'pattern': r'[^\s:]+:\d+:[0-9a-fA-F]{32}:[0-9a-fA-F]{32}:::'}
+]
+
+# on_match(terminal_id, match) for every reported match
+MatchCallback = Callable[[str, Dict[str, Any]], None]
+
+def normalize_trigger(data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Validate a trigger definition and fill in its defaults.
+
+    Raises:
+        ValueError: If the pattern is missing or is an invalid regular expression
+    """
+    pattern = data.get('pattern')
+    if not isinstance(pattern, str) or not pattern:
+        raise ValueError('No trigger pattern specified')
+    trigger = {
+        'id': str(data.get('id') or uuid.uuid4().hex[:12]),
+        'name': str(data.get('name') or pattern),
+        'pattern': pattern,
+        'regex': bool(data.get('regex', False)),
+        'ignore_case': bool(data.get('ignore_case', False))
+    }
+    if trigger['regex']:
+        try:
+            compiled = re.compile(pattern)
+        except re.error as e:
+            raise ValueError(f"Invalid regular expression for trigger '{trigger['name']}': {e}")
+        if compiled.match(''):
+            raise ValueError(f"Pattern of trigger '{trigger['name']}' matches empty text")
+    return trigger
+
+def _build_trie(words: List[str]) -> Dict[str, Any]:
+    """Build a trie of the words, with an '' key marking where a word ends."""
+    trie: Dict[str, Any] = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = word
+    return trie
+
+def _trie_pattern(trie: Dict[str, Any]) -> str:
+    """Build a regular expression matching any word of a trie, so shared prefixes are tried once."""
+    def build(node: Dict[str, Any]) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        return f'(?:{body})?' if '' in node else body
+
+    return build(trie)
+
+def _required_literal(compiled: re.Pattern) -> Optional[str]:
+    """
+    Find text every match of a regular expression contains.
+
+    Only literals at the top level of the expression are considered, which
+    covers the common shape of a fixed marker among character classes.
+
+    Returns:
+        str: The longest such literal, or None if there is none long enough
+    """
+    try:
+        parsed = sre_parse.parse(compiled.pattern, compiled.flags)
+    except Exception:
+        return None
+    best = run = ''
+    for op, value in parsed:
+        if op == sre_parse.LITERAL:
+            run += chr(value)
+            if len(run) > len(best):
+                best = run
+        else:
+            run = ''
+    if len(best) < MIN_REQUIRED_LITERAL:
+        return None
+    return best
+
+class TriggerMatcher:
+    """
+    Finds every trigger in a text in a few passes, however many triggers there are.
+
+    Literal patterns go into an Aho-Corasick automaton when pyahocorasick is
+    installed, or otherwise into a trie, whose regular expression form finds
+    the positions a literal starts at, run once over the lowercased text
+    whatever the patterns' case sensitivity. Every occurrence of every literal
+    is reported, including overlapping and nested ones. A regular expression
+    containing a fixed literal only runs on text where the same pass found
+    that literal; the other expressions are combined into one pattern whose
+    optional lookaheads, one per trigger with its own group, report every
+    expression matching at a position in a single pass, so each expression
+    finds the same matches as it would on its own. A matcher is immutable and
+    is rebuilt when the triggers change.
+    """
+
+    def __init__(self, triggers: List[Dict[str, Any]]):
+        self.triggers = list(triggers)
+        # Lowercased literal -> (trigger index, exact text if case-sensitive)
+        self._literals: Dict[str, List[Tuple[int, Optional[str]]]] = {}
+        # Regular expressions run only when their required literal appears
+        self._prefiltered: List[Tuple[int, re.Pattern, str]] = []
+        self._combined: Optional[re.Pattern] = None
+        # Trigger index of each group of the combined pattern, in group order
+        self._combined_indices: List[int] = []
+        # Regular expressions that cannot be combined (their own groups or flags)
+        self._separate: List[Tuple[int, re.Pattern]] = []
+        self._automaton = None
+        self._literal_trie: Dict[str, Any] = {}
+        self._literal_pattern: Optional[re.Pattern] = None
+
+        regexes = []
+        for index, trigger in enumerate(self.triggers):
+            ignore_case = trigger['ignore_case']
+            if not trigger['regex']:
+                self._literals.setdefault(trigger['pattern'].lower(), []).append(
+                    (index, None if ignore_case else trigger['pattern']))
+                continue
+            compiled = re.compile(trigger['pattern'], re.IGNORECASE if ignore_case else 0)
+            literal = _required_literal(compiled)
+            if literal:
+                self._prefiltered.append((index, compiled, literal.lower()))
+            elif compiled.groups or _GLOBAL_FLAGS.match(trigger['pattern']):
+                self._separate.append((index, compiled))
+            else:
+                regexes.append((index, compiled))
+
+        if regexes:
+            # A lookahead of every expression finds the positions where any of them
+            # matches; there an optional lookahead per trigger sets its group if it
+            # matches too. Lookaheads consume nothing, so matches of other triggers
+            # inside a match are still found.
+            wrapped = [f"{'(?i:' if compiled.flags & re.IGNORECASE else '(?:'}{compiled.pattern})"
+                       for _, compiled in regexes]
+            self._combined = re.compile(f"(?={'|'.join(wrapped)})" + ''.join(
+                f'(?:(?=(?P<t{index}>{pattern}))|)' for (index, _), pattern in zip(regexes, wrapped)))
+            self._combined_indices = [index for index, _ in regexes]
+
+        if ahocorasick is not None and (self._literals or self._prefiltered):
+            # Each word maps to its length, its literal triggers and the regular
+            # expressions requiring it
+            words: Dict[str, Tuple[int, list, list]] = {}
+            for key, entries in self._literals.items():
+                words[key] = (len(key), entries, [])
+            for position, (_, _, literal) in enumerate(self._prefiltered):
+                words.setdefault(literal, (len(literal), [], []))[2].append(position)
+            self._automaton = ahocorasick.Automaton()
+            for key, value in words.items():
+                self._automaton.add_word(key, value)
+            self._automaton.make_automaton()
+        elif self._literals:
+            self._literal_trie = _build_trie(list(self._literals))
+            # Matches, without consuming it, where any literal starts
+            self._literal_pattern = re.compile(f'(?={_trie_pattern(self._literal_trie)})')
+
+    def __len__(self) -> int:
+        return len(self.triggers)
+
+    def scan(self, text: str, boundary: int = 0) -> Iterator[Tuple[int, int, int]]:
+        """
+        Find triggers in a text.
+
+        Args:
+            text: The text to search
+            boundary: Matches ending at or before this position were reported before and are skipped
+
+        Yields:
+            tuple: Trigger index, match start and match end
+        """
+        lowered = text.lower()
+        if len(lowered) != len(text):
+            # A few characters lowercase to several; keep positions aligned with text
+            lowered = ''.join(char.lower() if len(char.lower()) == 1 else char for char in text)
+
+        # Literal hits, and the regular expressions whose literal appears
+        required = set()
+        if self._automaton is not None:
+            hits = []
+            for last, (length, entries, positions) in self._automaton.iter(lowered):
+                if entries and last + 1 > boundary:
+                    hits.append((last + 1 - length, last + 1, entries))
+                required.update(positions)
+        else:
+            hits = []
+            if self._literal_pattern is not None:
+                for match in self._literal_pattern.finditer(lowered):
+                    # Every literal starting here, shortest first
+                    start = match.start()
+                    node = self._literal_trie
+                    for end in range(start + 1, len(lowered) + 1):
+                        node = node.get(lowered[end - 1])
+                        if node is None:
+                            break
+                        if '' in node and end > boundary:
+                            hits.append((start, end, self._literals[node['']]))
+            required.update(position for position, (_, _, literal) in enumerate(self._prefiltered)
+                            if literal in lowered)
+
+        for start, end, entries in hits:
+            for index, exact in entries:
+                if exact is None or text[start:end] == exact:
+                    yield index, start, end
+
+        for position in sorted(required):
+            index, compiled, _ = self._prefiltered[position]
+            for match in compiled.finditer(text):
+                if match.end() > boundary:
+                    yield index, match.start(), match.end()
+
+        if self._combined is not None:
+            # End of each trigger's last match, as its next one starts after it
+            ends: Dict[int, int] = {}
+            for match in self._combined.finditer(text):
+                start = match.start()
+                # Groups of triggers not matching here span (-1, -1)
+                for index, (_, end) in zip(self._combined_indices, match.regs[1:]):
+                    if end <= start or start < ends.get(index, 0):
+                        continue
+                    ends[index] = end
+                    if end > boundary:
+                        yield index, start, end
+
+        for index, compiled in self._separate:
+            for match in compiled.finditer(text):
+                if match.end() > boundary and match.end() > match.start():
+                    yield index, match.start(), match.end()
+
+class _Stream:
+    """Matching state of one terminal's output."""
+
+    __slots__ = ('carry', 'window_start', 'window_matches')
+
+    def __init__(self):
+        # Raw bytes of the unfinished last line, matched again with the next chunk
+        self.carry = b''
+        self.window_start = 0.0
+        self.window_matches = 0
+
+class TriggerEngine:
+    """
+    Watches captured terminal output for trigger patterns.
+
+    Output arrives in chunks from the output capture thread. Each chunk is
+    matched together with the unfinished line before it, so a pattern split
+    across chunks is still found, and matches already reported for that line
+    are skipped. The triggers are kept in a JSON file.
+    """
+
+    def __init__(self, path: Optional[str] = None, on_match: Optional[MatchCallback] = None):
+        self.path = path
+        self.on_match = on_match
+        self._matcher = TriggerMatcher([])
+        self._streams: Dict[str, _Stream] = {}
+        self._lock = threading.Lock()
+        self.bytes_scanned = 0
+        self.matches = 0
+        self.suppressed = 0
+
+    def load(self) -> None:
+        """Load the triggers from the file, or the default triggers if there is none."""
+        triggers = DEFAULT_TRIGGERS
+        if self.path and os.path.exists(self.path):
+            try:
+                with open(self.path, 'r') as f:
+                    triggers = json.load(f)
+            except Exception as e:
+                logger.error(f"Error loading output triggers: {e}")
+        valid = []
+        for data in triggers:
+            try:
+                valid.append(normalize_trigger(data))
+            except ValueError as e:
+                logger.warning(f"Skipping output trigger: {e}")
+        self._install(valid)
+
+    def list_triggers(self) -> List[Dict[str, Any]]:
+        return [dict(trigger) for trigger in self._matcher.triggers]
+
+    def set_triggers(self, triggers: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Replace every trigger.
+
+        Raises:
+            ValueError: If any trigger is invalid; the current triggers are kept
+        """
+        valid = [normalize_trigger(data) for data in triggers]
+        with self._lock:
+            self._install(valid)
+        self._save()
+        return self.list_triggers()
+
+    def add_trigger(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Add a trigger, or replace the one with the same id.
+
+        Raises:
+            ValueError: If the trigger is invalid
+        """
+        trigger = normalize_trigger(data)
+        with self._lock:
+            triggers = [t for t in self._matcher.triggers if t['id'] != trigger['id']]
+            self._install(triggers + [trigger])
+        self._save()
+        return trigger
+
+    def remove_trigger(self, trigger_id: str) -> bool:
+        with self._lock:
+            triggers = [t for t in self._matcher.triggers if t['id'] != trigger_id]
+            if len(triggers) == len(self._matcher):
+                return False
+            self._install(triggers)
+        self._save()
+        return True
+
+    def feed(self, terminal_id: str, offset: int, data: bytes) -> None:
+        """Match a chunk of a terminal's output; meant as the output capture callback."""
+        matcher = self._matcher
+        if not len(matcher):
+            return
+        with self._lock:
+            stream = self._streams.get(terminal_id)
+            if stream is None:
+                stream = self._streams[terminal_id] = _Stream()
+
+        carry = _ESCAPE_SEQUENCE.sub(b'', stream.carry).decode('utf-8', errors='replace')
+        raw = stream.carry + data
+        text = _ESCAPE_SEQUENCE.sub(b'', raw).decode('utf-8', errors='replace')
+        self.bytes_scanned += len(data)
+
+        for index, start, end in matcher.scan(text, len(carry)):
+            self._report(terminal_id, stream, matcher.triggers[index], text, start, end, offset)
+
+        # Keep the unfinished last line for the next chunk
+        line_start = max(raw.rfind(b'\n'), raw.rfind(b'\r')) + 1
+        stream.carry = raw[line_start:][-MAX_CARRY:]
+
+    def discard(self, terminal_id: str) -> None:
+        """Forget a terminal's unfinished line."""
+        with self._lock:
+            self._streams.pop(terminal_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'triggers': len(self._matcher),
+            'aho_corasick': ahocorasick is not None,
+            'bytes_scanned': self.bytes_scanned,
+            'matches': self.matches,
+            'suppressed': self.suppressed
+        }
+
+    def _install(self, triggers: List[Dict[str, Any]]) -> None:
+        # Built aside and swapped in, so output keeps being matched meanwhile
+        self._matcher = TriggerMatcher(triggers)
+
+    def _save(self) -> None:
+        if not self.path:
+            return
+        try:
+            tmp_path = f'{self.path}.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(self.list_triggers(), f, indent=2)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.error(f"Error saving output triggers: {e}")
+
+    def _report(self, terminal_id: str, stream: _Stream, trigger: Dict[str, Any],
+                text: str, start: int, end: int, offset: int) -> None:
+        """Publish a match, unless the terminal is past its matches for this second."""
+        now = time.time()
+        if now - stream.window_start >= 1.0:
+            stream.window_start = now
+            stream.window_matches = 0
+        stream.window_matches += 1
+        if stream.window_matches > MAX_MATCHES_PER_SECOND:
+            self.suppressed += 1
+            return
+        self.matches += 1
+
+        line_start = max(text.rfind('\n', 0, start), text.rfind('\r', 0, start)) + 1
+        line_end = min(position for position in (text.find('\n', end), text.find('\r', end), len(text))
+                       if position >= 0)
+        if self.on_match:
+            try:
+                self.on_match(terminal_id, {
+                    'trigger_id': trigger['id'],
+                    'name': trigger['name'],
+                    'match': text[start:end][:MAX_LINE_LENGTH],
+                    'line': text[line_start:line_end][:MAX_LINE_LENGTH],
+                    'offset': offset,
+                    'timestamp': now
+                })
+            except Exception as e:
+                logger.error(f"Error reporting output trigger for terminal {terminal_id}: {e}")
@@ -0,0 +1,343 @@
+"""
+core/playbook_index.py
+In-memory inverted index for full-text search of playbooks.
+"""
+
+import bisect
+import logging
+import re
+import threading
+from array import array
+from itertools import accumulate, repeat
+from typing import Dict, Any, List, Optional, Tuple
+
+# Configure logging
+logger = logging.getLogger('commandwave')
+
+# Lines returned per search unless a limit is given
+DEFAULT_LIMIT = 200
+
+# Prefix terms expanding to more words than this are not checked against the pair filters
+MAX_PAIR_CHOICES = 16
+
+_TOKEN = re.compile(r'\w+')
+_TOKEN_SPLIT = re.compile(r'(\w+)')
+
+# A query term: (token, matched as a prefix)
+Term = Tuple[str, bool]
+
+def parse_query(query: str) -> List[Term]:
+    """
+    Split a query into the terms of a phrase.
+
+    Terms must appear consecutively on one line, ignoring punctuation between
+    them. A term ending in * matches any word starting with it, and so does the
+    last term of an unquoted query, so results follow a query as it is typed.
+    A query in double quotes is an exact phrase.
+    """
+    query = query.strip().lower()
+    exact = len(query) > 1 and query.startswith('"') and query.endswith('"')
+    if exact:
+        query = query[1:-1]
+
+    terms = []
+    for match in _TOKEN.finditer(query):
+        prefix = query.startswith('*', match.end())
+        terms.append((match.group(0), prefix))
+    if terms and not exact:
+        terms[-1] = (terms[-1][0], True)
+    return terms
+
+class _Document:
+    """A playbook's lines and the position of every token in them."""
+
+    __slots__ = ('filename', 'lines', 'lowered', 'tokens', 'line_of', 'starts', 'ends', 'pairs')
+
+    def __init__(self, filename: str, lines: List[str]):
+        self.filename = filename
+        self.lines = lines
+        # Lowercased content, for substring searches
+        self.lowered = ''
+        # Per token ordinal: vocabulary id, line index and offsets within the line
+        self.tokens = array('I')
+        self.line_of = array('I')
+        self.starts = array('I')
+        self.ends = array('I')
+        # Bit filter of the pairs of adjacent tokens, about 8 bits per pair
+        self.pairs = b''
+
+    def build_pairs(self) -> None:
+        """Fill the pair filter from the tokens."""
+        size = 64
+        while size < len(self.tokens):
+            size *= 2
+        bitmap = bytearray(size)
+        mask = size * 8 - 1
+        for bit in {hash(pair) & mask for pair in zip(self.tokens, self.tokens[1:])}:
+            bitmap[bit >> 3] |= 1 << (bit & 7)
+        self.pairs = bytes(bitmap)
+
+    def may_have_pair(self, hashes: List[int]) -> bool:
+        """False if no pair with one of the given hashes is adjacent anywhere in the playbook."""
+        pairs = self.pairs
+        mask = len(pairs) * 8 - 1
+        for h in hashes:
+            if pairs[(h & mask) >> 3] >> (h & 7) & 1:
+                return True
+        return False
+
+class PlaybookIndex:
+    """
+    Maps every token of every playbook to the positions it occurs at.
+
+    Postings are kept per token as playbook id to the ordinals of its
+    occurrences; each playbook keeps, per ordinal, the token and its line and
+    offsets, so a phrase is matched by looking up its rarest exact term and
+    checking the neighbouring ordinals; a small bit filter of the adjacent
+    token pairs of each playbook skips playbooks where the phrase cannot
+    start. Prefix terms are resolved against a sorted vocabulary. Playbooks
+    are added, replaced and removed individually, so the index never has to be
+    rebuilt after its initial load.
+    """
+
+    def __init__(self):
+        self._documents: Dict[str, _Document] = {}
+        # token -> vocabulary id, and the reverse
+        self._ids: Dict[str, int] = {}
+        self._words: List[str] = []
+        # vocabulary id -> playbook id -> ordinals
+        self._postings: List[Dict[str, List[int]]] = []
+        # Tokens that occur in at least one playbook, sorted for prefix lookups
+        self._sorted: List[str] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def add(self, playbook_id: str, filename: str, content: str) -> None:
+        """Index a playbook, replacing any earlier version of it."""
+        document = _Document(filename, content.split('\n'))
+        lowered = content.lower()
+        if len(lowered) != len(content):
+            # Keep offsets aligned with the original text for the few characters
+            # whose lowercase form is longer
+            lowered = ''.join(ch.lower() if len(ch.lower()) == 1 else ch for ch in content)
+
+        document.lowered = lowered
+
+        # Splitting a line on tokens alternates separators and tokens, so the
+        # running length of the parts gives every token's offsets
+        words: List[str] = []
+        for line_index, line in enumerate(lowered.split('\n')):
+            parts = _TOKEN_SPLIT.split(line)
+            if len(parts) == 1:
+                continue
+            boundaries = list(accumulate(map(len, parts)))
+            words.extend(parts[1::2])
+            document.starts.extend(boundaries[0:-1:2])
+            document.ends.extend(boundaries[1::2])
+            document.line_of.extend(repeat(line_index, len(parts) // 2))
+
+        occurrences: Dict[str, List[int]] = {}
+        for ordinal, token in enumerate(words):
+            occurrences.setdefault(token, []).append(ordinal)
+
+        with self._lock:
+            self._remove(playbook_id)
+            for token, ordinals in occurrences.items():
+                token_id = self._ids.get(token)
+                if token_id is None:
+                    token_id = self._ids[token] = len(self._words)
+                    self._words.append(token)
+                    self._postings.append({})
+                postings = self._postings[token_id]
+                if not postings:
+                    bisect.insort(self._sorted, token)
+                postings[playbook_id] = ordinals
+            document.tokens = array('I', map(self._ids.__getitem__, words))
+            document.build_pairs()
+            self._documents[playbook_id] = document
+
+    def remove(self, playbook_id: str) -> bool:
+        """Drop a playbook from the index. Returns False if it was not indexed."""
+        with self._lock:
+            return self._remove(playbook_id)
+
+    def clear(self) -> None:
+        """Drop every playbook."""
+        with self._lock:
+            self._documents.clear()
+            self._ids.clear()
+            self._words.clear()
+            self._postings.clear()
+            self._sorted.clear()
+
+    def _remove(self, playbook_id: str) -> bool:
+        """Remove a playbook's postings. Caller holds _lock."""
+        document = self._documents.pop(playbook_id, None)
+        if document is None:
+            return False
+        for token_id in set(document.tokens):
+            postings = self._postings[token_id]
+            postings.pop(playbook_id, None)
+            if not postings:
+                token = self._words[token_id]
+                position = bisect.bisect_left(self._sorted, token)
+                if position < len(self._sorted) and self._sorted[position] == token:
+                    del self._sorted[position]
+        return True
+
+    def _expand(self, prefix: str) -> List[int]:
+        """Vocabulary ids of the tokens starting with prefix. Caller holds _lock."""
+        start = bisect.bisect_left(self._sorted, prefix)
+        end = bisect.bisect_left(self._sorted, prefix + '\U0010ffff', start)
+        return [self._ids[token] for token in self._sorted[start:end]]
+
+    def search(self, query: str, limit: Optional[int] = DEFAULT_LIMIT) -> Dict[str, Any]:
+        """
+        Find the lines of every playbook matching a query.
+
+        Playbooks are visited in id order and the search stops once limit
+        lines have matched, so common words cost no more than rare ones.
+
+        Returns:
+            dict: 'results', one per matching line in playbook and line order
+            with its filename, id, line_number, line and the [start, end]
+            offsets of each match in the line for highlighting, and
+            'truncated', whether more lines matched than were returned
+        """
+        terms = parse_query(query)
+        if not terms:
+            return self._scan(query, limit)
+
+        results: List[Dict[str, Any]] = []
+        with self._lock:
+            exact = []
+            allowed = []
+            for position, (token, prefix) in enumerate(terms):
+                if prefix:
+                    allowed.append(frozenset(self._expand(token)))
+                    continue
+                token_id = self._ids.get(token)
+                if token_id is None or not self._postings[token_id]:
+                    return {'results': [], 'truncated': False}
+                exact.append((position, self._postings[token_id]))
+                allowed.append(frozenset((token_id,)))
+
+            # Playbooks containing every exact term, or else any word the first prefix matches
+            if exact:
+                exact.sort(key=lambda term: len(term[1]))
+                playbook_ids = set(exact[0][1])
+                for _, postings in exact[1:]:
+                    playbook_ids.intersection_update(postings)
+            else:
+                expansions = [self._postings[token_id] for token_id in allowed[0]]
+                playbook_ids = set().union(*expansions)
+            # Prefixes matching only rare words narrow the playbooks further
+            for (_, prefix), choices in zip(terms, allowed):
+                if not prefix:
+                    continue
+                postings = [self._postings[token_id] for token_id in choices]
+                if sum(map(len, postings)) < len(playbook_ids):
+                    playbook_ids.intersection_update(set().union(*postings))
+
+            last_offset = len(terms) - 1
+            # The rarest exact term anchors the phrase; the other terms are checked
+            # against the tokens next to each of its occurrences
+            anchor = exact[0][0] if exact else 0
+            neighbours = [(offset - anchor, choices) for offset, choices in enumerate(allowed) if offset != anchor]
+            # Hashes of the pairs the anchor must form with the term after it, or else before it,
+            # so playbooks where the two are never adjacent are skipped without looking at them
+            pair_hashes = None
+            if exact and len(terms) > 1:
+                anchor_id = next(iter(allowed[anchor]))
+                if anchor < last_offset:
+                    choices = allowed[anchor + 1]
+                    pairs = [(anchor_id, choice) for choice in choices]
+                else:
+                    choices = allowed[anchor - 1]
+                    pairs = [(choice, anchor_id) for choice in choices]
+                if len(choices) <= MAX_PAIR_CHOICES:
+                    pair_hashes = list(map(hash, pairs))
+            for playbook_id in sorted(playbook_ids):
+                document = self._documents[playbook_id]
+                if pair_hashes is not None and not document.may_have_pair(pair_hashes):
+                    continue
+                tokens = document.tokens
+                if exact:
+                    ordinals = exact[0][1][playbook_id]
+                else:
+                    ordinals = sorted(set().union(*(postings.get(playbook_id, ()) for postings in expansions)))
+                last = len(tokens) - 1 - last_offset + anchor
+                if ordinals and (ordinals[0] < anchor or ordinals[-1] > last):
+                    ordinals = [ordinal for ordinal in ordinals if anchor <= ordinal <= last]
+                for shift, choices in neighbours:
+                    if not ordinals:
+                        break
+                    ordinals = [ordinal for ordinal in ordinals if tokens[ordinal + shift] in choices]
+                if not ordinals:
+                    continue
+
+                hits: Dict[int, List[List[int]]] = {}
+                for ordinal in ordinals:
+                    start = ordinal - anchor
+                    end = start + last_offset
+                    line_index = document.line_of[start]
+                    if document.line_of[end] == line_index:
+                        hits.setdefault(line_index, []).append([document.starts[start], document.ends[end]])
+
+                for line_index in sorted(hits):
+                    if limit is not None and len(results) >= limit:
+                        return {'results': results, 'truncated': True}
+                    results.append({
+                        'filename': document.filename,
+                        'id': playbook_id,
+                        'line_number': line_index + 1,
+                        'line': document.lines[line_index],
+                        'matches': hits[line_index]
+                    })
+        return {'results': results, 'truncated': False}
+
+    def _scan(self, query: str, limit: Optional[int]) -> Dict[str, Any]:
+        """Substring search for queries without any word characters, such as '--'."""
+        needle = query.strip().lower()
+        results: List[Dict[str, Any]] = []
+        if not needle:
+            return {'results': results, 'truncated': False}
+
+        with self._lock:
+            for playbook_id in sorted(self._documents):
+                document = self._documents[playbook_id]
+                if needle not in document.lowered:
+                    continue
+                for line_index, line in enumerate(document.lines):
+                    lowered = line.lower()
+                    start = lowered.find(needle)
+                    if start < 0:
+                        continue
+                    if limit is not None and len(results) >= limit:
+                        return {'results': results, 'truncated': True}
+                    matches = []
+                    while start >= 0:
+                        matches.append([start, start + len(needle)])
+                        start = lowered.find(needle, start + len(needle))
+                    results.append({
+                        'filename': document.filename,
+                        'id': playbook_id,
+                        'line_number': line_index + 1,
+                        'line': line,
+                        'matches': matches
+                    })
+        return {'results': results, 'truncated': False}
+
+    def stats(self) -> Dict[str, Any]:
+        """Get the number of playbooks, distinct tokens and token occurrences indexed."""
+        with self._lock:
+            return {
+                'playbooks': len(self._documents),
+                'tokens': len(self._sorted),
+                'occurrences': sum(len(document.starts) for document in self._documents.values())
+            }
+
+# Shared index of the playbooks directory, kept up to date by the playbook routes
+playbook_index = PlaybookIndex()
@@ -6,12 +6,47 @@ Core logic for parsing, managing, and synchronizing playbooks.
 import os
 import re
 import json
+import base64
+import hashlib
+import heapq
+import threading
+from collections import OrderedDict
 from datetime import datetime
 
 # Constants
 PLAYBOOKS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'playbooks')
 os.makedirs(PLAYBOOKS_DIR, exist_ok=True)
 
+# Playbook summaries returned per listing page unless a limit is given, and at most
+LIST_PAGE_SIZE = 200
+MAX_LIST_PAGE_SIZE = 1000
+
+# Parsed playbooks kept by content hash, so unchanged content is never parsed twice
+PARSE_CACHE_SIZE = 512
+
+# Languages whose code block lines are collected as commands
+COMMAND_LANGUAGES = ('bash', 'shell', 'sh')
+
+# Patterns the parser applies to one part of a playbook each: a code fence
+# (a run of backticks, the language and the newline that make it an opening
+# fence), the title and section headings in prose, and variables in code
+_FENCE = re.compile(r'`{3,}(\w*)(\n)?')
+_TITLE = re.compile(r'^#[^\S\n]+(\S.*)$', re.MULTILINE)
+_SECTION = re.compile(r'^##\s', re.MULTILINE)
+_VARIABLE = re.compile(r'\$(?:\{([A-Za-z0-9_]+)\}|([A-Za-z0-9_]+))')
+
+_parse_cache = OrderedDict()
+_parse_cache_lock = threading.Lock()
+
+# Sort keys for playbook listings; ties are broken by playbook id
+SORT_KEYS = {
+    'id': lambda playbook: '',
+    'title': lambda playbook: (playbook.get('title') or '').lower(),
+    # Shared playbook state records last_modified rather than updated_at
+    'updated_at': lambda playbook: playbook.get('updated_at', playbook.get('last_modified')) or 0,
+    'size': lambda playbook: playbook.get('size') or 0
+}
+
 def validate_playbook(content):
     """
     Validate a playbook's content.
@@ -31,73 +66,125 @@ def validate_playbook(content):
     
     return True, None
 
-def process_playbook(content, filename):
+def _parse_playbook(content):
     """
-    Process a playbook and extract metadata.
+    Extract a playbook's title, description, code blocks, commands and variables in one pass.
+    
+    The content is walked from one code fence to the next, so every part of
+    it is scanned once: prose for the title and description (only until they
+    are found), code for commands and variables. The title is the first #
+    heading outside code blocks, and the description the text from there up to
+    the first ## heading or code fence. A code block runs from a fence with an
+    optional language at the end of a line to the next fence; a fence that is
+    never closed is left as text. Variables ($NAME or ${NAME}) are only taken
+    from code blocks, in order of first use, so prose such as "costs $5" does
+    not produce one.
     
     Args:
         content (str): The playbook content
-        filename (str): The playbook filename
         
     Returns:
-        dict: A dictionary containing processed playbook data
+        dict: title (None without a # heading), description, blocks, commands and variables
     """
-    playbook_data = {
-        'filename': filename,
-        'title': filename,
-        'description': '',
-        'blocks': [],
-        'variables': [],
-        'commands': []
-    }
+    title = None
+    description = ''
+    # Offset the description starts at, while its end has not been found
+    description_start = None
+    blocks = []
+    commands = []
+    variables = {}
+    position = 0
     
-    # Extract title from the first # heading
-    title_match = re.search(r'^#\s+(.+)$', content, re.MULTILINE)
-    if title_match:
-        playbook_data['title'] = title_match.group(1).strip()
-    
-    # Extract description (text between title and first ## heading or code block)
-    if title_match:
-        title_end = title_match.end()
-        next_section = re.search(r'(^##\s+|\```)', content[title_end:], re.MULTILINE)
-        if next_section:
-            desc_text = content[title_end:title_end + next_section.start()].strip()
-            playbook_data['description'] = desc_text
-    
-    # Extract code blocks
-    code_blocks = re.finditer(r'```([\w]*)\n(.*?)```', content, re.DOTALL)
-    for i, block in enumerate(code_blocks):
-        lang = block.group(1) or 'bash'  # Default to bash if no language specified
-        code = block.group(2).strip()
-        
-        playbook_data['blocks'].append({
-            'id': f'block-{i+1}',
-            'language': lang,
+    while True:
+        fence = content.find('```', position)
+        prose_end = fence if fence >= 0 else len(content)
+        
+        # Prose up to the next fence
+        if title is None:
+            match = _TITLE.search(content, position, prose_end)
+            if match:
+                title = match.group(1).strip()
+                description_start = match.end()
+        if description_start is not None:
+            match = _SECTION.search(content, max(position, description_start), prose_end)
+            if match or fence >= 0:
+                description = content[description_start:match.start() if match else fence].strip()
+                description_start = None
+        if fence < 0:
+            break
+        
+        match = _FENCE.match(content, fence)
+        code_start = match.end()
+        close = content.find('```', code_start) if match.group(2) else -1
+        if close < 0:
+            # Not an opening fence, or one that is never closed
+            position = code_start
+            continue
+        
+        # The last three backticks of the run open the block
+        language = match.group(1) or 'bash'
+        code = content[code_start:close].strip()
+        blocks.append({
+            'id': f'block-{len(blocks) + 1}',
+            'language': language,
             'code': code,
-            'start': block.start(),
-            'end': block.end()
+            'start': match.start(1) - 3,
+            'end': close + 3
         })
-        
-        # Extract commands from bash code blocks
-        if lang.lower() in ['bash', 'shell', 'sh', '']:
-            lines = code.split('\n')
-            for line in lines:
+        if language.lower() in COMMAND_LANGUAGES:
+            for line in code.split('\n'):
                 line = line.strip()
                 if line and not line.startswith('#'):
-                    playbook_data['commands'].append(line)
+                    commands.append(line)
+        for variable in _VARIABLE.finditer(content, code_start, close):
+            variables.setdefault(variable.group(1) or variable.group(2), None)
+        position = close + 3
     
-    # Extract variables (patterns like $VARIABLE or ${VARIABLE})
-    var_pattern = r'(\$\{([A-Za-z0-9_]+)\}|\$([A-Za-z0-9_]+))'
-    variable_matches = re.finditer(var_pattern, content)
+    return {
+        'title': title,
+        'description': description,
+        'blocks': blocks,
+        'commands': commands,
+        'variables': list(variables)
+    }
+
+def process_playbook(content, filename, digest=None):
+    """
+    Process a playbook and extract metadata.
     
-    variables = set()
-    for match in variable_matches:
-        var_name = match.group(2) or match.group(3)
-        variables.add(var_name)
+    Results are cached by content hash, so processing content that was seen
+    before costs only the hash.
     
-    playbook_data['variables'] = list(variables)
+    Args:
+        content (str): The playbook content
+        filename (str): The playbook filename
+        digest (str): content_hash(content), if the caller already has it
+        
+    Returns:
+        dict: A dictionary containing processed playbook data
+    """
+    if digest is None:
+        digest = content_hash(content)
+    with _parse_cache_lock:
+        parsed = _parse_cache.get(digest)
+        if parsed is not None:
+            _parse_cache.move_to_end(digest)
+    if parsed is None:
+        parsed = _parse_playbook(content)
+        with _parse_cache_lock:
+            _parse_cache[digest] = parsed
+            if len(_parse_cache) > PARSE_CACHE_SIZE:
+                _parse_cache.popitem(last=False)
     
-    return playbook_data
+    # Copies, down to each block, so callers may change them without touching the cache
+    return {
+        'filename': filename,
+        'title': parsed['title'] or filename,
+        'description': parsed['description'],
+        'blocks': [dict(block) for block in parsed['blocks']],
+        'variables': list(parsed['variables']),
+        'commands': list(parsed['commands'])
+    }
 
 def get_playbook_path(filename):
     """
@@ -188,3 +275,100 @@ def list_playbooks():
         print(f"Error listing playbooks: {e}")
     
     return playbooks
+
+def content_hash(content):
+    """
+    Get the hash identifying a version of a playbook's content.
+    
+    Args:
+        content (str): The playbook content
+        
+    Returns:
+        str: Hex SHA-1 digest of the UTF-8 encoded content
+    """
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+def summarize_playbook(playbook_id, playbook):
+    """
+    Get a playbook's metadata without its content.
+    
+    Args:
+        playbook_id (str): The playbook ID
+        playbook (dict): The in-memory playbook
+        
+    Returns:
+        dict: Every field but content, with the id, the content size in bytes and its hash
+    """
+    summary = {key: value for key, value in playbook.items() if key != 'content'}
+    summary['id'] = playbook_id
+    if 'size' not in summary or 'hash' not in summary:
+        content = playbook.get('content', '')
+        summary['size'] = len(content.encode('utf-8'))
+        summary['hash'] = content_hash(content)
+    return summary
+
+def _encode_cursor(sort, key):
+    return base64.urlsafe_b64encode(json.dumps([sort, *key]).encode('utf-8')).decode('ascii')
+
+def _decode_cursor(cursor, sort):
+    try:
+        decoded = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (ValueError, UnicodeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(decoded, list) or len(decoded) != 3 or decoded[0] != sort:
+        raise ValueError("Cursor does not belong to this listing")
+    return decoded[1], decoded[2]
+
+def paginate_playbooks(playbooks, sort='id', descending=False, cursor=None, limit=LIST_PAGE_SIZE, prefix=''):
+    """
+    Get one page of summaries of the playbooks, sorted and filtered.
+    
+    The cursor records the sort key and id of the last playbook returned, so
+    pages stay consistent while playbooks are added or removed between
+    requests. Only the playbooks on the page are summarized.
+    
+    Args:
+        playbooks (dict): Playbooks by ID
+        sort (str): One of SORT_KEYS
+        descending (bool): Sort in descending order
+        cursor (str): next_cursor of the previous page, or None for the first page
+        limit (int): Number of playbooks per page, at most MAX_LIST_PAGE_SIZE
+        prefix (str): Only include playbooks whose ID starts with this
+        
+    Returns:
+        dict: 'playbooks' summaries, 'next_cursor' (None on the last page) and
+        'total' number of playbooks matching the prefix
+        
+    Raises:
+        ValueError: If sort, limit or cursor is invalid
+    """
+    if sort not in SORT_KEYS:
+        raise ValueError(f"Invalid sort, expected one of: {', '.join(SORT_KEYS)}")
+    if limit <= 0 or limit > MAX_LIST_PAGE_SIZE:
+        raise ValueError(f"limit must be between 1 and {MAX_LIST_PAGE_SIZE}")
+    
+    sort_key = SORT_KEYS[sort]
+    # Copied first, as playbooks may be added or removed while this runs
+    items = list(playbooks.items())
+    keys = [(sort_key(playbook), playbook_id) for playbook_id, playbook in items
+            if playbook_id.startswith(prefix)]
+    total = len(keys)
+    if cursor:
+        after = _decode_cursor(cursor, sort)
+        try:
+            keys = [key for key in keys if key < after] if descending else [key for key in keys if key > after]
+        except TypeError:
+            raise ValueError("Invalid cursor")
+    
+    # Selecting one page more than requested tells whether there is a next page,
+    # without sorting every playbook
+    page = (heapq.nlargest if descending else heapq.nsmallest)(limit + 1, keys)
+    more = len(page) > limit
+    page = page[:limit]
+    by_id = dict(items)
+    
+    return {
+        'playbooks': [summarize_playbook(playbook_id, by_id[playbook_id]) for _, playbook_id in page],
+        'next_cursor': _encode_cursor(sort, page[-1]) if more else None,
+        'total': total
+    }
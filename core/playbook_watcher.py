@@ -0,0 +1,347 @@
+"""
+core/playbook_watcher.py
+Watches the playbooks directory and reports changed playbook files in debounced batches.
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import select
+import struct
+import threading
+import time
+from typing import Callable, Dict, Any, List, Optional, Set, Tuple
+
+# Configure logging
+logger = logging.getLogger('commandwave')
+
+WATCH_AUTO = 'auto'
+WATCH_INOTIFY = 'inotify'
+WATCH_POLL = 'poll'
+WATCH_OFF = 'off'
+WATCH_MODES = (WATCH_AUTO, WATCH_INOTIFY, WATCH_POLL, WATCH_OFF)
+
+# Seconds without events before a batch of changes is applied
+DEFAULT_DEBOUNCE = 0.25
+# Longest a batch is held back while events keep arriving, e.g. during a large checkout
+MAX_BATCH_DELAY = 2.0
+# Seconds between scans when polling
+DEFAULT_POLL_INTERVAL = 2.0
+
+# inotify(7) event bits
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = (IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE |
+              IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+_EVENT = struct.Struct('iIII')
+
+# on_change(updated, removed) with absolute paths of playbook files
+ChangeCallback = Callable[[List[str], List[str]], None]
+# File signature compared between scans: (mtime_ns, size)
+Signature = Tuple[int, int]
+
+def _load_libc():
+    """Get libc with the inotify functions, or None where they are unavailable."""
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        libc.inotify_init1
+    except (OSError, AttributeError):
+        return None
+    libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+    return libc
+
+class PlaybookWatcher:
+    """
+    Keeps a snapshot of the playbook files under a directory and reports changes to it.
+
+    With inotify, every directory is watched and the paths named by events are
+    collected; once events stop for the debounce period (or the batch has been
+    held for MAX_BATCH_DELAY), only those paths are stat'ed and compared with
+    the snapshot. Without inotify the whole tree is scanned periodically.
+    Either way a file is reported only if its modification time or size
+    changed, so a large checkout costs one re-parse per file it touched.
+    Hidden directories such as .git are not watched.
+    """
+
+    def __init__(self, directory: str, on_change: ChangeCallback, suffix: str = '.md',
+                 debounce: float = DEFAULT_DEBOUNCE, poll_interval: float = DEFAULT_POLL_INTERVAL):
+        self.directory = os.path.abspath(directory)
+        self.on_change = on_change
+        self.suffix = suffix
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.mode = WATCH_OFF
+
+        self._known: Dict[str, Signature] = {}
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._fd: Optional[int] = None
+        self._libc = None
+        # Watch descriptor <-> directory path
+        self._watches: Dict[int, str] = {}
+        self._watched: Dict[str, int] = {}
+        self.batches = 0
+        self.updated = 0
+        self.removed = 0
+        self.overflows = 0
+
+    def start(self, mode: str = WATCH_AUTO) -> str:
+        """
+        Snapshot the directory and start watching it.
+
+        Returns:
+            str: The mode in use: inotify, poll or off
+        """
+        if self._thread is not None or mode == WATCH_OFF:
+            return self.mode
+
+        self._known = self._scan(self.directory)
+        if mode in (WATCH_AUTO, WATCH_INOTIFY):
+            try:
+                self._start_inotify()
+                self.mode = WATCH_INOTIFY
+            except OSError as e:
+                if mode == WATCH_INOTIFY:
+                    raise
+                logger.warning(f"inotify unavailable ({e}), polling playbooks every {self.poll_interval:g}s")
+        if self.mode != WATCH_INOTIFY:
+            self.mode = WATCH_POLL
+
+        target = self._run_inotify if self.mode == WATCH_INOTIFY else self._run_poll
+        self._thread = threading.Thread(target=target, name='playbook-watcher', daemon=True)
+        self._thread.start()
+        logger.info(f"Watching {self.directory} for playbook changes ({self.mode}, {len(self._known)} files)")
+        return self.mode
+
+    def stop(self) -> None:
+        """Stop watching."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Get the watch mode and how many changes have been applied."""
+        return {
+            'mode': self.mode,
+            'files': len(self._known),
+            'directories': len(self._watched),
+            'batches': self.batches,
+            'updated': self.updated,
+            'removed': self.removed,
+            'overflows': self.overflows
+        }
+
+    def _is_playbook(self, name: str) -> bool:
+        return name.lower().endswith(self.suffix)
+
+    def _scan(self, root: str) -> Dict[str, Signature]:
+        """Signatures of every playbook file under root."""
+        found = {}
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = [name for name in dirnames if not name.startswith('.')]
+            for filename in filenames:
+                if not self._is_playbook(filename):
+                    continue
+                path = os.path.join(dirpath, filename)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                found[path] = (st.st_mtime_ns, st.st_size)
+        return found
+
+    def reconcile(self, paths: Set[str]) -> Tuple[List[str], List[str]]:
+        """
+        Compare the given files and directory trees with the snapshot and report the differences.
+
+        Returns:
+            tuple: (updated, removed) absolute paths
+        """
+        updated: List[str] = []
+        removed: List[str] = []
+        # A directory covers everything under it
+        roots = sorted(paths)
+        covered: List[str] = []
+        for path in roots:
+            if not any(path.startswith(root + os.sep) for root in covered):
+                covered.append(path)
+
+        for path in covered:
+            if os.path.isdir(path):
+                current = self._scan(path)
+                prefix = path + os.sep
+                for known in [known for known in self._known if known.startswith(prefix)]:
+                    if known not in current:
+                        removed.append(known)
+                for file_path, signature in current.items():
+                    if self._known.get(file_path) != signature:
+                        updated.append(file_path)
+                continue
+
+            try:
+                st = os.stat(path)
+                signature = (st.st_mtime_ns, st.st_size)
+            except OSError:
+                signature = None
+            if signature is not None and self._is_playbook(path):
+                if self._known.get(path) != signature:
+                    updated.append(path)
+            else:
+                # Gone: the path itself, or a directory that held playbooks
+                prefix = path + os.sep
+                removed.extend(known for known in self._known
+                               if known == path or known.startswith(prefix))
+
+        for path in removed:
+            self._known.pop(path, None)
+        for path in updated:
+            try:
+                st = os.stat(path)
+                self._known[path] = (st.st_mtime_ns, st.st_size)
+            except OSError:
+                pass
+
+        if updated or removed:
+            self.batches += 1
+            self.updated += len(updated)
+            self.removed += len(removed)
+            try:
+                self.on_change(updated, removed)
+            except Exception as e:
+                logger.error(f"Error applying playbook changes: {e}")
+        return updated, removed
+
+    def _run_poll(self) -> None:
+        """Scan the whole tree periodically."""
+        while not self._stopped.wait(self.poll_interval):
+            try:
+                self.reconcile({self.directory})
+            except Exception as e:
+                logger.error(f"Error scanning playbooks: {e}")
+
+    def _start_inotify(self) -> None:
+        """Open an inotify instance and watch every directory of the tree."""
+        self._libc = _load_libc()
+        if self._libc is None:
+            raise OSError(errno.ENOSYS, "inotify is not available")
+        fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+        self._fd = fd
+        self._watch_tree(self.directory)
+
+    def _watch_tree(self, root: str) -> None:
+        """Add watches for a directory and its subdirectories."""
+        for dirpath, dirnames, _ in os.walk(root):
+            dirnames[:] = [name for name in dirnames if not name.startswith('.')]
+            if dirpath in self._watched:
+                continue
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(dirpath), WATCH_MASK)
+            if wd < 0:
+                error = ctypes.get_errno()
+                if dirpath == self.directory:
+                    raise OSError(error, os.strerror(error))
+                # Vanished already, or out of watches; the next events or overflow rescan cover it
+                logger.warning(f"Cannot watch {dirpath}: {os.strerror(error)}")
+                continue
+            self._watches[wd] = dirpath
+            self._watched[dirpath] = wd
+
+    def _unwatch_tree(self, root: str) -> None:
+        """Drop the watches of a directory that was moved away, and of its subdirectories."""
+        prefix = root + os.sep
+        for path in [path for path in self._watched if path == root or path.startswith(prefix)]:
+            wd = self._watched.pop(path)
+            self._watches.pop(wd, None)
+            self._libc.inotify_rm_watch(self._fd, wd)
+
+    def _run_inotify(self) -> None:
+        """Read inotify events and apply the paths they name in debounced batches."""
+        dirty: Set[str] = set()
+        first_event = last_event = 0.0
+        poller = select.poll()
+        poller.register(self._fd, select.POLLIN)
+
+        while not self._stopped.is_set():
+            if dirty:
+                now = time.monotonic()
+                wait = min(last_event + self.debounce, first_event + MAX_BATCH_DELAY) - now
+                if wait <= 0:
+                    batch, dirty = dirty, set()
+                    try:
+                        self.reconcile(batch)
+                    except Exception as e:
+                        logger.error(f"Error applying playbook changes: {e}")
+                    continue
+            else:
+                wait = 0.5
+            if not poller.poll(wait * 1000):
+                continue
+
+            try:
+                data = os.read(self._fd, 65536)
+            except BlockingIOError:
+                continue
+            except OSError as e:
+                logger.error(f"Error reading inotify events: {e}")
+                return
+
+            now = time.monotonic()
+            if not dirty:
+                first_event = now
+            last_event = now
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = _EVENT.unpack_from(data, offset)
+                name = data[offset + _EVENT.size:offset + _EVENT.size + length].rstrip(b'\0')
+                offset += _EVENT.size + length
+
+                if mask & IN_Q_OVERFLOW:
+                    # Events were lost; fall back to comparing the whole tree
+                    self.overflows += 1
+                    logger.warning("inotify queue overflowed, rescanning playbooks")
+                    self._watch_tree(self.directory)
+                    dirty.add(self.directory)
+                    continue
+                directory = self._watches.get(wd)
+                if directory is None:
+                    continue
+                if mask & IN_IGNORED:
+                    self._watches.pop(wd, None)
+                    if self._watched.get(directory) == wd:
+                        del self._watched[directory]
+                    continue
+                if not name:
+                    continue
+
+                decoded = os.fsdecode(name)
+                path = os.path.join(directory, decoded)
+                if mask & IN_ISDIR:
+                    if decoded.startswith('.'):
+                        continue
+                    if mask & (IN_CREATE | IN_MOVED_TO):
+                        self._watch_tree(path)
+                    elif mask & IN_MOVED_FROM:
+                        self._unwatch_tree(path)
+                    dirty.add(path)
+                elif self._is_playbook(decoded):
+                    dirty.add(path)
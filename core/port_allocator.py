@@ -0,0 +1,137 @@
+"""
+core/port_allocator.py
+Central allocator handing out terminal ports with atomic reserve/release.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Any, List, Optional, Set, Tuple
+
+# Configure logging
+logger = logging.getLogger('commandwave')
+
+# How long a port found busy by a foreign process is skipped before being retried
+FOREIGN_PORT_RETRY_SECONDS = 30
+
+class PortAllocator:
+    """
+    Free-list allocator over a port range.
+
+    Ports are reserved atomically under a lock, so concurrent creates can never be
+    handed the same port. The OS is only probed for the single candidate being
+    reserved; ports held by foreign processes are parked and retried later.
+    """
+
+    def __init__(self, start_port: int, end_port: int,
+                 probe: Optional[Callable[[int], bool]] = None):
+        self.start_port = start_port
+        self.end_port = end_port
+        # probe(port) returns True if nothing is listening on the port
+        self._probe = probe
+
+        self._free: Deque[int] = deque(range(start_port, end_port + 1))
+        self._reserved: Set[int] = set()
+        # Ports found busy by something else: (port, retry_at)
+        self._foreign: Deque[Tuple[int, float]] = deque()
+        self._lock = threading.Lock()
+
+    def _in_range(self, port: int) -> bool:
+        return self.start_port <= port <= self.end_port
+
+    def _recycle_foreign(self) -> None:
+        """Move parked foreign ports whose retry time has passed back to the free list."""
+        now = time.monotonic()
+        while self._foreign and self._foreign[0][1] <= now:
+            port, _ = self._foreign.popleft()
+            self._free.append(port)
+
+    def reserve(self) -> Optional[int]:
+        """
+        Reserve a free port.
+
+        Returns:
+            int: The reserved port, or None if the range is exhausted
+        """
+        while True:
+            with self._lock:
+                self._recycle_foreign()
+                if not self._free:
+                    return None
+                port = self._free.popleft()
+                self._reserved.add(port)
+
+            # Verify lazily, outside the lock, that nobody else bound the port
+            if self._probe is None or self._probe(port):
+                return port
+
+            logger.warning(f"Port {port} is in use by another process, skipping it")
+            with self._lock:
+                self._reserved.discard(port)
+                self._foreign.append((port, time.monotonic() + FOREIGN_PORT_RETRY_SECONDS))
+
+    def reserve_many(self, count: int) -> Optional[List[int]]:
+        """
+        Reserve several free ports at once.
+
+        Returns:
+            list: The reserved ports, or None (with nothing reserved) if the range
+            cannot supply that many
+        """
+        ports: List[int] = []
+        while len(ports) < count:
+            port = self.reserve()
+            if port is None:
+                for reserved in ports:
+                    self.release(reserved)
+                return None
+            ports.append(port)
+        return ports
+
+    def reserve_port(self, port: int) -> bool:
+        """
+        Reserve a specific port, e.g. one adopted from a running process.
+
+        Returns:
+            bool: True if the port is now reserved by the caller
+        """
+        if not self._in_range(port):
+            return False
+
+        with self._lock:
+            if port in self._reserved:
+                return False
+            try:
+                self._free.remove(port)
+            except ValueError:
+                # Parked as foreign; claim it anyway since the caller knows better
+                self._foreign = deque(entry for entry in self._foreign if entry[0] != port)
+            self._reserved.add(port)
+            return True
+
+    def release(self, port: int) -> None:
+        """Return a reserved port to the free list."""
+        if port is None or not self._in_range(port):
+            return
+
+        with self._lock:
+            if port not in self._reserved:
+                return
+            self._reserved.discard(port)
+            self._free.append(port)
+
+    def is_reserved(self, port: int) -> bool:
+        """Check whether a port is currently reserved."""
+        with self._lock:
+            return port in self._reserved
+
+    def stats(self) -> Dict[str, Any]:
+        """Get counts of free, reserved and foreign-held ports."""
+        with self._lock:
+            return {
+                'range': [self.start_port, self.end_port],
+                'free': len(self._free),
+                'reserved': len(self._reserved),
+                'foreign': len(self._foreign)
+            }
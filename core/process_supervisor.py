@@ -0,0 +1,270 @@
+"""
+core/process_supervisor.py
+Single background thread reaping ttyd processes and draining their output pipes.
+"""
+
+import logging
+import os
+import selectors
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Any, List, Optional, Tuple
+
+# Configure logging
+logger = logging.getLogger('commandwave')
+
+# Poll interval for processes that cannot be watched through a pidfd, in seconds
+FALLBACK_POLL_INTERVAL = 1.0
+# Lines of stderr kept per process for crash reports
+STDERR_TAIL_LINES = 20
+
+# Restart backoff: first delay, cap, and consecutive crashes before giving up
+RESTART_BASE_DELAY = 0.5
+RESTART_MAX_DELAY = 30.0
+MAX_CONSECUTIVE_RESTARTS = 5
+# A process that ran at least this long resets the consecutive crash count
+STABLE_UPTIME = 60.0
+
+# callback(process, returncode, stderr_tail)
+ExitCallback = Callable[[Any, Optional[int], List[str]], None]
+
+class _Watched:
+    """Book-keeping for one supervised process."""
+
+    def __init__(self, process, callback: ExitCallback):
+        self.process = process
+        self.callback = callback
+        self.pidfd: Optional[int] = None
+        self.pipes: List[Any] = []
+        self.tail: Deque[str] = deque(maxlen=STDERR_TAIL_LINES)
+        self.partial = b''
+        self.started = time.monotonic()
+
+class ProcessSupervisor:
+    """
+    Waits on every ttyd process from one thread.
+
+    Each process is watched through a pidfd where the kernel supports it, so its
+    exit wakes the thread immediately and it is reaped at once; otherwise the
+    thread falls back to polling. Output pipes are read continuously, so a chatty
+    child can never block on a full pipe, and the last stderr lines are handed to
+    the exit callback.
+    """
+
+    def __init__(self):
+        self._selector = selectors.DefaultSelector()
+        self._watched: Dict[int, _Watched] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+        self.exits = 0
+
+        # Self-pipe waking the thread when the watch set changes
+        self._wake_r, self._wake_w = os.pipe()
+        os.set_blocking(self._wake_r, False)
+        os.set_blocking(self._wake_w, False)
+        self._selector.register(self._wake_r, selectors.EVENT_READ, None)
+
+    def start(self) -> None:
+        """Start the supervisor thread."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='process-supervisor', daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stop supervising; processes are left running."""
+        self._stopped = True
+        self._wake()
+
+    def watch(self, process, callback: ExitCallback) -> None:
+        """Supervise a process and call callback once it exits. Starts the thread on first use."""
+        self.start()
+        watched = _Watched(process, callback)
+        try:
+            watched.pidfd = os.pidfd_open(process.pid)
+        except AttributeError:
+            pass
+        except ProcessLookupError:
+            # Already gone; report it from the thread like any other exit
+            pass
+        except OSError as e:
+            logger.debug(f"pidfd unavailable for pid {process.pid}, polling instead: {e}")
+
+        for pipe in (getattr(process, 'stdout', None), getattr(process, 'stderr', None)):
+            if pipe is not None:
+                os.set_blocking(pipe.fileno(), False)
+                watched.pipes.append(pipe)
+
+        with self._lock:
+            self._watched[process.pid] = watched
+            if watched.pidfd is not None:
+                self._selector.register(watched.pidfd, selectors.EVENT_READ, ('exit', process.pid))
+            for pipe in watched.pipes:
+                self._selector.register(pipe.fileno(), selectors.EVENT_READ, ('pipe', process.pid))
+        self._wake()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get counts of supervised processes and observed exits."""
+        with self._lock:
+            watched = list(self._watched.values())
+        return {
+            'watched': len(watched),
+            'polled': sum(1 for w in watched if w.pidfd is None),
+            'exits': self.exits
+        }
+
+    def _wake(self) -> None:
+        try:
+            os.write(self._wake_w, b'\0')
+        except (BlockingIOError, OSError):
+            pass
+
+    def _run(self) -> None:
+        """Dispatch pidfd and pipe events until stopped."""
+        while not self._stopped:
+            with self._lock:
+                polling = any(w.pidfd is None for w in self._watched.values())
+            events = self._selector.select(FALLBACK_POLL_INTERVAL if polling else None)
+
+            exited: List[int] = []
+            for key, _ in events:
+                if key.data is None:
+                    try:
+                        while os.read(self._wake_r, 512):
+                            pass
+                    except BlockingIOError:
+                        pass
+                    continue
+                kind, pid = key.data
+                if kind == 'pipe':
+                    self._drain(pid, key.fd)
+                else:
+                    exited.append(pid)
+
+            if polling:
+                with self._lock:
+                    exited.extend(pid for pid, w in self._watched.items()
+                                  if w.pidfd is None and w.process.poll() is not None)
+
+            for pid in exited:
+                self._reap(pid)
+
+    def _drain(self, pid: int, fd: int) -> None:
+        """Read whatever a pipe holds, keeping the last lines as the stderr tail."""
+        with self._lock:
+            watched = self._watched.get(pid)
+        if watched is None:
+            return
+        try:
+            data = os.read(fd, 65536)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b''
+
+        if not data:
+            # EOF; the write end is closed
+            self._unregister_fd(fd)
+            return
+
+        lines = (watched.partial + data).split(b'\n')
+        watched.partial = lines.pop()[-4096:]
+        for line in lines:
+            if line.strip():
+                watched.tail.append(line.decode('utf-8', errors='replace').rstrip())
+
+    def _reap(self, pid: int) -> None:
+        """Collect an exited process, release its descriptors and run its callback."""
+        with self._lock:
+            watched = self._watched.pop(pid, None)
+        if watched is None:
+            return
+
+        # Pick up the last words before closing the pipes
+        for pipe in watched.pipes:
+            self._drain_closed(watched, pipe)
+        if watched.pidfd is not None:
+            self._unregister_fd(watched.pidfd)
+            os.close(watched.pidfd)
+
+        returncode = watched.process.poll()
+        if returncode is None:
+            # pidfd fired but the status is not collectable yet
+            try:
+                returncode = watched.process.wait(timeout=1)
+            except Exception:
+                returncode = None
+        self.exits += 1
+
+        try:
+            watched.callback(watched.process, returncode, list(watched.tail))
+        except Exception as e:
+            logger.error(f"Error handling exit of pid {pid}: {e}")
+
+    def _drain_closed(self, watched: _Watched, pipe) -> None:
+        """Drain and close one pipe of an exited process."""
+        fd = pipe.fileno() if not pipe.closed else None
+        if fd is None:
+            return
+        try:
+            while True:
+                data = os.read(fd, 65536)
+                if not data:
+                    break
+                watched.partial += data
+        except OSError:
+            pass
+        for line in watched.partial.split(b'\n'):
+            if line.strip():
+                watched.tail.append(line.decode('utf-8', errors='replace').rstrip())
+        watched.partial = b''
+        self._unregister_fd(fd)
+        pipe.close()
+
+    def _unregister_fd(self, fd: int) -> None:
+        with self._lock:
+            try:
+                self._selector.unregister(fd)
+            except (KeyError, ValueError):
+                pass
+
+class RestartBackoff:
+    """Exponential restart delays per key, reset once a process stays up."""
+
+    def __init__(self, base: float = RESTART_BASE_DELAY, cap: float = RESTART_MAX_DELAY,
+                 max_restarts: int = MAX_CONSECUTIVE_RESTARTS):
+        self.base = base
+        self.cap = cap
+        self.max_restarts = max_restarts
+        self._crashes: Dict[str, Tuple[int, float]] = {}
+        self._lock = threading.Lock()
+
+    def next_delay(self, key: str, uptime: Optional[float] = None) -> Optional[float]:
+        """
+        Record a crash and get the delay before the next restart.
+
+        Returns:
+            float: Seconds to wait, or None once the process keeps crashing and should be given up
+        """
+        with self._lock:
+            count, _ = self._crashes.get(key, (0, 0.0))
+            if uptime is not None and uptime >= STABLE_UPTIME:
+                count = 0
+            count += 1
+            self._crashes[key] = (count, time.monotonic())
+        if count > self.max_restarts:
+            return None
+        return min(self.cap, self.base * 2 ** (count - 1))
+
+    def restarts(self, key: str) -> int:
+        """Get the number of consecutive crashes recorded for a key."""
+        with self._lock:
+            return self._crashes.get(key, (0, 0.0))[0]
+
+    def forget(self, key: str) -> None:
+        """Drop the crash history of a key."""
+        with self._lock:
+            self._crashes.pop(key, None)
@@ -0,0 +1,276 @@
+"""
+core/resource_monitor.py
+Background sampler of the CPU, memory and file descriptors used by each terminal's processes.
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Any, List, Optional
+
+from core.tmux_control import tmux_client, TmuxError
+
+# Configure logging
+logger = logging.getLogger('commandwave')
+
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK')
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+# Samples between recounts of the descriptors of a process that used no CPU
+FD_RECOUNT_SAMPLES = 10
+# Smallest changes pushed to clients as a delta
+CPU_DELTA = 0.5
+RSS_DELTA = 1024 * 1024
+
+# terminals() -> terminal id to tmux session name, for the terminals to sample
+TerminalSessions = Callable[[], Dict[str, str]]
+# on_update(changed, removed) with the stats of terminals that changed noticeably
+UpdateCallback = Callable[[Dict[str, Dict[str, Any]], List[str]], None]
+
+class _Process:
+    """A process being followed, with its /proc files kept open."""
+
+    __slots__ = ('pid', 'stat_fd', 'children_fd', 'comm', 'ticks', 'cpu_percent',
+                 'rss', 'threads', 'fds', 'fds_age', 'children')
+
+    def __init__(self, pid: int):
+        self.pid = pid
+        # Re-read with pread on every sample; reads fail once the process is gone,
+        # even if its pid was reused
+        self.stat_fd = os.open(f'/proc/{pid}/stat', os.O_RDONLY)
+        try:
+            self.children_fd: Optional[int] = os.open(f'/proc/{pid}/task/{pid}/children', os.O_RDONLY)
+        except OSError:
+            self.children_fd = None
+        self.comm = ''
+        self.ticks: Optional[int] = None
+        self.cpu_percent = 0.0
+        self.rss = 0
+        self.threads = 1
+        self.fds = 0
+        self.fds_age = FD_RECOUNT_SAMPLES
+        self.children: List[int] = []
+
+    def close(self) -> None:
+        for fd in (self.stat_fd, self.children_fd):
+            if fd is not None:
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+
+class ResourceMonitor:
+    """
+    Samples the resources used by the processes of every terminal.
+
+    One tmux query per sample lists the process of every pane; each pane's
+    process tree is then followed through the children files in /proc. The
+    /proc files of known processes stay open and are re-read in place, and the
+    descriptors of a process are only recounted when it used CPU since the last
+    sample (or every few samples), so a sample costs a few reads per process.
+    Terminals whose usage changed noticeably are reported through on_update.
+    An interval of 0 disables sampling.
+    """
+
+    def __init__(self, terminals: TerminalSessions, interval: float = 0,
+                 on_update: Optional[UpdateCallback] = None):
+        self._terminals = terminals
+        self.interval = float(interval)
+        self.on_update = on_update
+
+        self._processes: Dict[int, _Process] = {}
+        # terminal_id -> latest stats
+        self._stats: Dict[str, Dict[str, Any]] = {}
+        # terminal_id -> stats last reported through on_update
+        self._reported: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_sample: Optional[float] = None
+        self.samples = 0
+        self.sample_seconds = 0.0
+
+    def start(self) -> None:
+        """Start the background sampling thread."""
+        if self._thread is not None or self.interval <= 0:
+            return
+        self._thread = threading.Thread(target=self._run, name='resource-monitor', daemon=True)
+        self._thread.start()
+        logger.info(f"Resource monitor started (every {self.interval:g}s)")
+
+    def stop(self) -> None:
+        """Stop sampling and close the /proc files."""
+        self._stopped.set()
+        with self._lock:
+            for process in self._processes.values():
+                process.close()
+            self._processes.clear()
+
+    def get(self, terminal_id: str) -> Optional[Dict[str, Any]]:
+        """Get the latest stats of a terminal, or None if it has not been sampled."""
+        with self._lock:
+            return self._stats.get(terminal_id)
+
+    def all(self) -> Dict[str, Dict[str, Any]]:
+        """Get the latest stats of every terminal."""
+        with self._lock:
+            return dict(self._stats)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get the interval, sample count and the sampler's own cost."""
+        with self._lock:
+            processes = len(self._processes)
+        return {
+            'interval': self.interval,
+            'samples': self.samples,
+            'processes': processes,
+            'average_sample_ms': self.sample_seconds / self.samples * 1000 if self.samples else 0.0
+        }
+
+    def sample(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Sample every terminal once.
+
+        Returns:
+            dict: Terminal id to its cpu_percent, rss_bytes, open_fds, process
+            count and busiest process
+        """
+        started = time.monotonic()
+        cpu_started = time.thread_time()
+        elapsed = started - self._last_sample if self._last_sample else None
+        self._last_sample = started
+
+        panes: Dict[str, List[int]] = {}
+        for line in tmux_client.run('list-panes', '-a', '-F', '#{session_name}\t#{pane_pid}'):
+            session, _, pid = line.rpartition('\t')
+            if pid.isdigit():
+                panes.setdefault(session, []).append(int(pid))
+
+        with self._lock:
+            seen = set()
+            stats = {}
+            for terminal_id, session in self._terminals().items():
+                totals = {'cpu_percent': 0.0, 'rss_bytes': 0, 'open_fds': 0, 'processes': 0, 'top': None}
+                busiest = None
+                stack = list(panes.get(session, ()))
+                while stack:
+                    pid = stack.pop()
+                    if pid in seen:
+                        continue
+                    seen.add(pid)
+                    process = self._read(pid, elapsed)
+                    if process is None:
+                        continue
+                    stack.extend(process.children)
+                    totals['cpu_percent'] += process.cpu_percent
+                    totals['rss_bytes'] += process.rss
+                    totals['open_fds'] += process.fds
+                    totals['processes'] += 1
+                    if busiest is None or process.cpu_percent > busiest.cpu_percent:
+                        busiest = process
+                if busiest is not None:
+                    totals['top'] = {'pid': busiest.pid, 'command': busiest.comm,
+                                     'cpu_percent': round(busiest.cpu_percent, 1)}
+                totals['cpu_percent'] = round(totals['cpu_percent'], 1)
+                stats[terminal_id] = totals
+
+            # Close the files of processes that exited or left every terminal
+            for pid in [pid for pid in self._processes if pid not in seen]:
+                self._processes.pop(pid).close()
+            self._stats = stats
+
+        self.samples += 1
+        self.sample_seconds += time.thread_time() - cpu_started
+        self._publish(stats)
+        return stats
+
+    def _read(self, pid: int, elapsed: Optional[float]) -> Optional[_Process]:
+        """Refresh a process from /proc, opening its files the first time it is seen."""
+        process = self._processes.get(pid)
+        for _ in range(2):
+            try:
+                if process is None:
+                    process = self._processes[pid] = _Process(pid)
+                stat = os.pread(process.stat_fd, 1024, 0)
+                break
+            except OSError:
+                # Gone, or the pid now belongs to a new process; try that one once
+                if process is not None:
+                    self._processes.pop(pid, None)
+                    process.close()
+                    process = None
+        else:
+            return None
+
+        # The command name is in parentheses and may contain spaces
+        close_paren = stat.rfind(b')')
+        process.comm = stat[stat.find(b'(') + 1:close_paren].decode('utf-8', errors='replace')
+        fields = stat[close_paren + 2:].split()
+        ticks = int(fields[11]) + int(fields[12])
+        process.threads = int(fields[17])
+        process.rss = int(fields[21]) * PAGE_SIZE
+
+        busy = process.ticks is None or ticks != process.ticks
+        if process.ticks is not None and elapsed:
+            process.cpu_percent = (ticks - process.ticks) / CLOCK_TICKS / elapsed * 100
+        process.ticks = ticks
+
+        process.fds_age += 1
+        if busy or process.fds_age >= FD_RECOUNT_SAMPLES:
+            try:
+                process.fds = len(os.listdir(f'/proc/{pid}/fd'))
+            except OSError:
+                pass
+            process.fds_age = 0
+
+        process.children = self._children(process)
+        return process
+
+    @staticmethod
+    def _children(process: _Process) -> List[int]:
+        """List the child processes of a process, across all of its threads."""
+        if process.children_fd is None:
+            return []
+        try:
+            data = os.pread(process.children_fd, 65536, 0)
+            if process.threads > 1:
+                # Children forked by other threads are listed under those threads
+                for tid in os.listdir(f'/proc/{process.pid}/task'):
+                    if tid != str(process.pid):
+                        with open(f'/proc/{process.pid}/task/{tid}/children', 'rb') as f:
+                            data += b' ' + f.read()
+        except OSError:
+            return []
+        return [int(pid) for pid in data.split()]
+
+    def _publish(self, stats: Dict[str, Dict[str, Any]]) -> None:
+        """Report terminals whose usage changed noticeably, and terminals that went away."""
+        changed = {}
+        for terminal_id, current in stats.items():
+            previous = self._reported.get(terminal_id)
+            if (previous is None or
+                    abs(current['cpu_percent'] - previous['cpu_percent']) >= CPU_DELTA or
+                    abs(current['rss_bytes'] - previous['rss_bytes']) >= RSS_DELTA or
+                    current['open_fds'] != previous['open_fds'] or
+                    current['processes'] != previous['processes']):
+                changed[terminal_id] = current
+        removed = [terminal_id for terminal_id in self._reported if terminal_id not in stats]
+
+        for terminal_id in removed:
+            del self._reported[terminal_id]
+        self._reported.update(changed)
+        if (changed or removed) and self.on_update:
+            try:
+                self.on_update(changed, removed)
+            except Exception as e:
+                logger.error(f"Error publishing terminal resource usage: {e}")
+
+    def _run(self) -> None:
+        """Sample periodically until stopped."""
+        while not self._stopped.wait(self.interval):
+            try:
+                self.sample()
+            except TmuxError as e:
+                logger.warning(f"Error listing tmux panes for resource sampling: {e}")
+            except Exception as e:
+                logger.error(f"Error sampling terminal resource usage: {e}")
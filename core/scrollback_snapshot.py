@@ -0,0 +1,307 @@
+"""
+core/scrollback_snapshot.py
+Cached, incremental snapshots of terminal screens and scrollback.
+"""
+
+import logging
+import threading
+import uuid
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+from core.tmux_control import tmux_client
+
+# Configure logging
+logger = logging.getLogger('commandwave')
+
+# Pane state read before every capture; cheap next to capturing the history
+_PROBE_FORMAT = '#{history_size} #{history_limit} #{pane_height} #{pane_width} #{cursor_x} #{cursor_y}'
+# Attempts at an incremental capture before falling back to a full one
+MAX_INCREMENTAL_ATTEMPTS = 3
+
+# output_offset(terminal_id) -> bytes of output captured so far, or None if not captured
+OutputOffset = Callable[[str], Optional[int]]
+
+class _PaneState:
+    """What the probe reports about a pane."""
+
+    __slots__ = ('history_size', 'history_limit', 'height', 'width', 'cursor_x', 'cursor_y')
+
+    def __init__(self, line: str):
+        fields = [int(field) for field in line.split()]
+        (self.history_size, self.history_limit, self.height,
+         self.width, self.cursor_x, self.cursor_y) = fields
+
+    def key(self) -> Tuple[int, ...]:
+        return (self.history_size, self.history_limit, self.height,
+                self.width, self.cursor_x, self.cursor_y)
+
+class _Snapshot:
+    """The last capture of one pane, and the version each line last changed in."""
+
+    def __init__(self):
+        # Tells this snapshot's versions from those of an earlier terminal with the same id
+        self.generation = uuid.uuid4().hex[:12]
+        self.version = 0
+        # Oldest version a delta can be computed from; older clients get everything
+        self.base_version = 0
+        self.lines: List[str] = []
+        self.changed: List[int] = []
+        # History lines tmux has dropped off the top; line numbers start after them
+        self.dropped = 0
+        self.state: Optional[_PaneState] = None
+        self.output_offset: Optional[int] = None
+        self.lock = threading.Lock()
+
+class SnapshotCache:
+    """
+    Serves terminal snapshots from a per-pane cache, capturing only what changed.
+
+    Lines are numbered from the first history line ever seen, followed by the
+    visible screen, so a line keeps its number while tmux drops older history.
+    A poll first probes the pane's history size and cursor; new history lines
+    are then captured on their own (tmux appends them at the end), along with
+    the visible screen, instead of the whole history. Every line remembers the
+    version it last changed in, so a client holding version v receives only the
+    lines changed after v. Versions start over with a new snapshot, whose
+    generation differs, so a version is only meaningful with its generation.
+
+    When the terminal's output is being captured, an unchanged output offset
+    proves nothing was printed and the cached snapshot is returned without
+    talking to tmux at all.
+    """
+
+    def __init__(self, output_offset: Optional[OutputOffset] = None):
+        self._output_offset = output_offset
+        self._snapshots: Dict[str, _Snapshot] = {}
+        self._lock = threading.Lock()
+        self.probes = 0
+        self.full_captures = 0
+        self.incremental_captures = 0
+        self.cache_hits = 0
+
+    def snapshot(self, terminal_id: str, tmux_session: str, since: Optional[int] = None,
+                 generation: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Get a terminal's lines, or only those changed since a version.
+
+        Args:
+            terminal_id: The terminal
+            tmux_session: The terminal's tmux session
+            since: Version the client already has
+            generation: Generation of that version; every line is returned if it is not the current one
+
+        Returns:
+            dict: generation, version, line count, cursor and either every line
+            ('lines') or the changed ones ('changes', index to text)
+
+        Raises:
+            TmuxError: If the pane cannot be captured
+        """
+        with self._lock:
+            snap = self._snapshots.setdefault(terminal_id, _Snapshot())
+
+        with snap.lock:
+            self._refresh(terminal_id, tmux_session, snap)
+            return self._describe(snap, since, generation)
+
+    def version(self, terminal_id: str, tmux_session: str) -> int:
+        """Bring a terminal's snapshot up to date and get its version."""
+        with self._lock:
+            snap = self._snapshots.setdefault(terminal_id, _Snapshot())
+        with snap.lock:
+            self._refresh(terminal_id, tmux_session, snap)
+            return snap.version
+
+    def lines(self, terminal_id: str, tmux_session: str) -> Tuple[int, List[str]]:
+        """
+        Bring a terminal's snapshot up to date and get its lines.
+
+        Returns:
+            tuple: The number of the first line, and the lines; the list must not be modified
+        """
+        with self._lock:
+            snap = self._snapshots.setdefault(terminal_id, _Snapshot())
+        with snap.lock:
+            self._refresh(terminal_id, tmux_session, snap)
+            return snap.dropped, snap.lines
+
+    def discard(self, terminal_id: str) -> None:
+        """Drop the cached snapshot of a terminal."""
+        with self._lock:
+            self._snapshots.pop(terminal_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get cache and capture counts."""
+        with self._lock:
+            cached = len(self._snapshots)
+        return {
+            'cached': cached,
+            'cache_hits': self.cache_hits,
+            'probes': self.probes,
+            'incremental_captures': self.incremental_captures,
+            'full_captures': self.full_captures
+        }
+
+    def _refresh(self, terminal_id: str, tmux_session: str, snap: _Snapshot) -> None:
+        """Update a snapshot from its pane, capturing as little as possible. Caller holds snap.lock."""
+        offset = self._output_offset(terminal_id) if self._output_offset else None
+        if offset is not None and snap.state is not None and offset == snap.output_offset:
+            # Nothing printed since the last capture
+            self.cache_hits += 1
+            return
+
+        target = ['-t', tmux_session]
+        state = self._probe(target)
+        if snap.state is not None and self._incremental(target, snap, state):
+            snap.output_offset = offset
+            return
+        self._full(target, snap)
+        snap.output_offset = offset
+
+    def _probe(self, target: List[str]) -> _PaneState:
+        self.probes += 1
+        return _PaneState(tmux_client.run('display-message', '-p', *target, _PROBE_FORMAT)[0])
+
+    def _incremental(self, target: List[str], snap: _Snapshot, state: _PaneState) -> bool:
+        """
+        Capture new history lines and the visible screen.
+
+        Returns:
+            bool: False if the history was cleared, trimmed or resized, which
+            needs a full capture
+        """
+        for _ in range(MAX_INCREMENTAL_ATTEMPTS):
+            old = snap.state
+            grown = state.history_size - old.history_size
+            if (grown < 0 or state.width != old.width or
+                    # Near the limit tmux drops a tenth of the history at once, so
+                    # the size alone cannot tell how many lines are new
+                    state.history_size >= state.history_limit * 9 // 10 - 1):
+                return False
+
+            # New history lines, plus the last line already held as an anchor, and
+            # the screen below them; then a probe proving nothing moved meanwhile
+            anchored = 1 if old.history_size else 0
+            start = f'-{grown + anchored}' if grown + anchored else '0'
+            capture, check = tmux_client.submit_many([
+                ['capture-pane', '-p', *target, '-S', start, '-E', '-'],
+                ['display-message', '-p', *target, _PROBE_FORMAT]
+            ])
+            lines = capture.result()
+            after = _PaneState(check.result()[0])
+            self.probes += 1
+            if after.key() != state.key():
+                state = after
+                continue
+            if anchored and (not lines or lines[0] != snap.lines[old.history_size - 1]):
+                # The history was cleared and grew back
+                return False
+
+            self.incremental_captures += 1
+            keep = old.history_size
+            new_lines = lines[anchored:anchored + grown + state.height]
+            self._apply(snap, snap.lines[:keep] + new_lines, state, keep)
+            return True
+        return False
+
+    def _full(self, target: List[str], snap: _Snapshot) -> None:
+        """Capture the whole history and screen."""
+        for _ in range(MAX_INCREMENTAL_ATTEMPTS):
+            before, capture, after = tmux_client.submit_many([
+                ['display-message', '-p', *target, _PROBE_FORMAT],
+                ['capture-pane', '-p', *target, '-S', '-', '-E', '-'],
+                ['display-message', '-p', *target, _PROBE_FORMAT]
+            ])
+            state = _PaneState(before.result()[0])
+            lines = capture.result()
+            self.probes += 2
+            if _PaneState(after.result()[0]).key() == state.key():
+                break
+        self.full_captures += 1
+        lines = lines[:state.history_size + state.height]
+
+        previous = snap.state
+        dropped = None
+        if previous is not None and state.width == previous.width:
+            dropped = self._dropped_lines(snap.lines[:previous.history_size], lines[:state.history_size])
+        if dropped is None:
+            # History was cleared or rewrapped; line numbers start over and deltas with them
+            self._apply(snap, lines, state, 0, rebase=True)
+            return
+        snap.dropped += dropped
+        snap.lines = snap.lines[dropped:]
+        snap.changed = snap.changed[dropped:]
+        self._apply(snap, lines, state, 0)
+
+    @staticmethod
+    def _dropped_lines(old_history: List[str], new_history: List[str]) -> Optional[int]:
+        """
+        Work out how many lines tmux dropped from the top of a history.
+
+        Returns:
+            int: Lines dropped, or None if the old history is not a prefix of the new one
+        """
+        if not old_history:
+            return 0
+        anchor = old_history[-1]
+        # The old last line reappears at some position; take the one dropping the fewest lines
+        for index in range(len(new_history) - 1, -1, -1):
+            dropped = len(old_history) - 1 - index
+            if dropped < 0 or new_history[index] != anchor:
+                continue
+            if old_history[dropped:] == new_history[:index + 1]:
+                return dropped
+        return None
+
+    def _apply(self, snap: _Snapshot, lines: List[str], state: _PaneState,
+               unchanged_prefix: int, rebase: bool = False) -> None:
+        """Install new lines, bumping the version if anything differs."""
+        old_lines = snap.lines
+        changed_any = rebase or len(lines) != len(old_lines)
+        new_version = snap.version + 1
+        changed = snap.changed[:unchanged_prefix]
+        for index in range(unchanged_prefix, len(lines)):
+            if not rebase and index < len(old_lines) and old_lines[index] == lines[index]:
+                changed.append(snap.changed[index])
+            else:
+                changed.append(new_version)
+                changed_any = True
+
+        if state.key() != (snap.state.key() if snap.state else None):
+            # The cursor moved even if no text changed
+            changed_any = True
+
+        snap.state = state
+        if not changed_any:
+            return
+        snap.version = new_version
+        if rebase:
+            snap.base_version = new_version
+        snap.lines = lines
+        snap.changed = changed
+
+    def _describe(self, snap: _Snapshot, since: Optional[int], generation: Optional[str]) -> Dict[str, Any]:
+        """Build the response for a client holding version since of a generation."""
+        state = snap.state
+        result = {
+            'generation': snap.generation,
+            'version': snap.version,
+            'first_line': snap.dropped,
+            'total_lines': len(snap.lines),
+            'history_size': state.history_size,
+            'height': state.height,
+            'width': state.width,
+            'cursor': {'x': state.cursor_x, 'y': state.cursor_y}
+        }
+        if (since is None or generation != snap.generation or
+                since < snap.base_version or since > snap.version):
+            result['full'] = True
+            result['lines'] = list(snap.lines)
+        else:
+            result['full'] = False
+            result['changes'] = {
+                str(snap.dropped + index): line
+                for index, (line, version) in enumerate(zip(snap.lines, snap.changed))
+                if version > since
+            }
+        return result
@@ -0,0 +1,141 @@
+"""
+core/session_store.py
+Persistence of terminal metadata across restarts, and adoption of surviving ttyd processes.
+"""
+
+import json
+import logging
+import os
+import signal
+import subprocess
+import threading
+import time
+from typing import Dict, Any, List, Optional
+
+# Configure logging
+logger = logging.getLogger('commandwave')
+
+class SessionStore:
+    """
+    Small JSON file recording the terminals of the running server.
+
+    tmux keeps the shells alive across a restart, but not what CommandWave knows
+    about them (tab names, creation time, which ttyd served them). The store keeps
+    that, keyed by terminal id, so the terminal registry can be rebuilt on startup.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def load(self) -> Dict[str, Dict[str, Any]]:
+        """Load the stored terminals, or an empty dict if there are none."""
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable terminal registry {self.path}: {e}")
+            return {}
+
+    def save(self, terminals: Dict[str, Dict[str, Any]]) -> None:
+        """Atomically replace the stored terminals."""
+        temp_path = f"{self.path}.tmp"
+        with self._lock:
+            try:
+                with open(temp_path, 'w') as f:
+                    json.dump(terminals, f, indent=2)
+                os.replace(temp_path, self.path)
+            except OSError as e:
+                logger.error(f"Failed to save terminal registry {self.path}: {e}")
+
+class AdoptedProcess:
+    """
+    Popen-like handle for a ttyd process started by a previous server run.
+
+    The process is not our child, so it is polled and signalled by pid.
+    """
+
+    def __init__(self, pid: int):
+        self.pid = pid
+        self.returncode: Optional[int] = None
+        self.startup_seconds = None
+
+    def poll(self) -> Optional[int]:
+        if self.returncode is None and not _pid_alive(self.pid):
+            # The real exit status belongs to whoever reaps the process
+            self.returncode = 0
+        return self.returncode
+
+    def wait(self, timeout: Optional[float] = None) -> int:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.poll() is None:
+            if deadline is not None and time.monotonic() >= deadline:
+                raise subprocess.TimeoutExpired(f'ttyd (pid {self.pid})', timeout)
+            time.sleep(0.02)
+        return self.returncode
+
+    def send_signal(self, sig: int) -> None:
+        if self.poll() is None:
+            try:
+                os.kill(self.pid, sig)
+            except ProcessLookupError:
+                pass
+
+    def terminate(self) -> None:
+        self.send_signal(signal.SIGTERM)
+
+    def kill(self) -> None:
+        self.send_signal(signal.SIGKILL)
+
+def _pid_alive(pid: int) -> bool:
+    """Check whether a process exists and is not a zombie."""
+    try:
+        with open(f'/proc/{pid}/stat', 'r') as f:
+            # The state follows the parenthesised command name
+            return f.read().rsplit(')', 1)[1].split()[0] != 'Z'
+    except (OSError, IndexError):
+        try:
+            os.kill(pid, 0)
+            return True
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+
+def _process_args(pid: int) -> List[str]:
+    """Get the command line of a process, or an empty list if it is gone."""
+    try:
+        with open(f'/proc/{pid}/cmdline', 'rb') as f:
+            return [arg.decode('utf-8', errors='replace') for arg in f.read().split(b'\0') if arg]
+    except OSError:
+        return []
+
+def adopt_ttyd(pid: Optional[int], port: Optional[int] = None,
+               socket_path: Optional[str] = None) -> Optional[AdoptedProcess]:
+    """
+    Take over a ttyd left running by a previous server run.
+
+    The pid is only trusted if it still belongs to a ttyd bound to the recorded
+    port or socket, so a recycled pid is never signalled.
+
+    Returns:
+        AdoptedProcess: A handle to the running ttyd, or None if it cannot be adopted
+    """
+    if not pid:
+        return None
+
+    args = _process_args(pid)
+    if not args or os.path.basename(args[0]) != 'ttyd' or not _pid_alive(pid):
+        return None
+
+    if socket_path:
+        bound = socket_path in args
+    else:
+        bound = port is not None and str(port) in args
+    if not bound:
+        return None
+
+    return AdoptedProcess(pid)
@@ -0,0 +1,175 @@
+"""
+core/terminal_pool.py
+Pool of pre-spawned tmux+ttyd pairs that new terminal requests can claim instantly.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Any, Optional, List
+
+# Configure logging
+logger = logging.getLogger('commandwave')
+
+# Default number of warm terminals kept ready
+DEFAULT_POOL_SIZE = 2
+
+class TerminalPool:
+    """Keeps a configurable number of warm terminal backends topped up in the background."""
+
+    def __init__(self, spawn: Callable[[], Optional[Dict[str, Any]]],
+                 discard: Callable[[Dict[str, Any]], None],
+                 size: int = DEFAULT_POOL_SIZE):
+        # spawn() returns a backend dict ({port, process, tmux_session}) or None on failure
+        self._spawn = spawn
+        # discard(entry) tears down a backend that is no longer needed
+        self._discard = discard
+        self.size = max(0, int(size))
+
+        # Ready backends, claimed from the left and appended on the right
+        self._ready: Deque[Dict[str, Any]] = deque()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+
+        # Counters exposed through stats()
+        self.hits = 0
+        self.misses = 0
+        self.refills = 0
+        self.refill_failures = 0
+        self._refill_total = 0.0
+        self._last_refill = None
+
+    def start(self) -> None:
+        """Start the background refill thread."""
+        if self._thread is not None:
+            return
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name='terminal-pool', daemon=True)
+        self._thread.start()
+        self._wakeup.set()
+        logger.info(f"Terminal pool started with size {self.size}")
+
+    def acquire(self) -> Optional[Dict[str, Any]]:
+        """
+        Claim a ready backend from the pool.
+        Returns the backend dict, or None if the pool is empty and the caller must cold spawn.
+        """
+        with self._lock:
+            entry = self._ready.popleft() if self._ready else None
+            if entry is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+        # Either way the pool is now short, so schedule a top-up
+        self._wakeup.set()
+        return entry
+
+    def acquire_many(self, count: int) -> List[Dict[str, Any]]:
+        """
+        Claim up to count ready backends from the pool.
+        Returns the backends claimed; the caller cold spawns the rest.
+        """
+        with self._lock:
+            entries = [self._ready.popleft() for _ in range(min(count, len(self._ready)))]
+            self.hits += len(entries)
+            self.misses += count - len(entries)
+
+        # The pool is now short, so schedule a top-up
+        self._wakeup.set()
+        return entries
+
+    def resize(self, size: int) -> None:
+        """Change the target pool size, discarding surplus backends."""
+        surplus: List[Dict[str, Any]] = []
+        with self._lock:
+            self.size = max(0, int(size))
+            while len(self._ready) > self.size:
+                surplus.append(self._ready.pop())
+
+        for entry in surplus:
+            self._discard(entry)
+
+        self._wakeup.set()
+        logger.info(f"Terminal pool resized to {self.size}")
+
+    def shutdown(self, discard: bool = True) -> List[Dict[str, Any]]:
+        """
+        Stop refilling and empty the pool.
+
+        Backends still waiting are torn down, or returned to the caller untouched
+        when discard is False so it can tear them down together with others.
+        """
+        self._stopped = True
+        self._wakeup.set()
+
+        with self._lock:
+            entries = list(self._ready)
+            self._ready.clear()
+
+        if not discard:
+            return entries
+
+        for entry in entries:
+            self._discard(entry)
+        return []
+
+    def stats(self) -> Dict[str, Any]:
+        """Get pool size, hit/miss counts and refill latency."""
+        with self._lock:
+            ready = len(self._ready)
+
+        return {
+            'size': self.size,
+            'ready': ready,
+            'hits': self.hits,
+            'misses': self.misses,
+            'refills': self.refills,
+            'refill_failures': self.refill_failures,
+            'last_refill_seconds': self._last_refill,
+            'avg_refill_seconds': (self._refill_total / self.refills) if self.refills else None
+        }
+
+    def _run(self) -> None:
+        """Background loop that spawns backends until the pool is full again."""
+        while not self._stopped:
+            self._wakeup.wait()
+            self._wakeup.clear()
+
+            while not self._stopped:
+                with self._lock:
+                    if len(self._ready) >= self.size:
+                        break
+
+                started = time.monotonic()
+                try:
+                    entry = self._spawn()
+                except Exception as e:
+                    logger.error(f"Error spawning pooled terminal: {e}")
+                    entry = None
+                elapsed = time.monotonic() - started
+
+                if entry is None:
+                    # Back off instead of hammering a failing spawn path
+                    self.refill_failures += 1
+                    self._wakeup.wait(timeout=5)
+                    self._wakeup.clear()
+                    continue
+
+                self.refills += 1
+                self._refill_total += elapsed
+                self._last_refill = elapsed
+
+                with self._lock:
+                    keep = not self._stopped and len(self._ready) < self.size
+                    if keep:
+                        self._ready.append(entry)
+
+                if keep:
+                    logger.debug(f"Pooled terminal {entry['tmux_session']} ready ({elapsed:.3f}s)")
+                else:
+                    # Pool was shrunk or stopped while we were spawning
+                    self._discard(entry)
@@ -0,0 +1,166 @@
+"""
+core/terminal_registry.py
+Registry of terminals with copy-on-write snapshots and per-terminal locks.
+"""
+
+import logging
+import threading
+from types import MappingProxyType
+from typing import Any, Dict, Iterator, Mapping, Optional, Tuple
+
+# Configure logging
+logger = logging.getLogger('commandwave')
+
+# Terminal lifecycle states
+STATE_READY = 'ready'      # Usable
+STATE_CLOSING = 'closing'  # Being torn down; no longer offered to clients
+
+class TerminalRegistry:
+    """
+    Map of terminal id to terminal entry.
+
+    Entries are read-only mappings that are replaced, never mutated, so readers
+    work on a consistent snapshot without taking any lock. The registry lock only
+    guards the short map updates; slow work on a terminal (starting or stopping
+    ttyd, tearing it down) is serialised by that terminal's own lock instead, so
+    one slow teardown never stalls listing, creating or renaming other terminals.
+    """
+
+    def __init__(self):
+        # Guards map mutations only; never held across process or tmux work
+        self.lock = threading.Lock()
+        self._entries: Dict[str, Mapping[str, Any]] = {}
+        self._entry_locks: Dict[str, threading.RLock] = {}
+        self._snapshot: Mapping[str, Mapping[str, Any]] = MappingProxyType({})
+
+    def _publish(self) -> None:
+        """Swap in a new immutable snapshot. Caller holds the lock."""
+        self._snapshot = MappingProxyType(dict(self._entries))
+
+    # Lock-free reads, all served from the current snapshot
+
+    def snapshot(self) -> Mapping[str, Mapping[str, Any]]:
+        """Get an immutable view of every terminal at this instant."""
+        return self._snapshot
+
+    def get(self, terminal_id: str, default=None) -> Optional[Mapping[str, Any]]:
+        return self._snapshot.get(terminal_id, default)
+
+    def __getitem__(self, terminal_id: str) -> Mapping[str, Any]:
+        return self._snapshot[terminal_id]
+
+    def __contains__(self, terminal_id: object) -> bool:
+        return terminal_id in self._snapshot
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._snapshot)
+
+    def __len__(self) -> int:
+        return len(self._snapshot)
+
+    def keys(self):
+        return self._snapshot.keys()
+
+    def items(self):
+        return self._snapshot.items()
+
+    def values(self):
+        return self._snapshot.values()
+
+    # Mutations
+
+    def insert(self, terminal_id: str, entry: Dict[str, Any],
+               state: str = STATE_READY, replace: bool = True) -> Optional[Mapping[str, Any]]:
+        """
+        Register a terminal, replacing any previous entry with the same id.
+
+        With replace False an existing entry is kept and None is returned instead.
+        """
+        frozen = MappingProxyType({**entry, 'state': state})
+        with self.lock:
+            if not replace and terminal_id in self._entries:
+                return None
+            self._entries[terminal_id] = frozen
+            self._entry_locks.setdefault(terminal_id, threading.RLock())
+            self._publish()
+        return frozen
+
+    def setdefault(self, terminal_id: str, entry: Dict[str, Any]) -> Mapping[str, Any]:
+        """Register a terminal unless one with the same id already exists."""
+        with self.lock:
+            if terminal_id in self._entries:
+                return self._entries[terminal_id]
+            frozen = MappingProxyType({'state': STATE_READY, **entry})
+            self._entries[terminal_id] = frozen
+            self._entry_locks.setdefault(terminal_id, threading.RLock())
+            self._publish()
+        return frozen
+
+    def update(self, terminal_id: str, expect: Optional[Dict[str, Any]] = None,
+               **fields: Any) -> Optional[Mapping[str, Any]]:
+        """
+        Replace fields of a terminal's entry.
+
+        Args:
+            terminal_id: The terminal to update
+            expect: Only update if these fields still hold the same objects
+            fields: The new field values
+
+        Returns:
+            The new entry, or None if the terminal is gone or expect did not match
+        """
+        with self.lock:
+            entry = self._entries.get(terminal_id)
+            if entry is None:
+                return None
+            if expect and any(entry.get(key) is not value for key, value in expect.items()):
+                return None
+            frozen = MappingProxyType({**entry, **fields})
+            self._entries[terminal_id] = frozen
+            self._publish()
+        return frozen
+
+    def transition(self, terminal_id: str, from_states: Tuple[str, ...],
+                   to_state: str) -> Optional[Mapping[str, Any]]:
+        """
+        Move a terminal to another state if it is in one of from_states.
+
+        Returns:
+            The updated entry, or None if the terminal is gone or in another state
+        """
+        with self.lock:
+            entry = self._entries.get(terminal_id)
+            if entry is None or entry.get('state') not in from_states:
+                return None
+            frozen = MappingProxyType({**entry, 'state': to_state})
+            self._entries[terminal_id] = frozen
+            self._publish()
+        return frozen
+
+    def remove(self, terminal_id: str) -> Optional[Mapping[str, Any]]:
+        """Unregister a terminal and return its last entry."""
+        with self.lock:
+            entry = self._entries.pop(terminal_id, None)
+            self._entry_locks.pop(terminal_id, None)
+            if entry is not None:
+                self._publish()
+        return entry
+
+    def clear(self) -> Dict[str, Mapping[str, Any]]:
+        """Unregister every terminal and return the removed entries."""
+        with self.lock:
+            entries = dict(self._entries)
+            self._entries.clear()
+            self._entry_locks.clear()
+            self._publish()
+        return entries
+
+    def entry_lock(self, terminal_id: str) -> threading.RLock:
+        """
+        Get the lock serialising slow operations on one terminal.
+
+        A terminal that is already gone gets a fresh private lock, so callers can
+        always take it and then find the entry missing.
+        """
+        with self.lock:
+            return self._entry_locks.get(terminal_id) or threading.RLock()
@@ -0,0 +1,146 @@
+"""
+core/terminal_search.py
+Concurrent search of the scrollback of every terminal.
+"""
+
+import logging
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, Any, List, Optional, Pattern
+
+from core.scrollback_snapshot import SnapshotCache
+
+# Configure logging
+logger = logging.getLogger('commandwave')
+
+# Terminals captured at the same time; their commands share the tmux control connection
+SEARCH_WORKERS = 8
+# Seconds allowed for capturing and searching one terminal
+DEFAULT_PANE_TIMEOUT = 5.0
+# Matches returned per search, across all terminals
+DEFAULT_MAX_MATCHES = 1000
+# Characters of a matching line returned
+MAX_LINE_LENGTH = 500
+
+def compile_pattern(pattern: str, regex: bool = False, ignore_case: bool = False) -> Pattern:
+    """
+    Compile a search pattern.
+
+    Raises:
+        re.error: If a regular expression is invalid
+    """
+    flags = re.MULTILINE | (re.IGNORECASE if ignore_case else 0)
+    return re.compile(pattern if regex else re.escape(pattern), flags)
+
+def search_lines(compiled: Pattern, first_line: int, lines: List[str], limit: int,
+                 deadline: Optional[float] = None) -> List[Dict[str, Any]]:
+    """
+    Find matches in a terminal's lines, one result per line.
+
+    Lines are searched one at a time and the deadline is checked after each, so
+    a pattern that backtracks badly holds its worker for one line at most
+    rather than for the whole scrollback.
+
+    Raises:
+        TimeoutError: If time.monotonic() passes the deadline before the lines are searched
+    """
+    matches = []
+    for index, line in enumerate(lines):
+        match = compiled.search(line)
+        if match is not None and match.start() == match.end():
+            # Empty matches would report every line
+            match = next((m for m in compiled.finditer(line) if m.end() > m.start()), None)
+        if match is not None:
+            matches.append({
+                'line': first_line + index,
+                'text': line[:MAX_LINE_LENGTH],
+                'match': match.group(0)[:MAX_LINE_LENGTH]
+            })
+            if len(matches) >= limit:
+                break
+        if deadline is not None and time.monotonic() > deadline:
+            raise TimeoutError('timed out')
+    return matches
+
+def search_terminals(cache: SnapshotCache, terminals: Dict[str, Dict[str, Any]], compiled: Pattern,
+                     pane_timeout: float = DEFAULT_PANE_TIMEOUT,
+                     max_matches: int = DEFAULT_MAX_MATCHES) -> Dict[str, Any]:
+    """
+    Search the scrollback of many terminals concurrently.
+
+    Each terminal's lines come from the snapshot cache, so a repeated search
+    only captures what was printed since. Results are listed in the order the
+    terminals finish; a terminal that takes longer than pane_timeout is
+    reported as timed out and left behind.
+
+    Args:
+        cache: Snapshot cache providing each terminal's lines
+        terminals: Terminal id to {'tmux_session', 'name'}
+        compiled: The compiled pattern
+        pane_timeout: Seconds allowed per terminal
+        max_matches: Matches returned in total
+
+    Returns:
+        dict: Every terminal's result, match count and elapsed time
+    """
+    started = time.monotonic()
+    results: List[Dict[str, Any]] = []
+    remaining = max_matches
+    # When a worker picked each terminal up; the per-terminal timeout runs from there
+    picked_up: Dict[str, float] = {}
+
+    def search_one(terminal_id: str, info: Dict[str, Any]) -> Dict[str, Any]:
+        picked_up[terminal_id] = time.monotonic()
+        first_line, lines = cache.lines(terminal_id, info['tmux_session'])
+        return {
+            'terminal_id': terminal_id,
+            'name': info.get('name'),
+            'lines_searched': len(lines),
+            'matches': search_lines(compiled, first_line, lines, max_matches,
+                                    deadline=picked_up[terminal_id] + pane_timeout)
+        }
+
+    def report(result: Dict[str, Any]) -> None:
+        nonlocal remaining
+        result['matches'] = result.get('matches', [])[:max(0, remaining)]
+        remaining -= len(result['matches'])
+        results.append(result)
+
+    executor = ThreadPoolExecutor(max_workers=max(1, min(SEARCH_WORKERS, len(terminals))),
+                                  thread_name_prefix='terminal-search')
+    try:
+        pending = {executor.submit(search_one, terminal_id, info): (terminal_id, info)
+                   for terminal_id, info in terminals.items()}
+
+        while pending:
+            # Wake up at the earliest deadline of a terminal being searched
+            now = time.monotonic()
+            deadlines = [picked_up[terminal_id] + pane_timeout
+                         for terminal_id, _ in pending.values() if terminal_id in picked_up]
+            timeout = max(0.0, min(deadlines) - now) if deadlines else pane_timeout
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                terminal_id, info = pending.pop(future)
+                try:
+                    report(future.result())
+                except Exception as e:
+                    report({'terminal_id': terminal_id, 'name': info.get('name'), 'error': str(e)})
+
+            # Give up on terminals past their deadline; their workers stop at the next line
+            now = time.monotonic()
+            for future, (terminal_id, info) in list(pending.items()):
+                if terminal_id in picked_up and now - picked_up[terminal_id] >= pane_timeout:
+                    del pending[future]
+                    future.cancel()
+                    report({'terminal_id': terminal_id, 'name': info.get('name'), 'error': 'timed out'})
+    finally:
+        executor.shutdown(wait=False)
+
+    return {
+        'results': results,
+        'match_count': sum(len(result.get('matches', [])) for result in results),
+        'truncated': remaining <= 0,
+        'elapsed': time.monotonic() - started
+    }
@@ -0,0 +1,228 @@
+"""
+core/tmux_control.py
+Persistent tmux control-mode (tmux -C) connection shared by the whole server.
+"""
+
+import logging
+import re
+import subprocess
+import threading
+from collections import deque
+from typing import Deque, List, Optional, Sequence
+
+# Configure logging
+logger = logging.getLogger('commandwave')
+
+# Session the control client attaches to; deliberately outside the commandwave-* namespace
+CONTROL_SESSION = 'commandwave_control'
+
+# Default time to wait for a command reply, in seconds
+DEFAULT_TIMEOUT = 10.0
+
+# Arguments made only of these characters are passed to tmux unquoted
+_SAFE_ARG = re.compile(r'^[A-Za-z0-9_./:@%+=,^-]+$')
+# Reply guards: %begin/%end/%error <time> <number> <flags>
+_GUARD = re.compile(r'^%(begin|end|error) (\d+) (\d+) (\d+)$')
+
+class TmuxError(Exception):
+    """Raised when tmux rejects a command or the control connection is lost."""
+
+def quote_arg(arg: str) -> str:
+    """Quote a single argument for tmux's command parser."""
+    arg = str(arg)
+    if _SAFE_ARG.match(arg):
+        return arg
+
+    out = []
+    for index, ch in enumerate(arg):
+        if ch in '\\"$':
+            out.append('\\' + ch)
+        elif ch == '~' and index == 0:
+            # A leading ~ is expanded to the home directory even inside double quotes
+            out.append('\\176')
+        elif ord(ch) < 0x20 or ch == '\x7f':
+            # Control characters (newline included) must not reach the line-based protocol raw
+            out.append('\\%03o' % ord(ch))
+        else:
+            out.append(ch)
+    return '"' + ''.join(out) + '"'
+
+def format_command(args: Sequence[str]) -> str:
+    """Build a tmux command line from an argument list."""
+    return ' '.join(quote_arg(arg) for arg in args)
+
+class _Pending:
+    """A command waiting for its %begin/%end reply."""
+
+    def __init__(self, command: str):
+        self.command = command
+        self.lines: List[str] = []
+        self.error = False
+        self.done = threading.Event()
+
+    def result(self, timeout: Optional[float] = DEFAULT_TIMEOUT) -> List[str]:
+        """Wait for the reply and return its output lines, raising TmuxError on failure."""
+        if not self.done.wait(timeout):
+            raise TmuxError(f"Timed out waiting for tmux: {self.command}")
+        if self.error:
+            raise TmuxError('\n'.join(self.lines) or f"tmux command failed: {self.command}")
+        return self.lines
+
+class TmuxControlClient:
+    """
+    Multiplexes tmux commands over one long-lived control-mode client.
+
+    Commands are written to the client's stdin and their replies are matched in
+    order against the %begin/%end blocks tmux prints for commands this client sent.
+    The client is (re)started lazily, so a killed tmux server is recovered from on
+    the next command.
+    """
+
+    def __init__(self, config_path: Optional[str] = None):
+        # Config file passed with -f when the control client starts the tmux server
+        self.config_path = config_path
+
+        self._process: Optional[subprocess.Popen] = None
+        self._pending: Deque[_Pending] = deque()
+        # Serialises writes (and reconnects); never taken by the reader thread
+        self._write_lock = threading.Lock()
+        # Guards the pending queue shared with the reader thread
+        self._pending_lock = threading.Lock()
+        self.commands_sent = 0
+        self.reconnects = 0
+
+    def _ensure_connected(self) -> subprocess.Popen:
+        """Start the control client if it is not running. Caller holds _write_lock."""
+        if self._process is not None and self._process.poll() is None:
+            return self._process
+
+        if self._process is not None:
+            self.reconnects += 1
+            logger.warning("tmux control connection lost, reconnecting")
+            # Anything still queued was sent to the dead client and will never be answered
+            self._fail_pending("tmux control connection lost")
+
+        cmd = ['tmux']
+        if self.config_path:
+            cmd.extend(['-f', self.config_path])
+        cmd.extend(['-C', 'new-session', '-A', '-s', CONTROL_SESSION])
+
+        try:
+            process = subprocess.Popen(
+                cmd,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL
+            )
+        except OSError as e:
+            raise TmuxError(f"Failed to start tmux control client: {e}")
+
+        self._process = process
+        threading.Thread(target=self._read_loop, args=(process,),
+                         name='tmux-control-reader', daemon=True).start()
+        logger.info(f"Started tmux control client (pid {process.pid})")
+        return process
+
+    def submit(self, args: Sequence[str]) -> _Pending:
+        """Send a command without waiting for its reply."""
+        return self.submit_many([args])[0]
+
+    def submit_many(self, commands: Sequence[Sequence[str]]) -> List[_Pending]:
+        """Pipeline several commands in a single write; replies arrive in order."""
+        pendings = [_Pending(format_command(args)) for args in commands]
+        if not pendings:
+            return pendings
+        payload = ''.join(p.command + '\n' for p in pendings).encode('utf-8')
+
+        with self._write_lock:
+            process = self._ensure_connected()
+            # Queue before writing so the reader can never see a reply without its command
+            with self._pending_lock:
+                self._pending.extend(pendings)
+            try:
+                process.stdin.write(payload)
+                process.stdin.flush()
+            except (OSError, ValueError) as e:
+                self._fail_pending(f"tmux control write failed: {e}")
+                raise TmuxError(f"tmux control write failed: {e}")
+            self.commands_sent += len(pendings)
+
+        return pendings
+
+    def run(self, *args: str, timeout: Optional[float] = DEFAULT_TIMEOUT) -> List[str]:
+        """Run a tmux command and return its output lines."""
+        return self.submit(args).result(timeout)
+
+    def close(self) -> None:
+        """Detach the control client and remove its session."""
+        with self._write_lock:
+            process = self._process
+            self._process = None
+        if process is None or process.poll() is not None:
+            return
+        try:
+            process.stdin.write(f"kill-session -t {CONTROL_SESSION}\n".encode('utf-8'))
+            process.stdin.close()
+            process.wait(timeout=2)
+        except Exception:
+            process.kill()
+
+    def _fail_pending(self, message: str) -> None:
+        """Fail every command still waiting for a reply."""
+        with self._pending_lock:
+            failed = list(self._pending)
+            self._pending.clear()
+        for pending in failed:
+            pending.error = True
+            pending.lines = [message]
+            pending.done.set()
+
+    def _read_loop(self, process: subprocess.Popen) -> None:
+        """Parse control-mode output, resolving pending commands as their replies complete."""
+        current: Optional[_Pending] = None
+        current_number = None
+        lines: List[str] = []
+
+        for raw in process.stdout:
+            line = raw.decode('utf-8', errors='replace').rstrip('\n')
+
+            guard = _GUARD.match(line)
+            if guard:
+                kind, number, flags = guard.group(1), guard.group(3), int(guard.group(4))
+                if kind == 'begin' and current_number is None:
+                    current_number = number
+                    lines = []
+                    # Only blocks flagged as ours belong to a pending command
+                    current = None
+                    if flags & 1:
+                        with self._pending_lock:
+                            current = self._pending.popleft() if self._pending else None
+                    continue
+                if kind != 'begin' and number == current_number:
+                    if current is not None:
+                        current.lines = lines
+                        current.error = kind == 'error'
+                        current.done.set()
+                    current = None
+                    current_number = None
+                    continue
+
+            if current_number is not None:
+                lines.append(line)
+            # Anything outside a reply block is an asynchronous notification; ignored
+
+        # EOF: the client exited, so nothing queued will ever be answered. If a new
+        # client was already started, the reconnect has failed these itself.
+        if self._process is process or self._process is None:
+            self._fail_pending("tmux control connection closed")
+
+# Shared control client used for every tmux interaction
+tmux_client = TmuxControlClient()
+
+def has_session(session_name: str) -> bool:
+    """Check whether a tmux session exists."""
+    try:
+        tmux_client.run('has-session', '-t', f'={session_name}')
+        return True
+    except TmuxError:
+        return False
@@ -0,0 +1,210 @@
+"""
+core/tmux_themes.py
+Named tmux themes, loaded once per tmux server and switched per session.
+"""
+
+import glob
+import logging
+import os
+import re
+import shlex
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+
+from core.tmux_control import tmux_client, format_command
+
+# Configure logging
+logger = logging.getLogger('commandwave')
+
+THEME_SUFFIX = '.tmux.conf'
+# Global user option recording that the tmux server has loaded the default theme
+SERVER_MARKER = '@commandwave-config'
+# Session user option holding the name of the session's theme
+SESSION_OPTION = '@commandwave-theme'
+
+_SET_COMMANDS = ('set', 'set-option', 'setw', 'set-window-option')
+_VARIABLE = re.compile(r'^([A-Za-z_][A-Za-z0-9_]*)=(.*)$')
+_REFERENCE = re.compile(r'\$(?:\{([A-Za-z_][A-Za-z0-9_]*)\}|([A-Za-z_][A-Za-z0-9_]*))')
+
+# (name, value) pairs of session options and of window options
+ThemeOptions = Tuple[List[Tuple[str, str]], List[Tuple[str, str]]]
+
+def parse_theme(path: str) -> ThemeOptions:
+    """
+    Read the session and window options a tmux config file sets.
+
+    Variables assigned in the file (name="value") are expanded. Server options,
+    appended options, key bindings and other commands are left to the
+    server-level load, as they cannot be scoped to a session. Window options
+    must be set with setw or -w to be recognised as such.
+    """
+    variables: Dict[str, str] = {}
+    session_options: List[Tuple[str, str]] = []
+    window_options: List[Tuple[str, str]] = []
+
+    def expand(match):
+        name = match.group(1) or match.group(2)
+        return variables.get(name, match.group(0))
+
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            try:
+                assignment = _VARIABLE.match(line)
+                if assignment:
+                    words = shlex.split(assignment.group(2), comments=True)
+                    variables[assignment.group(1)] = words[0] if words else ''
+                    continue
+                words = shlex.split(_REFERENCE.sub(expand, line), comments=True)
+            except ValueError:
+                # Not something shlex understands, so not a plain set-option line
+                continue
+
+            if not words or words[0] not in _SET_COMMANDS:
+                continue
+            flags = ''
+            position = 1
+            while position < len(words) and words[position].startswith('-'):
+                flags += words[position][1:]
+                position += 1
+            if len(words) - position != 2 or set(flags) & set('asutpFo'):
+                continue
+            name, value = words[position], words[position + 1]
+            if words[0] in ('setw', 'set-window-option') or 'w' in flags:
+                window_options.append((name, value))
+            else:
+                session_options.append((name, value))
+
+    return session_options, window_options
+
+class TmuxThemes:
+    """
+    Registry of the tmux themes sessions can be switched between.
+
+    The default theme is the config file the tmux server loads, once per
+    server. Any other *.tmux.conf file in the themes directory is registered
+    under its file name. Applying a theme to a session sets its options on that
+    session and its windows only, in one pipelined batch of tmux commands, with
+    a session hook so windows opened later get them too.
+    """
+
+    def __init__(self, default_path: str, directory: Optional[str] = None, default_name: str = 'dark'):
+        self.default_path = default_path
+        self.directory = directory
+        self.default_name = default_name
+        # name -> {'path', 'session_options', 'window_options'}
+        self._themes: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def load(self) -> None:
+        """Discover and parse the theme files."""
+        paths = []
+        if os.path.exists(self.default_path):
+            paths.append((self.default_name, self.default_path))
+        if self.directory and os.path.isdir(self.directory):
+            for path in sorted(glob.glob(os.path.join(self.directory, '*' + THEME_SUFFIX))):
+                paths.append((os.path.basename(path)[:-len(THEME_SUFFIX)], path))
+
+        themes = {}
+        for name, path in paths:
+            try:
+                session_options, window_options = parse_theme(path)
+            except OSError as e:
+                logger.warning(f"Failed to read tmux theme {path}: {e}")
+                continue
+            themes.setdefault(name, {
+                'path': path,
+                'session_options': session_options,
+                'window_options': window_options
+            })
+
+        with self._lock:
+            self._themes = themes
+        logger.info(f"Loaded {len(themes)} tmux themes")
+
+    def list_themes(self) -> List[Dict[str, Any]]:
+        """List the registered themes."""
+        with self._lock:
+            return [{
+                'name': name,
+                'default': name == self.default_name,
+                'options': len(theme['session_options']) + len(theme['window_options'])
+            } for name, theme in self._themes.items()]
+
+    def load_server(self) -> bool:
+        """
+        Source the default theme into the tmux server, unless it already has it.
+
+        A server started by the control client loads the file with -f; this
+        covers a server that was already running. The server remembers the
+        load, so it is not repeated for each session, attach or restart of
+        CommandWave.
+
+        Returns:
+            bool: True if the file was sourced now
+        """
+        if not os.path.exists(self.default_path):
+            return False
+        if tmux_client.run('show-options', '-gqv', SERVER_MARKER):
+            return False
+        tmux_client.run('source-file', self.default_path)
+        tmux_client.run('set-option', '-g', SERVER_MARKER, self.default_path)
+        logger.info(f"Loaded tmux config {self.default_path} into the tmux server")
+        return True
+
+    def session_theme(self, session_name: str) -> str:
+        """Get the name of a session's theme."""
+        lines = tmux_client.run('show-options', '-qv', '-t', f'={session_name}:', SESSION_OPTION)
+        return lines[0] if lines and lines[0] else self.default_name
+
+    def apply(self, session_name: str, name: str) -> None:
+        """
+        Switch a session to a theme.
+
+        Options set by other themes but not by this one are unset first, so the
+        session falls back to the server's values for them.
+
+        Raises:
+            ValueError: If there is no theme with that name
+            TmuxError: If the session does not exist or tmux rejects an option
+        """
+        with self._lock:
+            theme = self._themes.get(name)
+            if theme is None:
+                raise ValueError(f"Unknown theme: {name}")
+            stale_session = {option for other in self._themes.values()
+                             for option, _ in other['session_options']}
+            stale_window = {option for other in self._themes.values()
+                            for option, _ in other['window_options']}
+        stale_session -= {option for option, _ in theme['session_options']}
+        stale_window -= {option for option, _ in theme['window_options']}
+
+        # Exact session match; the trailing colon makes it valid where a pane is expected
+        target = f'={session_name}:'
+        windows = tmux_client.run('list-windows', '-t', target, '-F', '#{window_id}')
+
+        commands = []
+        for option in sorted(stale_session):
+            commands.append(['set-option', '-qu', '-t', target, option])
+        for option, value in theme['session_options']:
+            commands.append(['set-option', '-t', target, option, value])
+        for window in windows:
+            for option in sorted(stale_window):
+                commands.append(['set-option', '-wqu', '-t', window, option])
+            for option, value in theme['window_options']:
+                commands.append(['set-option', '-w', '-t', window, option, value])
+        if theme['window_options']:
+            # Runs in the context of each new window of the session
+            hook = ' ; '.join(format_command(['set-option', '-w', option, value])
+                              for option, value in theme['window_options'])
+            commands.append(['set-hook', '-t', target, 'after-new-window', hook])
+        else:
+            commands.append(['set-hook', '-u', '-t', target, 'after-new-window'])
+        commands.append(['set-option', '-t', target, SESSION_OPTION, name])
+
+        # One write to the control client; wait for every reply to surface errors
+        for pending in tmux_client.submit_many(commands):
+            pending.result()
+        logger.info(f"Applied tmux theme {name} to session {session_name}")
@@ -0,0 +1,252 @@
+"""
+core/ttyd_proxy.py
+Reverse proxy for ttyd backends listening on Unix domain sockets.
+"""
+
+import http.client
+import logging
+import os
+import socket
+import ssl
+import threading
+from collections import deque
+from typing import Deque, Dict, Any, Iterator, List, Optional, Tuple
+
+# Configure logging
+logger = logging.getLogger('commandwave')
+
+# URL prefix the proxied terminals are served under; ttyd is started with -b <prefix>/<session>
+PROXY_PREFIX = '/term'
+
+# Idle upstream connections kept per backend socket
+MAX_IDLE_PER_BACKEND = 4
+# Bytes moved per read/splice call
+CHUNK_SIZE = 64 * 1024
+
+# Headers that only apply to a single hop and must not be forwarded
+HOP_BY_HOP_HEADERS = {
+    'connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization',
+    'te', 'trailers', 'transfer-encoding', 'upgrade'
+}
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTP/1.1 connection to a server listening on a Unix domain socket."""
+
+    def __init__(self, socket_path: str, timeout: Optional[float] = 10.0):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self) -> None:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError:
+            sock.close()
+            raise
+        self.sock = sock
+
+class UpstreamPool:
+    """Keep-alive connections to ttyd backends, pooled per socket path."""
+
+    def __init__(self, max_idle: int = MAX_IDLE_PER_BACKEND):
+        self.max_idle = max_idle
+        self._idle: Dict[str, Deque[UnixHTTPConnection]] = {}
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+
+    def acquire(self, socket_path: str) -> Tuple[UnixHTTPConnection, bool]:
+        """
+        Get a connection to a backend.
+
+        Returns:
+            tuple: The connection and whether it was reused from the pool
+        """
+        with self._lock:
+            idle = self._idle.get(socket_path)
+            if idle:
+                self.reused += 1
+                return idle.pop(), True
+            self.created += 1
+        return UnixHTTPConnection(socket_path), False
+
+    def release(self, socket_path: str, conn: UnixHTTPConnection) -> None:
+        """Return a connection whose response was fully read."""
+        with self._lock:
+            idle = self._idle.setdefault(socket_path, deque())
+            if len(idle) < self.max_idle:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def discard(self, socket_path: str) -> None:
+        """Close every idle connection to a backend that is going away."""
+        with self._lock:
+            idle = self._idle.pop(socket_path, None)
+        for conn in idle or ():
+            conn.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get counts of created, reused and idle upstream connections."""
+        with self._lock:
+            idle = sum(len(conns) for conns in self._idle.values())
+        return {'created': self.created, 'reused': self.reused, 'idle': idle}
+
+def forward_headers(environ: Dict[str, Any]) -> List[Tuple[str, str]]:
+    """Rebuild the end-to-end request headers from a WSGI environ."""
+    headers = []
+    for key, value in environ.items():
+        if key.startswith('HTTP_'):
+            name = key[5:].replace('_', '-').title()
+        elif key in ('CONTENT_TYPE', 'CONTENT_LENGTH') and value:
+            name = key.replace('_', '-').title()
+        else:
+            continue
+        headers.append((name, value))
+    return headers
+
+class TtydProxy:
+    """
+    Forwards HTTP requests and WebSocket sessions to ttyd over Unix sockets.
+
+    Plain requests reuse pooled keep-alive connections. WebSocket upgrades take
+    over the client socket and relay raw bytes in both directions; frames are
+    never decoded, and on Linux they are moved with splice() without passing
+    through Python buffers.
+    """
+
+    def __init__(self):
+        self.upstreams = UpstreamPool()
+        self.active_websockets = 0
+        self._lock = threading.Lock()
+
+    def forward(self, socket_path: str, method: str, target: str,
+                headers: List[Tuple[str, str]], body: Optional[bytes]
+                ) -> Tuple[int, List[Tuple[str, str]], Iterator[bytes]]:
+        """
+        Forward a plain HTTP request to a backend.
+
+        Returns:
+            tuple: Status code, end-to-end response headers and a body iterator.
+                   The connection goes back to the pool once the body is consumed.
+        """
+        headers = [(k, v) for k, v in headers if k.lower() not in HOP_BY_HOP_HEADERS]
+
+        conn, reused = self.upstreams.acquire(socket_path)
+        try:
+            conn.request(method, target, body=body, headers=dict(headers))
+            response = conn.getresponse()
+        except (http.client.HTTPException, OSError):
+            conn.close()
+            if not reused:
+                raise
+            # The pooled connection went stale while idle; retry once on a fresh one
+            conn = UnixHTTPConnection(socket_path)
+            conn.request(method, target, body=body, headers=dict(headers))
+            response = conn.getresponse()
+
+        response_headers = [(k, v) for k, v in response.getheaders()
+                            if k.lower() not in HOP_BY_HOP_HEADERS]
+
+        def body_iter() -> Iterator[bytes]:
+            complete = False
+            try:
+                while True:
+                    chunk = response.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    yield chunk
+                complete = True
+            finally:
+                if complete and not response.will_close:
+                    self.upstreams.release(socket_path, conn)
+                else:
+                    conn.close()
+
+        return response.status, response_headers, body_iter()
+
+    def relay_websocket(self, socket_path: str, environ: Dict[str, Any], target: str) -> None:
+        """
+        Hand a WebSocket upgrade to a backend and relay until either side closes.
+
+        The upgrade request is replayed to ttyd, whose 101 response and all later
+        frames are copied to the client untouched.
+        """
+        client = environ['werkzeug.socket']
+        upstream = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        upstream.connect(socket_path)
+
+        lines = [f"{environ.get('REQUEST_METHOD', 'GET')} {target} HTTP/1.1"]
+        for name, value in forward_headers(environ):
+            lines.append(f"{name}: {value}")
+        upstream.sendall(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+
+        client.settimeout(None)
+        with self._lock:
+            self.active_websockets += 1
+        try:
+            to_upstream = threading.Thread(target=_relay, args=(client, upstream),
+                                           name='ttyd-proxy-relay', daemon=True)
+            to_upstream.start()
+            _relay(upstream, client)
+            to_upstream.join()
+        finally:
+            upstream.close()
+            with self._lock:
+                self.active_websockets -= 1
+
+    def discard_backend(self, socket_path: str) -> None:
+        """Drop pooled connections to a backend that is being torn down."""
+        self.upstreams.discard(socket_path)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get upstream pool and WebSocket relay counts."""
+        stats = self.upstreams.stats()
+        stats['active_websockets'] = self.active_websockets
+        return stats
+
+def _relay(src: socket.socket, dst: socket.socket) -> None:
+    """Copy bytes from src to dst until EOF, then half-close dst."""
+    try:
+        if hasattr(os, 'splice') and not isinstance(src, ssl.SSLSocket) \
+                and not isinstance(dst, ssl.SSLSocket):
+            _splice_loop(src, dst)
+        else:
+            _copy_loop(src, dst)
+    except OSError:
+        pass
+    finally:
+        # Wake the opposite direction so both relays finish together
+        for sock in (dst, src):
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+def _splice_loop(src: socket.socket, dst: socket.socket) -> None:
+    """Move bytes socket -> pipe -> socket in the kernel."""
+    read_fd, write_fd = os.pipe()
+    try:
+        while True:
+            pending = os.splice(src.fileno(), write_fd, CHUNK_SIZE, flags=os.SPLICE_F_MOVE)
+            if pending == 0:
+                return
+            while pending:
+                pending -= os.splice(read_fd, dst.fileno(), pending, flags=os.SPLICE_F_MOVE)
+    finally:
+        os.close(read_fd)
+        os.close(write_fd)
+
+def _copy_loop(src: socket.socket, dst: socket.socket) -> None:
+    """Copy bytes through a single reused buffer where splice() is unavailable."""
+    buffer = bytearray(CHUNK_SIZE)
+    view = memoryview(buffer)
+    while True:
+        received = src.recv_into(buffer)
+        if received == 0:
+            return
+        dst.sendall(view[:received])
+
+# Shared proxy used by the terminal proxy routes
+ttyd_proxy = TtydProxy()
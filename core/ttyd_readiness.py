@@ -0,0 +1,103 @@
+"""
+core/ttyd_readiness.py
+Readiness probing for freshly spawned ttyd processes.
+"""
+
+import logging
+import socket
+import threading
+import time
+from typing import Optional, Tuple, Union
+
+# Configure logging
+logger = logging.getLogger('commandwave')
+
+# Bounds for the adaptive readiness timeout, in seconds
+MIN_READY_TIMEOUT = 2.0
+MAX_READY_TIMEOUT = 15.0
+# Timeout is this many times the smoothed startup time
+READY_TIMEOUT_FACTOR = 20
+# Weight of the newest sample in the smoothed startup time
+SMOOTHING = 0.2
+
+class ReadinessProbe:
+    """
+    Waits for a ttyd listener to accept connections.
+
+    Polls with exponential backoff starting at a couple of milliseconds, fails early
+    if the process exits, and derives its timeout from recently observed startup times
+    so slow starts under load are not mistaken for failures.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._smoothed: Optional[float] = None
+        self.samples = 0
+
+    def timeout(self) -> float:
+        """Get the current adaptive timeout in seconds."""
+        with self._lock:
+            if self._smoothed is None:
+                return MAX_READY_TIMEOUT
+            return min(MAX_READY_TIMEOUT, max(MIN_READY_TIMEOUT, self._smoothed * READY_TIMEOUT_FACTOR))
+
+    def record(self, seconds: float) -> None:
+        """Fold a measured startup time into the smoothed estimate."""
+        with self._lock:
+            if self._smoothed is None:
+                self._smoothed = seconds
+            else:
+                self._smoothed = SMOOTHING * seconds + (1 - SMOOTHING) * self._smoothed
+            self.samples += 1
+
+    def wait(self, process, address: Union[Tuple[str, int], str],
+             timeout: Optional[float] = None) -> Optional[float]:
+        """
+        Wait until the process accepts connections on address.
+
+        Args:
+            process: The Popen object of the ttyd process
+            address: A (host, port) tuple or a Unix socket path
+            timeout: Override for the adaptive timeout
+
+        Returns:
+            float: Seconds from the call until the listener accepted a connection,
+                   or None if the process exited or the timeout expired
+        """
+        if timeout is None:
+            timeout = self.timeout()
+
+        started = time.monotonic()
+        deadline = started + timeout
+        delay = 0.002
+
+        while True:
+            if process.poll() is not None:
+                return None
+
+            if _accepts_connections(address):
+                elapsed = time.monotonic() - started
+                self.record(elapsed)
+                return elapsed
+
+            now = time.monotonic()
+            if now >= deadline:
+                logger.warning(f"ttyd not ready on {address} after {timeout:.1f}s")
+                return None
+
+            time.sleep(min(delay, deadline - now))
+            delay = min(delay * 2, 0.05)
+
+def _accepts_connections(address: Union[Tuple[str, int], str]) -> bool:
+    """Check whether something accepts connections on a TCP address or Unix socket path."""
+    family = socket.AF_UNIX if isinstance(address, str) else socket.AF_INET
+    with socket.socket(family, socket.SOCK_STREAM) as s:
+        s.settimeout(0.1)
+        try:
+            s.connect(address)
+            return True
+        except OSError:
+            return False
+
+# Shared probe so every spawn path contributes to the same startup estimate
+readiness_probe = ReadinessProbe()
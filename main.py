@@ -13,13 +13,19 @@ import argparse
 import subprocess
 import threading
 import glob
+import shutil
 import socket
+import tempfile
 import time
 import re
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import quote
 from flask import Flask, render_template, request, jsonify, abort, send_from_directory
 from flask_socketio import SocketIO
 
+from core.terminal_registry import TerminalRegistry, STATE_READY, STATE_CLOSING
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -33,12 +39,21 @@ logger = logging.getLogger('commandwave')
 DEFAULT_PORT = 5000
 DEFAULT_TERMINAL_PORT = 7681
 TERMINAL_PORT_RANGE = (7682, 7781)
+TTYD_MODE_PER_TERMINAL = 'per-terminal'  # One ttyd process and port per terminal
+TTYD_MODE_SHARED = 'shared'  # One ttyd process attaching to sessions by URL argument
+TTYD_MODE_UNIX = 'unix'  # One ttyd per terminal on a Unix socket, proxied by this server
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 NOTES_DIR = os.path.join(BASE_DIR, 'notes_data')
 PLAYBOOKS_DIR = os.path.join(BASE_DIR, 'playbooks')
 STATIC_DIR = os.path.join(BASE_DIR, 'static')
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TMUX_CONFIG_PATH = os.path.join(BASE_DIR, 'commandwave_theme.tmux.conf')
+TMUX_THEMES_DIR = os.path.join(BASE_DIR, 'themes')  # Extra named tmux themes (*.tmux.conf)
+TERMINAL_REGISTRY_PATH = os.path.join(BASE_DIR, 'terminal_registry.json')
+OUTPUT_TRIGGERS_PATH = os.path.join(BASE_DIR, 'output_triggers.json')
+POOLED_SESSION_OPTION = '@commandwave_pooled'  # tmux user option marking unclaimed pool sessions
+SHUTDOWN_DEADLINE = 5.0  # Seconds shutdown may take before remaining ttyd processes are killed
+BULK_SPAWN_WORKERS = 16  # ttyd processes started at once when creating terminals in bulk
 HOSTNAME = 'localhost'  # Default hostname, will be updated from args
 
 # Create necessary directories if they don't exist
@@ -52,17 +67,47 @@ app = Flask(__name__,
             static_folder=STATIC_DIR, 
             template_folder=TEMPLATES_DIR)
 
-# Store the terminals dictionary in the Flask app for access by blueprints
-app.terminals = {}
-app.process_lock = threading.Lock()
+# Store the terminal registry in the Flask app for access by blueprints,
+# keyed by terminal id (the terminal's tmux session name)
+app.terminals = TerminalRegistry()
+# The single ttyd process ({'port', 'process'}) when running in shared mode
+app.shared_ttyd = None
+
+# Shared state of the playbooks clients are editing, by file name
+playbooks = {}
+playbook_lock = threading.Lock()
+# Variables synced from each terminal, by terminal id
+variables = {}
+variables_lock = threading.Lock()
 
 # Import route blueprints
-from routes.playbook_routes import playbook_routes
+from routes.playbook_routes import playbook_routes, find_playbook, apply_playbook_changes, load_playbook_file
 from routes.variable_routes import variable_routes, VARIABLE_STORAGE_DIR
 from routes.terminal_routes import terminal_routes
 from routes.sync_routes import sync_routes, init_socketio_events
 from routes.notes_routes import notes_routes
+from routes.proxy_routes import proxy_routes
+from routes.trigger_routes import trigger_routes
 from core.sync_utils import init_socketio
+from core.terminal_pool import TerminalPool, DEFAULT_POOL_SIZE
+from core.port_allocator import PortAllocator
+from core.ttyd_readiness import readiness_probe
+from core.tmux_control import tmux_client, has_session, TmuxError
+from core.ttyd_proxy import ttyd_proxy, PROXY_PREFIX
+from core.idle_reaper import IdleReaper
+from core.sync_utils import client_tracker, get_socketio
+from core.process_supervisor import ProcessSupervisor, RestartBackoff
+from core.session_store import SessionStore, adopt_ttyd
+from core.command_queue import CommandQueue, QueueFull
+from core.output_capture import OutputCapture, DEFAULT_BUFFER_SIZE
+from core.output_triggers import TriggerEngine
+from core.resource_monitor import ResourceMonitor
+from core.scrollback_snapshot import SnapshotCache
+from core.terminal_search import search_terminals, compile_pattern, DEFAULT_PANE_TIMEOUT
+from core.tmux_themes import TmuxThemes
+from core.playbook_index import playbook_index, DEFAULT_LIMIT as DEFAULT_SEARCH_LIMIT
+from core.playbook_utils import content_hash, paginate_playbooks, LIST_PAGE_SIZE
+from core.playbook_watcher import PlaybookWatcher, WATCH_MODES, WATCH_AUTO
 
 def parse_arguments():
     """Parse command-line arguments."""
@@ -75,6 +120,38 @@ def parse_arguments():
                         help='Hostname to use for terminal connections (default: localhost)')
     parser.add_argument('--remote', action='store_true',
                         help='Enable remote access by binding to all interfaces')
+    parser.add_argument('--terminal-pool-size', type=int, default=DEFAULT_POOL_SIZE,
+                        help=f'Number of pre-spawned terminals kept ready for new tabs, 0 to disable (default: {DEFAULT_POOL_SIZE})')
+    parser.add_argument('--ttyd-mode', choices=[TTYD_MODE_PER_TERMINAL, TTYD_MODE_SHARED, TTYD_MODE_UNIX],
+                        default=TTYD_MODE_PER_TERMINAL,
+                        help='Run one ttyd per terminal, a single shared ttyd that attaches '
+                             'to sessions by URL argument, or one ttyd per terminal on a Unix '
+                             f'socket proxied through the web server (default: {TTYD_MODE_PER_TERMINAL})')
+    parser.add_argument('--lazy-ttyd', action='store_true',
+                        help='Create tmux sessions eagerly but start ttyd only when a terminal is first viewed')
+    parser.add_argument('--ttyd-idle-timeout', type=int, default=0,
+                        help='Stop ttyd for terminals nobody has viewed for this many seconds; the tmux '
+                             'session stays alive and ttyd restarts on the next view (default: 0, never)')
+    parser.add_argument('--keep-sessions', action='store_true',
+                        help='Leave tmux sessions running on exit so the next start adopts them')
+    parser.add_argument('--runtime-dir', type=str, default=None,
+                        help='Directory for ttyd Unix sockets in unix mode and output pipes '
+                             '(default: a private temporary directory)')
+    parser.add_argument('--output-buffer-size', type=int, default=0,
+                        help='Capture each terminal\'s output into a ring buffer of this many bytes, '
+                             'readable from /api/terminals/<id>/output (default: 0, no capture)')
+    parser.add_argument('--output-buffer-mmap', action='store_true',
+                        help='Keep the output ring buffers in memory-mapped files in the runtime directory')
+    parser.add_argument('--resource-interval', type=float, default=0,
+                        help='Sample the CPU, memory and open files of each terminal\'s processes every '
+                             'this many seconds (default: 0, no sampling)')
+    parser.add_argument('--output-triggers', action='store_true',
+                        help='Alert clients when a terminal prints text matching a trigger pattern '
+                             '(captures output, with the default buffer size unless one is given)')
+    parser.add_argument('--playbook-watch', choices=WATCH_MODES, default=WATCH_AUTO,
+                        help='Keep playbooks in memory up to date with the playbooks directory using '
+                             'inotify, by polling, or not at all; auto uses inotify where available '
+                             f'(default: {WATCH_AUTO})')
     return parser.parse_args()
 
 def is_port_available(port):
@@ -82,199 +159,1114 @@ def is_port_available(port):
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
         return s.connect_ex((HOSTNAME, port)) != 0
 
-def find_available_port(start_port, end_port):
-    """Find an available port in the specified range."""
-    for port in range(start_port, end_port + 1):
-        if is_port_available(port) and port not in app.terminals:
-            return port
-    return None
+# Central allocator for terminal ports; only the candidate port is probed on reserve
+port_allocator = PortAllocator(TERMINAL_PORT_RANGE[0], TERMINAL_PORT_RANGE[1],
+                               probe=is_port_available)
+
+# Named tmux themes; the default is loaded into the tmux server, others are applied per session
+tmux_themes = TmuxThemes(TMUX_CONFIG_PATH, TMUX_THEMES_DIR)
+
+# Applies playbook files changed on disk, e.g. by an editor or git, to the playbooks in memory
+playbook_watcher = PlaybookWatcher(PLAYBOOKS_DIR, apply_playbook_changes)
+
+def ensure_tmux_session(tmux_session_name):
+    """
+    Create a detached tmux session, or reuse it if it already exists.
+
+    :param tmux_session_name: The name of the tmux session to create or reuse.
+    :raises TmuxError: If the session could not be created.
+    """
+    # Check if tmux session already exists and reuse it
+    if has_session(tmux_session_name):
+        logger.info(f"Tmux session {tmux_session_name} already exists, reusing it")
+    else:
+        # Create a new tmux session. The tmux server has the config file (if
+        # enabled) loaded once, so nothing is sourced per session.
+        tmux_client.run('new-session', '-d', '-s', tmux_session_name)
+        logger.info(f"Created tmux session: {tmux_session_name}")
+
+# Reaps every ttyd process and drains its stderr from a single thread
+process_supervisor = ProcessSupervisor()
+restart_backoff = RestartBackoff()
 
-def start_ttyd_process(port, tmux_session_name, use_tmux_config=False):
+def launch_ttyd(port, attach_cmd, extra_args=()):
+    """
+    Launch ttyd on a port running attach_cmd and wait for it to accept connections.
+
+    :param port: The port number to use for the ttyd process, or a Unix socket path
+                 (which must end in .sock).
+    :param attach_cmd: The command ttyd runs for each client, as an argument list.
+    :param extra_args: Additional ttyd options.
+    :return: The ttyd process object, or None if it exited or never became ready.
+             The time ttyd took to accept connections is stored on it as startup_seconds.
+    """
+    ttyd_cmd = [
+        'ttyd', 
+        '-W',  # Add writable flag to enable terminal input
+        '--client-option', 'fontSize=12',
+        '--client-option', 'disableLeaveAlert=true',
+        '--client-option', 'fontFamily=monospace',
+        '--client-option', 'rendererType=canvas',
+        '--client-option', 'letterSpacing=0',
+        '--client-option', 'lineHeight=1',
+    ]
+    if isinstance(port, str):
+        # Unix domain socket; ttyd detects it from the .sock suffix
+        ttyd_cmd.extend(['--interface', port])
+    else:
+        ttyd_cmd.extend(['--port', str(port)])
+    ttyd_cmd.extend(extra_args)
+    ttyd_cmd.extend(attach_cmd)
+    
+    # Start the ttyd process; stdout is unused, stderr is drained by the supervisor
+    ttyd_process = subprocess.Popen(
+        ttyd_cmd,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True
+    )
+    
+    # Wait until ttyd accepts connections, failing early if it exits
+    address = port if isinstance(port, str) else ('127.0.0.1', port)
+    startup_seconds = readiness_probe.wait(ttyd_process, address)
+    
+    if startup_seconds is None:
+        if ttyd_process.poll() is None:
+            # Timed out while still running, don't leave it behind
+            ttyd_process.kill()
+        # Process has exited, get error output
+        _, stderr = ttyd_process.communicate()
+        logger.error(f"ttyd process exited unexpectedly: {stderr}")
+        return None
+        
+    # Keep the measured spawn-to-ready time with the process for the terminal registry
+    ttyd_process.startup_seconds = startup_seconds
+    process_supervisor.watch(ttyd_process, handle_ttyd_exit)
+    return ttyd_process
+
+def start_ttyd_process(port, tmux_session_name, socket_path=None):
     """
     Start a ttyd process linked to a tmux session on the specified port.
 
     This function creates a new tmux session with the given name, or reuses an existing one if it already exists.
     It then starts a ttyd process linked to this tmux session, and returns the process object.
 
-    :param port: The port number to use for the ttyd process.
+    :param port: The port number to use for the ttyd process; ignored when socket_path is given.
     :param tmux_session_name: The name of the tmux session to create or reuse.
-    :param use_tmux_config: Whether to use a custom tmux configuration file.
+    :param socket_path: Unix socket to listen on instead of a port. ttyd is then served
+                        under the proxy path of the session.
     :return: The ttyd process object, or None if the process could not be started.
+             The time ttyd took to accept connections is stored on it as startup_seconds.
     """
     try:
-        # First check if the port is actually available
-        if not is_port_available(port):
-            logger.warning(f"Port {port} is already in use, trying to find an available port")
-            new_port = find_available_port(TERMINAL_PORT_RANGE[0], TERMINAL_PORT_RANGE[1])
-            if new_port:
-                logger.info(f"Found available port {new_port}, using it instead of {port}")
-                port = new_port
-            else:
-                logger.error("Could not find an available port for ttyd")
-                return None
-                
-        # Check if tmux session already exists
-        check_session = subprocess.run(
-            ['tmux', 'has-session', '-t', tmux_session_name],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            check=False
-        )
-        
-        # If session exists, use it
-        if check_session.returncode == 0:
-            logger.info(f"Tmux session {tmux_session_name} already exists, reusing it")
-            # If using custom config, source it in the existing session
-            if use_tmux_config and os.path.exists(TMUX_CONFIG_PATH):
-                try:
-                    subprocess.run(
-                        ['tmux', 'source-file', '-t', tmux_session_name, TMUX_CONFIG_PATH],
-                        check=True
-                    )
-                    logger.info(f"Applied custom tmux config to existing session {tmux_session_name}")
-                except Exception as e:
-                    logger.warning(f"Failed to apply tmux config to existing session: {e}")
-        else:
-            # Create a new tmux session
-            tmux_cmd = ['tmux', 'new-session', '-d', '-s', tmux_session_name]
+        ensure_tmux_session(tmux_session_name)
+    except TmuxError as e:
+        logger.error(f"Failed to start ttyd process: {e}")
+        return None
+    return launch_session_ttyd(port, tmux_session_name, socket_path)
+
+def launch_session_ttyd(port, tmux_session_name, socket_path=None):
+    """
+    Start a ttyd process attaching to an existing tmux session.
+
+    Takes the same arguments as start_ttyd_process, which creates the session first.
+
+    :return: The ttyd process object, or None if the process could not be started.
+    """
+    try:
+        # Themes live on the tmux server and its sessions, so attaching is all ttyd does
+        attach_cmd = ['tmux', 'attach-session', '-t', tmux_session_name]
             
-            # Add tmux config if enabled
-            if use_tmux_config and os.path.exists(TMUX_CONFIG_PATH):
-                tmux_cmd.extend(['-f', TMUX_CONFIG_PATH])
-                logger.info(f"Creating new tmux session with config: {TMUX_CONFIG_PATH}")
-                
-            subprocess.run(tmux_cmd, check=True)
-            logger.info(f"Created tmux session: {tmux_session_name}")
-        
         # Start ttyd linked to the tmux session
-        ttyd_cmd = [
-            'ttyd', 
-            '-W',  # Add writable flag to enable terminal input
-            '--port', str(port),
-            '--client-option', 'fontSize=12',
-            '--client-option', 'disableLeaveAlert=true',
-            '--client-option', 'fontFamily=monospace',
-            '--client-option', 'rendererType=canvas',
-            '--client-option', 'letterSpacing=0',
-            '--client-option', 'lineHeight=1',
-        ]
-        
-        # Create helper script for tmux attachment that applies theme
-        theme_script_path = os.path.join(BASE_DIR, f'apply_theme_{port}.sh')
-        
-        with open(theme_script_path, 'w') as f:
-            if use_tmux_config and os.path.exists(TMUX_CONFIG_PATH):
-                # Script that sources the config before attaching
-                f.write('#!/bin/sh\n')
-                f.write(f'tmux source-file "{TMUX_CONFIG_PATH}"\n')
-                f.write(f'tmux attach-session -t {tmux_session_name}\n')
-                logger.info(f"Created tmux helper script with theme at {theme_script_path}")
-                os.chmod(theme_script_path, 0o755)  # Make executable
-                ttyd_cmd.append(theme_script_path)
-            else:
-                # Standard attachment without theme
-                ttyd_cmd.extend(['tmux', 'attach-session', '-t', tmux_session_name])
-            
-        # Start the ttyd process
-        ttyd_process = subprocess.Popen(
-            ttyd_cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
-        )
-        
-        # Wait a moment to ensure the process starts
-        time.sleep(0.5)
-        
-        # Check if process is still running (didn't exit with error)
-        if ttyd_process.poll() is not None:
-            # Process has exited, get error output
-            _, stderr = ttyd_process.communicate()
-            logger.error(f"ttyd process exited unexpectedly: {stderr}")
+        if socket_path:
+            ttyd_process = launch_ttyd(socket_path, attach_cmd,
+                                       extra_args=['--base-path', f'{PROXY_PREFIX}/{tmux_session_name}'])
+        else:
+            ttyd_process = launch_ttyd(port, attach_cmd)
+        if not ttyd_process:
             return None
             
-        logger.info(f"Started ttyd on port {port} linked to tmux session {tmux_session_name}")
+        logger.info(f"Started ttyd on {socket_path or f'port {port}'} linked to tmux session {tmux_session_name} "
+                    f"(ready in {ttyd_process.startup_seconds * 1000:.1f}ms)")
         return ttyd_process
-    except subprocess.CalledProcessError as e:
-        logger.error(f"Failed to start ttyd process: {e}")
-        return None
     except Exception as e:
         logger.error(f"Error starting ttyd process: {e}")
         return None
 
-def send_keys_to_tmux(tmux_session_name, keys):
-    """Send keys to a tmux session."""
+# Run by the shared ttyd with the session from the URL appended; only CommandWave
+# sessions may be attached to, matched exactly
+SHARED_ATTACH_CMD = [
+    'sh', '-c',
+    'case "$1" in commandwave-*) exec tmux attach-session -t "=$1" ;; esac; echo "Unknown terminal"; exit 1',
+    'commandwave-attach'
+]
+
+def start_shared_ttyd_process(port):
+    """
+    Start the single ttyd process that serves every terminal in shared mode.
+
+    ttyd runs with URL arguments enabled, so a client opening /?arg=<session>
+    attaches to that tmux session. Only CommandWave sessions are accepted.
+
+    :param port: The port number to use for the shared ttyd process.
+    :return: The ttyd process object, or None if the process could not be started.
+    """
     try:
-        # Ensure keys end with a newline if not already present
-        if not keys.endswith('\n'):
-            keys += '\n'
+        ttyd_process = launch_ttyd(port, SHARED_ATTACH_CMD, extra_args=['--url-arg'])
+        if not ttyd_process:
+            return None
             
-        # Send keys to the tmux session
-        subprocess.run(
-            ['tmux', 'send-keys', '-t', tmux_session_name, keys],
-            check=True
-        )
-        return True
-    except subprocess.CalledProcessError as e:
-        logger.error(f"Failed to send keys to tmux session {tmux_session_name}: {e}")
-        return False
+        logger.info(f"Started shared ttyd on port {port} "
+                    f"(ready in {ttyd_process.startup_seconds * 1000:.1f}ms)")
+        return ttyd_process
     except Exception as e:
-        logger.error(f"Error sending keys to tmux session {tmux_session_name}: {e}")
-        return False
+        logger.error(f"Error starting shared ttyd process: {e}")
+        return None
 
-def kill_terminal(port):
-    """Kill a ttyd process and its associated tmux session."""
-    if port not in app.terminals:
-        return False
+# Commands for terminals, delivered in order by a dispatcher thread
+command_queue = CommandQueue(tmux_client.submit_many)
+
+def emit_trigger_match(terminal_id, match):
+    """Tell the clients in a terminal's room that its output matched a trigger."""
+    socketio = get_socketio()
+    if socketio:
+        socketio.emit('terminal_trigger', {
+            'terminal_id': terminal_id,
+            **match
+        }, room=f'terminal_{terminal_id}')
+
+# Trigger patterns matched against captured output; enabled with --output-triggers
+output_triggers = TriggerEngine(OUTPUT_TRIGGERS_PATH, on_match=emit_trigger_match)
+
+def handle_terminal_output(terminal_id, offset, data):
+    """Output capture callback: match new output against the triggers."""
+    if app.config.get('OUTPUT_TRIGGERS'):
+        output_triggers.feed(terminal_id, offset, data)
+
+# Output of every terminal mirrored into ring buffers; enabled with --output-buffer-size
+output_capture = OutputCapture(on_output=handle_terminal_output)
+
+# Cached screen and scrollback captures; captured output tells when nothing changed
+snapshot_cache = SnapshotCache(output_capture.end_offset)
+
+def queue_terminal_input(terminal_id, text, press_enter=True):
+    """
+    Queue text to be typed into a terminal, without waiting for tmux.
+
+    :param terminal_id: The id of the terminal.
+    :param text: The text to type.
+    :param press_enter: Whether to press Enter after the text.
+    :return: The command's sequence number, or None if the terminal does not exist.
+    :raises QueueFull: If the terminal already has too many commands waiting.
+    """
+    terminal_info = app.terminals.get(terminal_id)
+    if terminal_info is None or terminal_info.get('state') == STATE_CLOSING:
+        return None
+    args = ['send-keys', '-t', terminal_info['tmux_session'], text]
+    if press_enter:
+        args.append('Enter')
+    return command_queue.enqueue(terminal_id, args)
+
+def queue_terminal_batch(terminal_keys, commands):
+    """
+    Queue the same commands for many terminals in one pass.
+
+    Each command is typed and followed by Enter. All targets are resolved against
+    one registry snapshot and queued under a single lock acquisition, and the
+    dispatcher sends the whole fan-out to tmux as one pipelined write.
+
+    :param terminal_keys: Terminal ids, or legacy ttyd port numbers.
+    :param commands: The commands to run in each terminal, in order.
+    :return: One result dict per terminal key, in the order given. A terminal given
+             more than once is queued for once; its later keys are reported as duplicates.
+    """
+    terminals = app.terminals.snapshot()
+    targets = {}
+    results = []
+    for key in terminal_keys:
+        terminal_id = resolve_terminal_id(key)
+        terminal_info = terminals.get(terminal_id) if terminal_id else None
+        if terminal_info is None or terminal_info.get('state') == STATE_CLOSING:
+            results.append({'terminal': key, 'success': False, 'error': 'Terminal not found'})
+            continue
+        if terminal_id in targets:
+            results.append({'terminal': key, 'success': False, 'error': 'Duplicate terminal'})
+            continue
+        targets[terminal_id] = [['send-keys', '-t', terminal_info['tmux_session'], command, 'Enter']
+                                for command in commands]
+        results.append({'terminal': key, 'terminal_id': terminal_id})
+
+    queued = command_queue.enqueue_batch(targets)
+    for result in results:
+        if 'terminal_id' not in result:
+            continue
+        seqs = queued.get(result['terminal_id'])
+        if seqs is None:
+            result.update(success=False, error='Command queue full')
+        else:
+            result.update(success=True, seqs=seqs)
+    return results
+
+def get_ttyd_mode():
+    """Get how ttyd processes are laid out: one per terminal, or one shared by all."""
+    return app.config.get('TTYD_MODE', TTYD_MODE_PER_TERMINAL)
+
+def terminal_socket_path(tmux_session_name):
+    """Get the Unix socket path a terminal's ttyd listens on in unix mode."""
+    return os.path.join(app.config['RUNTIME_DIR'], f'{tmux_session_name}.sock')
+
+def terminal_location(terminal_info):
+    """
+    Get the ttyd port and URL path a browser uses to open a terminal.
+
+    :param terminal_info: The terminal's registry entry.
+    :return: A (port, path) tuple.
+    """
+    if terminal_info.get('port'):
+        return terminal_info['port'], '/'
+    
+    if terminal_info.get('socket_path'):
+        # Unix mode: served by this server's proxy, on the page's own origin
+        return None, f"{PROXY_PREFIX}/{terminal_info['tmux_session']}/"
+    
+    if app.shared_ttyd:
+        # Shared mode: one ttyd picks the session from the URL argument
+        return app.shared_ttyd['port'], f"/?arg={quote(terminal_info['tmux_session'])}"
+    
+    # Per-terminal mode with ttyd not started yet (or stopped while idle)
+    return None, None
+
+def terminal_running(terminal_info):
+    """
+    Check whether a terminal can be opened right now.
+
+    The process supervisor clears the process of a ttyd as soon as it exits,
+    so no liveness check is needed here.
+    """
+    if app.shared_ttyd:
+        return app.shared_ttyd['process'] is not None
+    return terminal_info.get('process') is not None
+
+def describe_terminal(terminal_id, terminal_info):
+    """Build the public description of a terminal returned by the API."""
+    port, path = terminal_location(terminal_info)
+    return {
+        'id': terminal_id,
+        'port': port,
+        'path': path,
+        'name': terminal_info.get('name', f'Terminal {terminal_id}'),
+        'tmux_session': terminal_info.get('tmux_session', ''),
+        'created_at': terminal_info.get('created_at', 0),
+        'startup_seconds': terminal_info.get('startup_seconds'),
+        'running': terminal_running(terminal_info),
+        'ttyd_started_at': terminal_info.get('ttyd_started_at'),
+        'state': terminal_info.get('state', STATE_READY),
+        'resources': resource_monitor.get(terminal_id)
+    }
+
+def resolve_terminal_id(key):
+    """
+    Map a terminal id, or a legacy ttyd port number, to its registry key.
+
+    :return: The terminal id, or None if no such terminal exists.
+    """
+    key = str(key)
+    if key in app.terminals:
+        return key
+    
+    if key.isdigit():
+        port = int(key)
+        for terminal_id, terminal_info in app.terminals.items():
+            if terminal_info.get('port') == port:
+                return terminal_id
+    return None
+
+def stop_ttyd(process, port, socket_path):
+    """Stop a terminal's ttyd and release its port and socket."""
+    # Kill the ttyd process (shared mode terminals have none of their own)
+    if process and process.poll() is None:
+        process.terminate()
+        process.wait(timeout=3)
+        logger.info(f"Terminated ttyd process for {socket_path or f'port {port}'}")
         
-    with app.process_lock:
+    release_ttyd_resources(port, socket_path)
+
+def release_ttyd_resources(port, socket_path):
+    """Release the port and socket of a ttyd that has exited."""
+    # The port is free again once ttyd has exited
+    port_allocator.release(port)
+    
+    if socket_path:
+        # Drop pooled proxy connections and the stale socket file
+        ttyd_proxy.discard_backend(socket_path)
         try:
-            terminal_info = app.terminals[port]
+            os.remove(socket_path)
+        except OSError:
+            pass
+
+def teardown_terminal_backend(terminal_info):
+    """Stop the ttyd process and tmux session behind a terminal."""
+    stop_ttyd(terminal_info.get('process'), terminal_info.get('port'),
+              terminal_info.get('socket_path'))
+        
+    # Kill the tmux session
+    tmux_client.run('kill-session', '-t', terminal_info['tmux_session'])
+    logger.info(f"Killed tmux session {terminal_info['tmux_session']}")
+
+def spawn_terminal_backend():
+    """
+    Cold spawn the backend of a new terminal.
+
+    In per-terminal mode this is a tmux session plus its own ttyd on a free port;
+    in unix mode the ttyd listens on a Unix socket instead, so no port is allocated;
+    in shared mode only the tmux session is needed. With --lazy-ttyd only the tmux
+    session is created in every mode; ttyd starts on first view.
+
+    :return: A backend dict with port, process, tmux_session and socket_path, or None on failure.
+    """
+    if get_ttyd_mode() == TTYD_MODE_SHARED or app.config.get('LAZY_TTYD'):
+        tmux_session = f"commandwave-{uuid.uuid4().hex[:8]}"
+        try:
+            ensure_tmux_session(tmux_session)
+        except TmuxError as e:
+            logger.error(f"Failed to create tmux session {tmux_session}: {e}")
+            return None
             
-            # Kill the ttyd process
-            if terminal_info['process'] and terminal_info['process'].poll() is None:
-                terminal_info['process'].terminate()
-                terminal_info['process'].wait(timeout=3)
-                logger.info(f"Terminated ttyd process for port {port}")
-                
-            # Kill the tmux session
-            subprocess.run(
-                ['tmux', 'kill-session', '-t', terminal_info['tmux_session']],
-                check=True
-            )
-            logger.info(f"Killed tmux session {terminal_info['tmux_session']}")
+        return {
+            'port': None,
+            'process': None,
+            'tmux_session': tmux_session,
+            'socket_path': terminal_socket_path(tmux_session) if get_ttyd_mode() == TTYD_MODE_UNIX else None
+        }
+    
+    if get_ttyd_mode() == TTYD_MODE_UNIX:
+        tmux_session = f"commandwave-{uuid.uuid4().hex[:8]}"
+        socket_path = terminal_socket_path(tmux_session)
+        ttyd_process = start_ttyd_process(None, tmux_session, socket_path=socket_path)
+        if not ttyd_process:
+            return None
             
-            # Clean up the helper script if it exists
-            theme_script_path = os.path.join(BASE_DIR, f'apply_theme_{port}.sh')
-            if os.path.exists(theme_script_path):
-                try:
-                    os.remove(theme_script_path)
-                    logger.info(f"Removed helper script: {theme_script_path}")
-                except Exception as e:
-                    logger.warning(f"Failed to remove helper script {theme_script_path}: {e}")
+        return {
+            'port': None,
+            'process': ttyd_process,
+            'tmux_session': tmux_session,
+            'socket_path': socket_path
+        }
+    
+    port = port_allocator.reserve()
+    if not port:
+        logger.error("Could not find available port for new terminal")
+        return None
+        
+    # Not named after the port: a port freed by an idle or crashed ttyd is handed
+    # out again while its terminal's session lives on
+    tmux_session = f"commandwave-{uuid.uuid4().hex[:8]}"
+    ttyd_process = start_ttyd_process(port, tmux_session)
+    if not ttyd_process:
+        port_allocator.release(port)
+        return None
+        
+    return {
+        'port': port,
+        'process': ttyd_process,
+        'tmux_session': tmux_session,
+        'socket_path': None
+    }
+
+def spawn_terminal_backends(count):
+    """
+    Cold spawn the backends of several terminals at once.
+
+    Ports are reserved in one step, the tmux sessions are created in a single
+    pipelined round trip and the ttyd processes start concurrently, so the batch
+    takes about as long as spawning one backend.
+
+    :param count: The number of backends to spawn.
+    :return: A list of count backend dicts like spawn_terminal_backend's, with None for each that failed.
+    """
+    if count <= 0:
+        return []
+    mode = get_ttyd_mode()
+    lazy = mode == TTYD_MODE_SHARED or app.config.get('LAZY_TTYD')
+    
+    ports = [None] * count
+    if not lazy and mode != TTYD_MODE_UNIX:
+        ports = port_allocator.reserve_many(count)
+        if ports is None:
+            logger.error(f"Could not find {count} available ports for new terminals")
+            return [None] * count
+    sessions = [f"commandwave-{uuid.uuid4().hex[:8]}" for _ in ports]
+    
+    try:
+        replies = tmux_client.submit_many([['new-session', '-d', '-s', session] for session in sessions])
+    except TmuxError as e:
+        logger.error(f"Failed to create tmux sessions: {e}")
+        for port in ports:
+            port_allocator.release(port)
+        return [None] * count
+        
+    backends = []
+    for port, session, reply in zip(ports, sessions, replies):
+        try:
+            reply.result()
+        except TmuxError as e:
+            logger.error(f"Failed to create tmux session {session}: {e}")
+            port_allocator.release(port)
+            backends.append(None)
+            continue
+        backends.append({
+            'port': port,
+            'process': None,
+            'tmux_session': session,
+            'socket_path': terminal_socket_path(session) if mode == TTYD_MODE_UNIX else None
+        })
+    logger.info(f"Created {sum(1 for backend in backends if backend)} tmux sessions in one batch")
+    if lazy:
+        return backends
+    
+    def start(backend):
+        backend['process'] = launch_session_ttyd(backend['port'], backend['tmux_session'],
+                                                 socket_path=backend['socket_path'])
+        if backend['process'] is None:
+            release_ttyd_resources(backend['port'], backend['socket_path'])
+            tmux_client.submit(['kill-session', '-t', backend['tmux_session']])
+            return None
+        return backend
+    
+    pending = [backend for backend in backends if backend]
+    if not pending:
+        return backends
+    with ThreadPoolExecutor(max_workers=min(BULK_SPAWN_WORKERS, len(pending))) as executor:
+        started = iter(executor.map(start, pending))
+        return [next(started) if backend else None for backend in backends]
+
+def discard_terminal_backend(backend):
+    """Tear down a pooled backend that was never handed out."""
+    try:
+        teardown_terminal_backend(backend)
+    except Exception as e:
+        logger.warning(f"Failed to discard pooled terminal {backend['tmux_session']}: {e}")
+
+# Terminal metadata persisted across restarts, used to adopt surviving tmux sessions
+session_store = SessionStore(TERMINAL_REGISTRY_PATH)
+
+def persist_terminal_registry():
+    """Write the terminal registry to disk so a restarted server can adopt its sessions."""
+    snapshot = {
+        terminal_id: {
+            'name': terminal_info.get('name'),
+            'created_at': terminal_info.get('created_at'),
+            'port': terminal_info.get('port'),
+            'socket_path': terminal_info.get('socket_path'),
+            'pid': terminal_info['process'].pid if terminal_info.get('process') else None
+        }
+        for terminal_id, terminal_info in app.terminals.items()
+        if terminal_info.get('state') != STATE_CLOSING
+    }
+    session_store.save(snapshot)
+
+def spawn_pooled_terminal_backend():
+    """Spawn a backend for the warm pool, marked so a restart does not adopt it as a tab."""
+    backend = spawn_terminal_backend()
+    if backend is not None:
+        try:
+            tmux_client.run('set-option', '-t', backend['tmux_session'], POOLED_SESSION_OPTION, '1')
+        except TmuxError as e:
+            logger.warning(f"Failed to mark pooled session {backend['tmux_session']}: {e}")
+    return backend
+
+terminal_pool = TerminalPool(spawn_pooled_terminal_backend, discard_terminal_backend)
+
+def create_terminal(tab_name):
+    """
+    Create a named terminal, claiming a warm backend from the pool when one is ready.
+
+    :param tab_name: The display name of the new terminal.
+    :return: The id of the new terminal (its tmux session name), or None if it could not be created.
+    """
+    backend = terminal_pool.acquire()
+    if backend is None:
+        # Pool is empty, fall back to spawning on the request thread
+        backend = spawn_terminal_backend()
+        if backend is None:
+            return None
+    else:
+        claim_pooled_backend(backend)
             
-            # Remove from terminals dict
-            del app.terminals[port]
-            return True
-        except subprocess.CalledProcessError as e:
+    terminal_id = register_terminal(backend, tab_name)
+    if terminal_id is None:
+        return None
+    persist_terminal_registry()
+    logger.info(f"Created new terminal {terminal_id} with name '{tab_name}'")
+    return terminal_id
+
+def create_terminals(tab_names):
+    """
+    Create several named terminals at once.
+
+    Warm backends are claimed from the pool first; the rest are spawned together
+    by spawn_terminal_backends rather than one after another.
+
+    :param tab_names: The display names of the new terminals.
+    :return: A list with the id of each new terminal, or None where it could not be created.
+    """
+    backends = terminal_pool.acquire_many(len(tab_names))
+    for backend in backends:
+        claim_pooled_backend(backend)
+    backends += spawn_terminal_backends(len(tab_names) - len(backends))
+    
+    terminal_ids = [register_terminal(backend, tab_name) if backend else None
+                    for tab_name, backend in zip(tab_names, backends)]
+    persist_terminal_registry()
+    logger.info(f"Created {sum(1 for terminal_id in terminal_ids if terminal_id)} of "
+                f"{len(tab_names)} terminals in bulk")
+    return terminal_ids
+
+def claim_pooled_backend(backend):
+    """Unmark a backend taken from the pool; the session is a real terminal now."""
+    # No need to wait for tmux to confirm
+    tmux_client.submit(['set-option', '-u', '-t', backend['tmux_session'], POOLED_SESSION_OPTION])
+
+def register_terminal(backend, tab_name):
+    """
+    Add a spawned or claimed backend to the registry as a named terminal and start capturing its output.
+
+    A live terminal with the same id is never replaced; the backend's ttyd is
+    stopped instead, leaving the session to the terminal that owns it.
+
+    :return: The id of the new terminal, or None if the id is already taken.
+    """
+    terminal_id = backend['tmux_session']
+    if backend['process'] is not None and backend['process'].poll() is not None:
+        # A pooled ttyd died while waiting; the next view starts a new one
+        backend['process'] = None
+    registered = app.terminals.insert(terminal_id, {
+        'port': backend['port'],
+        'process': backend['process'],
+        'tmux_session': backend['tmux_session'],
+        'socket_path': backend['socket_path'],
+        'created_at': time.time(),
+        'name': tab_name,
+        'startup_seconds': getattr(backend['process'], 'startup_seconds', None),
+        'ttyd_started_at': time.time() if backend['process'] else None
+    }, replace=False)
+    if registered is None:
+        logger.error(f"Terminal {terminal_id} already exists, not replacing it")
+        stop_ttyd(backend['process'], backend['port'], None)
+        return None
+        
+    output_capture.start(terminal_id, terminal_id)
+    return terminal_id
+
+def kill_terminal(terminal_id):
+    """
+    Kill a ttyd process and its associated tmux session.
+
+    The terminal is marked closing first, so it drops out of listings at once and
+    a concurrent kill is refused; the slow teardown then runs under the terminal's
+    own lock, leaving every other terminal usable meanwhile. The terminal lets go
+    of its ttyd before stopping it, so the exit is not taken for a crash.
+    """
+    if app.terminals.transition(terminal_id, (STATE_READY,), STATE_CLOSING) is None:
+        return False
+        
+    with app.terminals.entry_lock(terminal_id):
+        output_capture.stop(terminal_id)
+        terminal_info = app.terminals[terminal_id]
+        app.terminals.update(terminal_id, process=None, ttyd_started_at=None)
+        try:
+            teardown_terminal_backend(terminal_info)
+        except TmuxError as e:
             logger.error(f"Failed to kill tmux session: {e}")
+            app.terminals.transition(terminal_id, (STATE_CLOSING,), STATE_READY)
             return False
         except Exception as e:
-            logger.error(f"Error killing terminal on port {port}: {e}")
+            logger.error(f"Error killing terminal {terminal_id}: {e}")
+            app.terminals.transition(terminal_id, (STATE_CLOSING,), STATE_READY)
             return False
+            
+        app.terminals.remove(terminal_id)
+        restart_backoff.forget(terminal_id)
+        command_queue.discard(terminal_id)
+        snapshot_cache.discard(terminal_id)
+        output_triggers.discard(terminal_id)
+            
+    persist_terminal_registry()
+    return True
+
+def start_terminal_ttyd(terminal_id):
+    """
+    Start ttyd for a terminal whose ttyd was never started or was stopped while idle.
+
+    :param terminal_id: The id of the terminal.
+    :return: A (running, started) tuple; started is True if ttyd was started by this call.
+    """
+    # Concurrent views of one terminal start its ttyd only once; other terminals are not held up
+    with app.terminals.entry_lock(terminal_id):
+        terminal_info = app.terminals.get(terminal_id)
+        if terminal_info is None or terminal_info.get('state') == STATE_CLOSING:
+            return False, False
+        if terminal_running(terminal_info):
+            idle_reaper.touch(terminal_id)
+            return True, False
+        if get_ttyd_mode() == TTYD_MODE_SHARED:
+            # Nothing to start per terminal; the shared ttyd is down
+            return False, False
+        tmux_session = terminal_info['tmux_session']
+        socket_path = terminal_info.get('socket_path')
+        
+        # A crashed ttyd keeps its port so the terminal's URL stays valid
+        kept_port = terminal_info.get('port')
+            
+        port = None
+        if socket_path:
+            ttyd_process = start_ttyd_process(None, tmux_session, socket_path=socket_path)
+        else:
+            port = kept_port or port_allocator.reserve()
+            if not port:
+                logger.error(f"Could not find available port to start terminal {terminal_id}")
+                return False, False
+            ttyd_process = start_ttyd_process(port, tmux_session)
+            
+        if not ttyd_process:
+            if port != kept_port:
+                port_allocator.release(port)
+            return False, False
+            
+        terminal_info = app.terminals.update(
+            terminal_id,
+            port=port,
+            process=ttyd_process,
+            startup_seconds=ttyd_process.startup_seconds,
+            ttyd_started_at=time.time()
+        )
+        if terminal_info is None:
+            # Closed while ttyd was starting
+            stop_ttyd(ttyd_process, port, socket_path)
+            return False, False
+            
+        idle_reaper.touch(terminal_id)
+        persist_terminal_registry()
+        logger.info(f"Started ttyd for terminal {terminal_id}")
+        return True, True
+
+def stop_terminal_ttyd(terminal_id):
+    """
+    Stop a terminal's ttyd while keeping its tmux session, shell and scrollback alive.
+
+    :param terminal_id: The id of the terminal.
+    :return: True if a running ttyd was stopped.
+    """
+    with app.terminals.entry_lock(terminal_id):
+        terminal_info = app.terminals.get(terminal_id)
+        if terminal_info is None or not terminal_info.get('process'):
+            return False
+        process = terminal_info['process']
+        port = terminal_info.get('port')
+        if app.terminals.update(terminal_id, expect={'process': process},
+                                process=None, port=None, ttyd_started_at=None) is None:
+            return False
+            
+        stop_ttyd(process, port, terminal_info.get('socket_path'))
+        
+    persist_terminal_registry()
+    return True
+
+def running_ttyd_terminals():
+    """List terminals that currently have a ttyd process of their own."""
+    return [terminal_id for terminal_id, terminal_info in app.terminals.items()
+            if terminal_info.get('process') is not None]
+
+def terminal_viewer_count(terminal_id):
+    """Count the clients that have a terminal open as their active tab."""
+    return len(client_tracker.terminal_rooms.get(terminal_id, ()))
+
+def search_terminal_output(pattern, regex=False, ignore_case=False, pane_timeout=DEFAULT_PANE_TIMEOUT):
+    """
+    Search the scrollback of every open terminal concurrently.
+
+    :param pattern: Literal text, or a regular expression if regex is set.
+    :return: Every terminal's result, the match count and the elapsed time.
+    :raises re.error: If the regular expression is invalid.
+    """
+    compiled = compile_pattern(pattern, regex, ignore_case)
+    terminals = {
+        terminal_id: {'tmux_session': terminal_info['tmux_session'], 'name': terminal_info.get('name')}
+        for terminal_id, terminal_info in app.terminals.items()
+        if terminal_info.get('state') != STATE_CLOSING
+    }
+    return search_terminals(snapshot_cache, terminals, compiled, pane_timeout=pane_timeout)
+
+def terminal_sessions():
+    """Map every open terminal to its tmux session, for the resource monitor."""
+    return {
+        terminal_id: terminal_info['tmux_session']
+        for terminal_id, terminal_info in app.terminals.items()
+        if terminal_info.get('state') != STATE_CLOSING
+    }
+
+def emit_terminal_resources(changed, removed):
+    """Send the terminals whose resource usage changed to every client."""
+    socketio = get_socketio()
+    if socketio:
+        socketio.emit('terminal_resources', {
+            'terminals': changed,
+            'removed': removed,
+            'timestamp': time.time()
+        })
+
+# Per-terminal CPU, memory and open files; enabled with --resource-interval
+resource_monitor = ResourceMonitor(terminal_sessions, on_update=emit_terminal_resources)
+
+def emit_terminal_health(terminal_id, status, **details):
+    """Tell every client about a change in a terminal's ttyd health."""
+    # Called from the supervisor and restart timer threads, outside any request
+    socketio = get_socketio()
+    if socketio:
+        socketio.emit('terminal_health', {
+            'terminal_id': terminal_id,
+            'status': status,
+            'timestamp': time.time(),
+            **details
+        })
+
+def handle_ttyd_exit(process, returncode, stderr_tail):
+    """
+    Process supervisor callback for an exited ttyd.
+
+    Exits of ttyd processes that were stopped on purpose are ignored; their
+    terminals no longer reference them, or are closing. A crashed ttyd is
+    restarted with backoff as long as its tmux session is alive.
+    """
+    if _shutdown_in_progress:
+        return
+        
+    if app.shared_ttyd and app.shared_ttyd['process'] is process:
+        app.shared_ttyd['process'] = None
+        logger.error(f"Shared ttyd exited with code {returncode}: {' | '.join(stderr_tail[-3:])}")
+        delay = restart_backoff.next_delay('shared')
+        if delay is not None:
+            timer = threading.Timer(delay, restart_shared_ttyd)
+            timer.daemon = True
+            timer.start()
+        return
+        
+    terminal_id, terminal_info = next(((tid, info) for tid, info in app.terminals.items()
+                                       if info.get('process') is process), (None, None))
+    if terminal_id is None or terminal_info.get('state') == STATE_CLOSING:
+        # Stopped on purpose, being deleted, or an unclaimed pool backend
+        return
+    started_at = terminal_info.get('ttyd_started_at')
+    if app.terminals.update(terminal_id, expect={'process': process, 'state': STATE_READY},
+                            process=None, ttyd_started_at=None) is None:
+        # Stopped or closing meanwhile
+        return
+        
+    uptime = time.time() - started_at if started_at else None
+    logger.error(f"ttyd for terminal {terminal_id} exited with code {returncode}: "
+                 f"{' | '.join(stderr_tail[-3:]) or 'no output'}")
+    
+    delay = restart_backoff.next_delay(terminal_id, uptime)
+    if delay is None:
+        logger.error(f"ttyd for terminal {terminal_id} keeps crashing, giving up")
+        emit_terminal_health(terminal_id, 'failed', returncode=returncode,
+                             restarts=restart_backoff.restarts(terminal_id) - 1)
+        return
+        
+    emit_terminal_health(terminal_id, 'crashed', returncode=returncode, retry_in=delay)
+    timer = threading.Timer(delay, restart_crashed_ttyd, args=(terminal_id,))
+    timer.daemon = True
+    timer.start()
+
+def restart_crashed_ttyd(terminal_id):
+    """Restart the ttyd of a terminal after a crash, if the terminal and its shell still exist."""
+    terminal_info = app.terminals.get(terminal_id)
+    tmux_session = terminal_info['tmux_session'] if terminal_info else None
+    if tmux_session is None or terminal_info.get('state') == STATE_CLOSING:
+        restart_backoff.forget(terminal_id)
+        return
+        
+    if not has_session(tmux_session):
+        logger.warning(f"tmux session of terminal {terminal_id} is gone, not restarting ttyd")
+        emit_terminal_health(terminal_id, 'session_ended')
+        return
+        
+    running, _ = start_terminal_ttyd(terminal_id)
+    if running:
+        logger.info(f"Restarted crashed ttyd for terminal {terminal_id}")
+        emit_terminal_health(terminal_id, 'running', restarts=restart_backoff.restarts(terminal_id))
+    else:
+        # Treat a failed start like another crash
+        delay = restart_backoff.next_delay(terminal_id)
+        if delay is None:
+            emit_terminal_health(terminal_id, 'failed', restarts=restart_backoff.restarts(terminal_id) - 1)
+            return
+        timer = threading.Timer(delay, restart_crashed_ttyd, args=(terminal_id,))
+        timer.daemon = True
+        timer.start()
+
+def restart_shared_ttyd():
+    """Restart the shared ttyd on its port after a crash."""
+    if _shutdown_in_progress or not app.shared_ttyd:
+        return
+    process = start_shared_ttyd_process(app.shared_ttyd['port'])
+    if process:
+        app.shared_ttyd['process'] = process
+        logger.info("Restarted crashed shared ttyd")
+        emit_terminal_health('shared', 'running')
+        return
+    delay = restart_backoff.next_delay('shared')
+    if delay is not None:
+        timer = threading.Timer(delay, restart_shared_ttyd)
+        timer.daemon = True
+        timer.start()
+
+idle_reaper = IdleReaper(running_ttyd_terminals, terminal_viewer_count, stop_terminal_ttyd, idle_timeout=0)
+
+def adopt_existing_sessions():
+    """
+    Rebuild the terminal registry from the tmux sessions of a previous run.
+
+    All commandwave-* sessions are listed in a single tmux call and matched with the
+    persisted registry for their names. A ttyd that survived the previous run is
+    adopted as is; otherwise a new one is started, all terminals in parallel.
+    Unclaimed pool sessions are killed rather than turned into tabs.
+
+    :return: The number of terminals adopted.
+    """
+    try:
+        lines = tmux_client.run('list-sessions', '-F',
+                                f'#{{session_name}}\t#{{session_created}}\t#{{{POOLED_SESSION_OPTION}}}')
+    except TmuxError:
+        # No tmux server running, so nothing survived
+        return 0
+        
+    stored = session_store.load()
+    sessions, leftover_pool = [], []
+    for line in lines:
+        name, _, rest = line.partition('\t')
+        created, _, pooled = rest.partition('\t')
+        if not name.startswith('commandwave-'):
+            continue
+        if pooled == '1':
+            leftover_pool.append(name)
+        else:
+            sessions.append((name, float(created) if created.isdigit() else time.time()))
+            
+    if leftover_pool:
+        # Pipelined in one write; replies are not needed
+        tmux_client.submit_many([['kill-session', '-t', f'={name}'] for name in leftover_pool])
+        logger.info(f"Killed {len(leftover_pool)} unclaimed pool sessions from a previous run")
+        
+    if not sessions:
+        return 0
+        
+    started = time.monotonic()
+    mode = get_ttyd_mode()
+    
+    # Each terminal keeps the port its ttyd had, taken from the registry file or from
+    # a commandwave-<port> session name of older versions. They are all reserved
+    # before any terminal starts afresh, so a fresh port never takes a kept one.
+    kept_ports = {}
+    if mode == TTYD_MODE_PER_TERMINAL:
+        for tmux_session, _ in sessions:
+            port = stored.get(tmux_session, {}).get('port')
+            suffix = tmux_session[len('commandwave-'):]
+            if not port and suffix.isdigit():
+                port = int(suffix)
+            if port and port_allocator.reserve_port(port):
+                kept_ports[tmux_session] = port
+    
+    def restore(session):
+        tmux_session, created_at = session
+        record = stored.get(tmux_session, {})
+        terminal_info = {
+            'port': None,
+            'process': None,
+            'tmux_session': tmux_session,
+            'socket_path': None,
+            'created_at': record.get('created_at') or created_at,
+            'name': record.get('name') or ('Main Terminal' if tmux_session == 'commandwave-main'
+                                           else f"Terminal {tmux_session[len('commandwave-'):]}"),
+            'startup_seconds': None,
+            'ttyd_started_at': None
+        }
+        if mode == TTYD_MODE_SHARED:
+            return terminal_info
+            
+        # Take over a ttyd that outlived the previous server process
+        port, socket_path = record.get('port'), record.get('socket_path')
+        kept_port = kept_ports.get(tmux_session)
+        process = adopt_ttyd(record.get('pid'), port=port, socket_path=socket_path)
+        if process is not None:
+            if socket_path or port == DEFAULT_TERMINAL_PORT or (port and port == kept_port):
+                terminal_info.update(port=port, process=process, socket_path=socket_path,
+                                     ttyd_started_at=time.time())
+                process_supervisor.watch(process, handle_ttyd_exit)
+                return terminal_info
+            # Its port is already taken by another adopted terminal; start afresh
+            process.terminate()
+            
+        if mode == TTYD_MODE_UNIX:
+            terminal_info['socket_path'] = terminal_socket_path(tmux_session)
+        if app.config.get('LAZY_TTYD'):
+            # Started on first view, on whatever port is free then
+            port_allocator.release(kept_port)
+            return terminal_info
+            
+        if terminal_info['socket_path']:
+            process = start_ttyd_process(None, tmux_session,
+                                         socket_path=terminal_info['socket_path'])
+        else:
+            if tmux_session == 'commandwave-main' and is_port_available(DEFAULT_TERMINAL_PORT):
+                port = DEFAULT_TERMINAL_PORT
+            elif kept_port and is_port_available(kept_port):
+                port = kept_port
+            else:
+                # The kept port, if any, is held by something else; use a fresh one
+                port_allocator.release(kept_port)
+                port = port_allocator.reserve()
+            if not port:
+                logger.error(f"Could not find available port to adopt terminal {tmux_session}")
+                return terminal_info
+            process = start_ttyd_process(port, tmux_session)
+            if not process:
+                port_allocator.release(port)
+                port = None
+            terminal_info['port'] = port
+            
+        if process:
+            terminal_info.update(process=process, startup_seconds=process.startup_seconds,
+                                 ttyd_started_at=time.time())
+        return terminal_info
+        
+    with ThreadPoolExecutor(max_workers=min(8, len(sessions))) as executor:
+        restored = list(executor.map(restore, sessions))
+        
+    for terminal_info in restored:
+        app.terminals.insert(terminal_info['tmux_session'], terminal_info)
+        output_capture.start(terminal_info['tmux_session'], terminal_info['tmux_session'])
+            
+    persist_terminal_registry()
+    logger.info(f"Adopted {len(restored)} existing terminal sessions in {time.monotonic() - started:.2f}s")
+    return len(restored)
+
+def wait_for_exit(processes, deadline):
+    """
+    Wait until every process has exited or the deadline passes.
+
+    :return: The processes still running.
+    """
+    delay = 0.005
+    while True:
+        running = [process for process in processes if process.poll() is None]
+        now = time.monotonic()
+        if not running or now >= deadline:
+            return running
+        time.sleep(min(delay, deadline - now))
+        delay = min(delay * 2, 0.1)
 
 def cleanup_all_terminals():
-    """Clean up all terminal processes when the application exits."""
+    """
+    Clean up all terminal processes when the application exits.
+
+    Teardown fans out instead of going terminal by terminal: every ttyd gets
+    SIGTERM at once, all tmux sessions are killed in one pipelined batch, and
+    whatever is still running when SHUTDOWN_DEADLINE passes gets SIGKILL. The
+    time taken therefore does not grow with the number of terminals.
+    """
+    global _shutdown_in_progress, _cleanup_done
+    if _cleanup_done:
+        return
+    _cleanup_done = True
+    # Exits from here on are expected, not crashes to restart
+    _shutdown_in_progress = True
+    
+    started = time.monotonic()
+    deadline = started + SHUTDOWN_DEADLINE
     logger.info("Cleaning up all terminal processes...")
     
-    # Make a copy of the keys since we'll be modifying the dictionary
-    ports = list(app.terminals.keys())
+    keep_sessions = app.config.get('KEEP_SESSIONS', False)
+    idle_reaper.stop()
+    resource_monitor.stop()
+    playbook_watcher.stop()
+    command_queue.stop()
+    # Kept sessions must not go on writing into pipes nobody reads
+    output_capture.shutdown(close_pipes=keep_sessions)
+    
+    # Warm terminals that were never claimed are always torn down
+    pooled = terminal_pool.shutdown(discard=False)
+    
+    if keep_sessions:
+        # Keep the entries so the registry still lists the sessions to adopt, each
+        # with its port for the next start to give back to it
+        terminals = list(app.terminals.items())
+        for terminal_id, _ in terminals:
+            app.terminals.update(terminal_id, process=None)
+    else:
+        terminals = list(app.terminals.clear().items())
+            
+    backends = [terminal_info for _, terminal_info in terminals] + pooled
     
-    for port in ports:
-        kill_terminal(port)
+    # SIGTERM every ttyd at once
+    processes = [backend['process'] for backend in backends if backend.get('process')]
+    if app.shared_ttyd and app.shared_ttyd['process']:
+        processes.append(app.shared_ttyd['process'])
+    for process in processes:
+        try:
+            process.terminate()
+        except OSError:
+            pass
+            
+    # Kill the tmux sessions in a single pipelined write while ttyd shuts down
+    sessions = [backend['tmux_session'] for backend in pooled]
+    if not keep_sessions:
+        sessions.extend(terminal_info['tmux_session'] for _, terminal_info in terminals)
+    pending = []
+    if sessions:
+        try:
+            pending = tmux_client.submit_many([['kill-session', '-t', f'={session}'] for session in sessions])
+        except TmuxError as e:
+            logger.error(f"Failed to kill tmux sessions: {e}")
+            
+    # SIGKILL whatever has not exited by the deadline
+    stragglers = wait_for_exit(processes, deadline)
+    for process in stragglers:
+        try:
+            process.kill()
+        except OSError:
+            pass
+    if stragglers:
+        logger.warning(f"Killed {len(stragglers)} ttyd processes that did not exit in time")
+        wait_for_exit(stragglers, time.monotonic() + 1.0)
         
-    logger.info("Cleanup complete")
+    for result in pending:
+        try:
+            result.result(timeout=max(0.1, deadline - time.monotonic()))
+        except TmuxError:
+            # Session already gone
+            pass
+            
+    for backend in backends:
+        release_ttyd_resources(backend.get('port'), backend.get('socket_path'))
+        
+    # Record what is left for the next start to adopt
+    persist_terminal_registry()
+    
+    # Detach the shared tmux control client
+    tmux_client.close()
     
+    # Remove the socket directory if we created it
+    if app.config.get('RUNTIME_DIR_CREATED'):
+        shutil.rmtree(app.config['RUNTIME_DIR'], ignore_errors=True)
+        
+    logger.info(f"Cleanup complete: stopped {len(processes)} ttyd processes and "
+                f"{len(sessions)} tmux sessions in {time.monotonic() - started:.2f}s")
+    
+    if keep_sessions:
+        # Variables belong to the sessions that are being kept
+        return
+        
     # Clean up persisted variable files
     logger.info("Cleaning up persisted variable files...")
     try:
@@ -295,6 +1287,8 @@ atexit.register(cleanup_all_terminals)
 
 # Flag to prevent multiple signal handler executions
 _shutdown_in_progress = False
+# Set once cleanup has run, so the atexit hook does not repeat it after a signal
+_cleanup_done = False
 
 def signal_handler(sig, frame):
     """Handle termination signals by cleaning up and exiting."""
@@ -319,6 +1313,8 @@ app.register_blueprint(variable_routes)
 app.register_blueprint(terminal_routes)
 app.register_blueprint(sync_routes)
 app.register_blueprint(notes_routes)
+app.register_blueprint(proxy_routes)
+app.register_blueprint(trigger_routes)
 
 # Initialize SocketIO
 socketio = init_socketio(app)
@@ -329,8 +1325,21 @@ init_socketio_events(socketio)
 @app.route('/')
 def index():
     """Render the main application page."""
+    default_terminal_id = app.config.get('DEFAULT_TERMINAL_ID', 'commandwave-main')
+    default_terminal_port = app.config.get('DEFAULT_TERMINAL_PORT', DEFAULT_TERMINAL_PORT)
+    default_terminal_path = app.config.get('DEFAULT_TERMINAL_PATH', '/')
+    
+    # The main terminal's ttyd may have been stopped while idle and come back on another port
+    if default_terminal_id in app.terminals:
+        start_terminal_ttyd(default_terminal_id)
+        terminal_info = app.terminals.get(default_terminal_id)
+        if terminal_info is not None:
+            default_terminal_port, default_terminal_path = terminal_location(terminal_info)
+    
     return render_template('index.html', 
-                          default_terminal_port=app.config.get('DEFAULT_TERMINAL_PORT', DEFAULT_TERMINAL_PORT),
+                          default_terminal_id=default_terminal_id,
+                          default_terminal_port=default_terminal_port,
+                          default_terminal_path=default_terminal_path,
                           hostname=app.config.get('HOSTNAME', HOSTNAME))
 
 @app.route('/healthcheck')
@@ -341,59 +1350,36 @@ def healthcheck():
 @app.route('/api/playbooks/<path:filepath>', methods=['GET'])
 def get_playbook_file(filepath):
     """Get a playbook file from any subdirectory within the playbooks directory."""
-    # Secure the filepath to prevent directory traversal
-    # Ensure the requested file is within the playbooks directory
-    abs_path = os.path.abspath(os.path.join(PLAYBOOKS_DIR, filepath))
-    if not abs_path.startswith(os.path.abspath(PLAYBOOKS_DIR)):
-        return jsonify({
-            'success': False,
-            'error': 'Invalid file path'
-        }), 400
-    
-    # Check if the file exists
-    if not os.path.exists(abs_path) or not os.path.isfile(abs_path):
-        return jsonify({
-            'success': False,
-            'error': f'File not found: {filepath}'
-        }), 404
-    
-    # Check if it's a markdown file
-    if not abs_path.lower().endswith('.md'):
-        return jsonify({
-            'success': False,
-            'error': 'Only .md files are supported'
-        }), 400
-    
-    # Read the file content
+    # Only playbooks within the playbooks directory are found
     try:
-        with open(abs_path, 'r', encoding='utf-8') as f:
-            content = f.read()
+        playbook = find_playbook(filepath)
+        if playbook is None:
+            return jsonify({
+                'success': False,
+                'error': f'File not found: {filepath}'
+            }), 404
         
         return jsonify({
             'success': True,
             'filename': os.path.basename(filepath),
-            'content': content
+            'content': playbook['content']
         })
     except Exception as e:
-        logger.error(f"Error loading playbook {abs_path}: {e}")
+        logger.error(f"Error loading playbook {filepath}: {e}")
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
 
-# Terminal management endpoints
 @app.route('/api/terminals/list', methods=['GET'])
 def list_terminals():
     """Get a list of all active terminals."""
-    terminal_list = []
-    with app.process_lock:
-        for port, terminal in app.terminals.items():
-            terminal_list.append({
-                'port': port,
-                'name': terminal.get('name', f'Terminal {port}'),
-                'tmux_session': terminal.get('tmux_session', ''),
-                'created_at': terminal.get('created_at', 0)
-            })
+    # Served from the registry snapshot; terminals being closed are left out
+    terminal_list = [
+        describe_terminal(terminal_id, terminal)
+        for terminal_id, terminal in app.terminals.items()
+        if terminal.get('state') != STATE_CLOSING
+    ]
     
     return jsonify({
         'success': True,
@@ -402,43 +1388,20 @@ def list_terminals():
 
 @app.route('/api/terminals/new', methods=['POST'])
 def new_terminal():
-    """Create a new terminal session and return its port."""
+    """Create a new terminal session and return its id and location."""
     try:
         # Get terminal name from request
         data = request.get_json()
         tab_name = data.get('name', 'Terminal')
         
-        # Find an available port
-        port = find_available_port(TERMINAL_PORT_RANGE[0], TERMINAL_PORT_RANGE[1])
-        if not port:
-            logger.error("Could not find available port for new terminal")
-            return jsonify({
-                'success': False,
-                'error': 'No available ports'
-            }), 500
-            
-        # Create the terminal
-        tmux_session = f"commandwave-{port}"
-        ttyd_process = start_ttyd_process(
-            port, 
-            tmux_session,
-            app.config.get('USE_TMUX_CONFIG', False)
-        )
+        # Create the terminal, using a pooled backend when available
+        terminal_id = create_terminal(tab_name)
+        terminal = app.terminals.get(terminal_id) if terminal_id else None
         
-        if ttyd_process:
-            with app.process_lock:
-                app.terminals[port] = {
-                    'process': ttyd_process,
-                    'tmux_session': tmux_session,
-                    'created_at': time.time(),
-                    'name': tab_name
-                }
-                
-            logger.info(f"Created new terminal on port {port} with name '{tab_name}'")
+        if terminal:
             return jsonify({
                 'success': True,
-                'port': port,
-                'name': tab_name
+                **describe_terminal(terminal_id, terminal)
             })
         else:
             return jsonify({
@@ -463,70 +1426,77 @@ def send_keys():
             'error': 'Missing required fields: port, keys'
         }), 400
     
-    port = int(data['port'])
+    # 'port' carries the terminal id; legacy clients send the ttyd port number
+    terminal_id = resolve_terminal_id(data['port'])
     keys = data['keys']
     
-    if port not in app.terminals:
+    # Ensure keys end with a newline if not already present
+    if not keys.endswith('\n'):
+        keys += '\n'
+        
+    # Queue the keys; they are delivered in order without holding up this request
+    try:
+        seq = queue_terminal_input(terminal_id, keys, press_enter=False) if terminal_id else None
+    except QueueFull as e:
         return jsonify({
             'success': False,
-            'error': f'Terminal on port {port} not found'
-        }), 404
-    
-    tmux_session = app.terminals[port]['tmux_session']
-    
-    # Send the keys to the tmux session
-    if send_keys_to_tmux(tmux_session, keys):
-        return jsonify({'success': True})
-    else:
+            'error': str(e)
+        }), 429
+        
+    if seq is None:
         return jsonify({
             'success': False,
-            'error': f'Failed to send keys to terminal on port {port}'
-        }), 500
+            'error': f"Terminal {data['port']} not found"
+        }), 404
+    
+    return jsonify({
+        'success': True,
+        'terminal_id': terminal_id,
+        'seq': seq
+    }), 202
 
-@app.route('/api/terminals/<int:port>', methods=['DELETE'])
-def delete_terminal(port):
+@app.route('/api/terminals/<terminal_id>', methods=['DELETE'])
+def delete_terminal(terminal_id):
     """Terminate a terminal session."""
     try:
         # Check if the terminal exists
-        if port not in app.terminals:
+        key = resolve_terminal_id(terminal_id)
+        if not key:
             return jsonify({
                 'success': False,
                 'error': 'Terminal not found'
             }), 404
             
         # Kill the terminal
-        if kill_terminal(port):
-            with app.process_lock:
-                if port in app.terminals:
-                    del app.terminals[port]
-                    
-            logger.info(f"Deleted terminal on port {port}")
+        if kill_terminal(key):
+            logger.info(f"Deleted terminal {key}")
             return jsonify({
                 'success': True
             })
         else:
             return jsonify({
                 'success': False,
-                'error': f'Failed to delete terminal on port {port}'
+                'error': f'Failed to delete terminal {key}'
             }), 500
     except Exception as e:
-        logger.error(f"Error deleting terminal on port {port}: {e}")
+        logger.error(f"Error deleting terminal {terminal_id}: {e}")
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
 
-@app.route('/api/terminals/delete/<int:port>', methods=['POST'])
-def delete_terminal_post(port):
+@app.route('/api/terminals/delete/<terminal_id>', methods=['POST'])
+def delete_terminal_post(terminal_id):
     """Terminate a terminal session (POST endpoint)."""
-    return delete_terminal(port)
+    return delete_terminal(terminal_id)
 
-@app.route('/api/terminals/rename/<int:port>', methods=['POST'])
-def rename_terminal(port):
+@app.route('/api/terminals/rename/<terminal_id>', methods=['POST'])
+def rename_terminal(terminal_id):
     """Rename a terminal session."""
     try:
         # Check if the terminal exists
-        if port not in app.terminals:
+        key = resolve_terminal_id(terminal_id)
+        if not key:
             return jsonify({
                 'success': False,
                 'error': 'Terminal not found'
@@ -534,13 +1504,13 @@ def rename_terminal(port):
         
         # Get the new name from the request
         data = request.get_json()
-        new_name = data.get('name', f'Terminal {port}')
+        new_name = data.get('name', f'Terminal {key}')
         
         # Update the terminal name
-        with app.process_lock:
-            app.terminals[port]['name'] = new_name
+        app.terminals.update(key, name=new_name)
+        persist_terminal_registry()
             
-        logger.info(f"Renamed terminal on port {port} to '{new_name}'")
+        logger.info(f"Renamed terminal {key} to '{new_name}'")
         return jsonify({
             'success': True
         })
@@ -634,41 +1604,20 @@ def handle_tab_notes(terminal_id):
 # Playbook search and load endpoints
 @app.route('/api/playbooks/search', methods=['GET'])
 def search_playbooks():
-    """Search for lines in playbooks containing the query."""
+    """Search for lines in playbooks matching the query, using the full-text index."""
     query = request.args.get('query', '')
-    if not query:
+    if not query.strip():
         return jsonify({
             'success': False,
             'error': 'Missing query parameter'
         }), 400
     
-    # Search in all .md files in the playbooks directory
-    results = []
     try:
-        # Create the playbooks directory if it doesn't exist
-        os.makedirs(PLAYBOOKS_DIR, exist_ok=True)
-        
-        # Get all .md files in the playbooks directory
-        md_files = glob.glob(os.path.join(PLAYBOOKS_DIR, '**/*.md'), recursive=True)
-        
-        for file_path in md_files:
-            filename = os.path.basename(file_path)
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    for i, line in enumerate(f, 1):
-                        if query.lower() in line.lower():
-                            results.append({
-                                'filename': filename,
-                                'line_number': i,
-                                'line': line.strip()
-                            })
-            except Exception as e:
-                logger.error(f"Error reading file {file_path}: {e}")
-                continue
-                
+        found = playbook_index.search(query, request.args.get('limit', DEFAULT_SEARCH_LIMIT, type=int))
         return jsonify({
             'success': True,
-            'results': results
+            'results': found['results'],
+            'truncated': found['truncated']
         })
     except Exception as e:
         logger.error(f"Error searching playbooks: {e}")
@@ -702,12 +1651,15 @@ def save_playbook():
         # Write the file
         with open(file_path, 'w', encoding='utf-8') as f:
             f.write(data['content'])
+        load_playbook_file(file_path)
             
         # Also update the shared playbook state for synchronized access
         with playbook_lock:
             playbooks[sanitized_filename] = {
                 'filename': sanitized_filename,
                 'content': data['content'],
+                'size': len(data['content'].encode('utf-8')),
+                'hash': content_hash(data['content']),
                 'last_modified': time.time(),
                 'editor': data.get('editor', 'unknown')
             }
@@ -726,66 +1678,32 @@ def save_playbook():
 @app.route('/api/playbooks/load/<path:filename>', methods=['GET'])
 def load_playbook(filename):
     """Load a specific playbook file."""
-    # Sanitize the filename to prevent directory traversal
-    sanitized_filename = os.path.basename(filename)
-    if sanitized_filename != filename:
-        # Check if it might be in a subdirectory
-        parts = filename.split('/')
-        if len(parts) > 1 and all(p and not p.startswith('..') for p in parts):
-            # It could be a valid subdirectory path, attempt to load
-            file_path = os.path.join(PLAYBOOKS_DIR, *parts)
-        else:
-            return jsonify({
-                'success': False,
-                'error': 'Invalid filename'
-            }), 400
-    else:
-        # Try to find in root playbooks directory first
-        file_path = os.path.join(PLAYBOOKS_DIR, sanitized_filename)
-        
-        # If not found in root, check if it exists in subdirectories
-        if not os.path.exists(file_path) or not os.path.isfile(file_path):
-            # Search in subdirectories
-            for subdir, _, files in os.walk(PLAYBOOKS_DIR):
-                if sanitized_filename in files:
-                    file_path = os.path.join(subdir, sanitized_filename)
-                    break
-    
-    # Check if the file exists
-    if not os.path.exists(file_path) or not os.path.isfile(file_path):
-        # If still not found, check specifically in tutorials directory as fallback
-        tutorials_path = os.path.join(PLAYBOOKS_DIR, 'tutorials', sanitized_filename)
-        if os.path.exists(tutorials_path) and os.path.isfile(tutorials_path):
-            file_path = tutorials_path
-        else:
+    # Served from the in-memory playbooks, which the playbook watcher keeps current
+    try:
+        playbook = find_playbook(filename)
+        if playbook is None:
             return jsonify({
                 'success': False,
                 'error': f'File not found: {filename}'
             }), 404
-    
-    # Check if the file has .md extension
-    if not file_path.endswith('.md'):
-        return jsonify({
-            'success': False,
-            'error': 'Only .md files are supported'
-        }), 400
-    
-    # Read the file content
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
         
-        # Use the relative path from PLAYBOOKS_DIR for the returned filename
-        relative_path = os.path.relpath(file_path, PLAYBOOKS_DIR)
+        # The body depends only on the playbook's path and content; the path is
+        # quoted so it cannot end the ETag's quotes
+        etag = f"{playbook['hash']}-{quote(playbook['id'], safe='')}"
+        if request.if_none_match.contains(etag):
+            return '', 304, {'ETag': f'"{etag}"'}
         
-        return jsonify({
+        response = jsonify({
             'success': True,
-            'filename': sanitized_filename,
-            'path': relative_path,
-            'content': content
+            'filename': os.path.basename(playbook['id']),
+            'path': playbook['id'],
+            'content': playbook['content']
         })
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
     except Exception as e:
-        logger.error(f"Error loading playbook {file_path}: {e}")
+        logger.error(f"Error loading playbook {filename}: {e}")
         return jsonify({
             'success': False,
             'error': str(e)
@@ -793,13 +1711,29 @@ def load_playbook(filename):
 
 @app.route('/api/playbooks/list/all', methods=['GET'])
 def list_all_playbooks():
-    """Get a list of all shared playbooks."""
+    """
+    Get one page of summaries of the shared playbooks, without their content.
+
+    Takes the same sort, order, prefix, limit and cursor parameters as
+    /api/playbooks/list. Content is fetched from /api/playbooks/state/<filename>.
+    """
     try:
+        order = request.args.get('order', 'asc')
+        if order not in ('asc', 'desc'):
+            return jsonify({'success': False, 'error': 'order must be asc or desc'}), 400
+        
         with playbook_lock:
-            return jsonify({
-                'success': True,
-                'playbooks': playbooks
-            })
+            page = paginate_playbooks(
+                playbooks,
+                sort=request.args.get('sort', 'id'),
+                descending=order == 'desc',
+                cursor=request.args.get('cursor'),
+                limit=request.args.get('limit', LIST_PAGE_SIZE, type=int),
+                prefix=request.args.get('prefix', '')
+            )
+        return jsonify({'success': True, **page})
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Error listing all playbooks: {e}")
         return jsonify({
@@ -828,6 +1762,8 @@ def sync_playbook(filename):
             playbooks[sanitized_filename] = {
                 'filename': sanitized_filename,
                 'content': data['content'],
+                'size': len(data['content'].encode('utf-8')),
+                'hash': content_hash(data['content']),
                 'last_modified': time.time(),
                 'editor': data.get('editor', 'unknown'),
                 'terminal_id': terminal_id  # Store the terminal ID
@@ -980,6 +1916,27 @@ def list_all_variables():
 # Make terminal management functions available to Flask app
 app.start_ttyd_process = start_ttyd_process
 app.kill_terminal = kill_terminal
+app.create_terminal = create_terminal
+app.create_terminals = create_terminals
+app.describe_terminal = describe_terminal
+app.resolve_terminal_id = resolve_terminal_id
+app.terminal_pool = terminal_pool
+app.port_allocator = port_allocator
+app.ttyd_proxy = ttyd_proxy
+app.start_terminal_ttyd = start_terminal_ttyd
+app.idle_reaper = idle_reaper
+app.resource_monitor = resource_monitor
+app.command_queue = command_queue
+app.queue_terminal_input = queue_terminal_input
+app.queue_terminal_batch = queue_terminal_batch
+app.output_capture = output_capture
+app.snapshot_cache = snapshot_cache
+app.search_terminal_output = search_terminal_output
+app.output_triggers = output_triggers
+app.tmux_themes = tmux_themes
+app.playbook_watcher = playbook_watcher
+app.persist_terminal_registry = persist_terminal_registry
+app.process_supervisor = process_supervisor
 
 # Main entry point
 if __name__ == '__main__':
@@ -996,38 +1953,130 @@ if __name__ == '__main__':
         # Set the hostname in Flask app config for template access
         app.config['HOSTNAME'] = HOSTNAME
         
-        # Check if default terminal port is available, try alternative if needed
-        initial_port = DEFAULT_TERMINAL_PORT
-        if not is_port_available(initial_port):
-            logger.warning(f"Default terminal port {initial_port} is already in use, finding an alternative")
-            initial_port = find_available_port(TERMINAL_PORT_RANGE[0], TERMINAL_PORT_RANGE[1])
-            if not initial_port:
-                logger.error("Could not find an available port for the initial terminal")
-                sys.exit(1)
-            logger.info(f"Using alternative port {initial_port} for initial terminal")
+        # The control client starts the tmux server, so it carries the config file
+        tmux_themes.load()
+        app.config['USE_TMUX_CONFIG'] = args.use_default_tmux_config
+        if args.use_default_tmux_config and os.path.exists(TMUX_CONFIG_PATH):
+            tmux_client.config_path = TMUX_CONFIG_PATH
+            try:
+                # Once per tmux server, for a server that was already running
+                tmux_themes.load_server()
+            except TmuxError as e:
+                logger.warning(f"Failed to load tmux config into the tmux server: {e}")
         
-        # Create initial terminal
+        app.config['TTYD_MODE'] = args.ttyd_mode
+        app.config['LAZY_TTYD'] = args.lazy_ttyd and args.ttyd_mode != TTYD_MODE_SHARED
+        if args.output_triggers and args.output_buffer_size <= 0:
+            # Triggers read the output capture pipes
+            args.output_buffer_size = DEFAULT_BUFFER_SIZE
+        if args.ttyd_mode == TTYD_MODE_UNIX or args.output_buffer_size > 0:
+            # Private directory for the ttyd sockets and output pipes; only this server uses them
+            if args.runtime_dir:
+                os.makedirs(args.runtime_dir, mode=0o700, exist_ok=True)
+                app.config['RUNTIME_DIR'] = args.runtime_dir
+            else:
+                app.config['RUNTIME_DIR'] = tempfile.mkdtemp(prefix='commandwave-')
+                app.config['RUNTIME_DIR_CREATED'] = True
+            logger.info(f"Using runtime directory {app.config['RUNTIME_DIR']}")
+            
+        if args.output_buffer_size > 0:
+            output_capture.capacity = args.output_buffer_size
+            output_capture.directory = app.config['RUNTIME_DIR']
+            output_capture.use_mmap = args.output_buffer_mmap
+            logger.info(f"Capturing terminal output into {args.output_buffer_size}-byte buffers")
+            
+        if args.output_triggers:
+            output_triggers.load()
+            app.config['OUTPUT_TRIGGERS'] = True
+            logger.info(f"Watching terminal output for {len(output_triggers.list_triggers())} triggers")
+        
+        # Rebuild terminals whose tmux sessions survived the previous run
+        app.config['KEEP_SESSIONS'] = args.keep_sessions
         main_tmux_session = "commandwave-main"
-        main_terminal_process = start_ttyd_process(
-            initial_port, 
-            main_tmux_session,
-            args.use_default_tmux_config
-        )
+        adopt_existing_sessions()
         
-        if main_terminal_process:
-            logger.info(f"Started main terminal on port {initial_port}")
+        if main_tmux_session in app.terminals and args.ttyd_mode != TTYD_MODE_SHARED:
+            # The main terminal was adopted; start its ttyd now if that was deferred
+            main_terminal_process = (app.terminals[main_tmux_session]['process']
+                                     or start_terminal_ttyd(main_tmux_session)[0])
+        else:
+            # Check if default terminal port is available, try alternative if needed
+            initial_port = DEFAULT_TERMINAL_PORT
+            if args.ttyd_mode == TTYD_MODE_UNIX:
+                # No terminal listens on a TCP port
+                pass
+            elif not is_port_available(initial_port):
+                logger.warning(f"Default terminal port {initial_port} is already in use, finding an alternative")
+                initial_port = port_allocator.reserve()
+                if not initial_port:
+                    logger.error("Could not find an available port for the initial terminal")
+                    sys.exit(1)
+                logger.info(f"Using alternative port {initial_port} for initial terminal")
+            
+            # Create initial terminal
+            main_terminal_port = initial_port
+            main_socket_path = None
+            if args.ttyd_mode == TTYD_MODE_UNIX:
+                main_socket_path = terminal_socket_path(main_tmux_session)
+                main_terminal_process = start_ttyd_process(
+                    None,
+                    main_tmux_session,
+                    socket_path=main_socket_path
+                )
+                main_terminal_port = None
+            elif args.ttyd_mode == TTYD_MODE_SHARED:
+                # One ttyd serves every terminal; the main terminal is just a session
+                main_terminal_process = start_shared_ttyd_process(initial_port)
+                if main_terminal_process:
+                    app.shared_ttyd = {'port': initial_port, 'process': main_terminal_process}
+                    try:
+                        ensure_tmux_session(main_tmux_session)
+                    except TmuxError as e:
+                        logger.error(f"Failed to create main tmux session: {e}")
+                        main_terminal_process = None
+                main_terminal_port = None
+            else:
+                main_terminal_process = start_ttyd_process(initial_port, main_tmux_session)
             
-            # Store information about this terminal
-            with app.process_lock:
-                app.terminals[initial_port] = {
-                    'process': main_terminal_process,
+            if main_terminal_process:
+                logger.info(f"Started main terminal on {main_socket_path or f'port {initial_port}'}")
+                
+                # Store information about this terminal, unless it was adopted
+                app.terminals.setdefault(main_tmux_session, {
+                    'port': main_terminal_port,
+                    'process': main_terminal_process if (main_terminal_port or main_socket_path) else None,
                     'tmux_session': main_tmux_session,
+                    'socket_path': main_socket_path,
                     'created_at': time.time(),
-                    'name': 'Main Terminal'
-                }
+                    'name': 'Main Terminal',
+                    'startup_seconds': getattr(main_terminal_process, 'startup_seconds', None),
+                    'ttyd_started_at': time.time() if (main_terminal_port or main_socket_path) else None
+                })
+                persist_terminal_registry()
+        
+        if main_terminal_process:
+            output_capture.start(main_tmux_session, main_tmux_session)
+            
+            # Set the default terminal id and location for the template
+            main_port, main_path = terminal_location(app.terminals[main_tmux_session])
+            app.config['DEFAULT_TERMINAL_ID'] = main_tmux_session
+            app.config['DEFAULT_TERMINAL_PORT'] = main_port
+            app.config['DEFAULT_TERMINAL_PATH'] = main_path
+            
+            # Start pre-warming terminals for new tabs
+            terminal_pool.resize(args.terminal_pool_size)
+            terminal_pool.start()
+            
+            # Stop ttyd for terminals nobody is looking at (shared mode has no per-terminal ttyd)
+            if args.ttyd_idle_timeout > 0 and args.ttyd_mode != TTYD_MODE_SHARED:
+                idle_reaper.idle_timeout = args.ttyd_idle_timeout
+                idle_reaper.start()
+                
+            if args.resource_interval > 0:
+                resource_monitor.interval = args.resource_interval
+                resource_monitor.start()
             
-            # Set the default terminal port for the template
-            app.config['DEFAULT_TERMINAL_PORT'] = initial_port
+            playbook_watcher.start(args.playbook_watch)
             
             # Start Flask app with SocketIO
             host = '0.0.0.0' if args.remote else '127.0.0.1'
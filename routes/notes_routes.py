@@ -7,8 +7,8 @@ import logging
 from flask import Blueprint, request, jsonify
 
 from core.notes_storage import (
-    load_global_notes, save_global_notes,
-    load_terminal_notes, save_terminal_notes,
+    load_global_notes_versioned, save_global_notes,
+    load_terminal_notes_versioned, save_terminal_notes,
     list_all_notes, rename_terminal_notes
 )
 
@@ -20,13 +20,25 @@ notes_routes = Blueprint('notes_routes', __name__, url_prefix='/api/notes')
 
 @notes_routes.route('/global', methods=['GET'])
 def get_global_notes():
-    """API endpoint to get global notes."""
+    """
+    API endpoint to get global notes.
+
+    The ETag is the hash of the notes, so a poll with If-None-Match gets 304
+    while they are unchanged.
+    """
     try:
-        content = load_global_notes()
-        return jsonify({
+        content, etag = load_global_notes_versioned()
+        if etag and request.if_none_match.contains(etag):
+            return '', 304, {'ETag': f'"{etag}"'}
+            
+        response = jsonify({
             'success': True,
             'content': content
         })
+        if etag:
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'no-cache'
+        return response
     except Exception as e:
         logger.error(f"Error retrieving global notes: {e}")
         return jsonify({
@@ -60,14 +72,21 @@ def save_global_notes_endpoint():
 
 @notes_routes.route('/terminal/<terminal_id>', methods=['GET'])
 def get_terminal_notes(terminal_id):
-    """API endpoint to get terminal-specific notes."""
+    """API endpoint to get terminal-specific notes, with an ETag like the global notes."""
     try:
-        content = load_terminal_notes(terminal_id)
-        return jsonify({
+        content, etag = load_terminal_notes_versioned(terminal_id)
+        if etag and request.if_none_match.contains(etag):
+            return '', 304, {'ETag': f'"{etag}"'}
+            
+        response = jsonify({
             'success': True,
             'terminal_id': terminal_id,
             'content': content
         })
+        if etag:
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'no-cache'
+        return response
     except Exception as e:
         logger.error(f"Error retrieving notes for terminal {terminal_id}: {e}")
         return jsonify({
@@ -3,13 +3,15 @@ routes/playbook_routes.py
 Flask Blueprint for playbook-related API endpoints.
 """
 
-from flask import Blueprint, request, jsonify, send_from_directory
+from flask import Blueprint, current_app, request, jsonify, send_from_directory, url_for
 import os
 import time
 import json
 import uuid
 from werkzeug.utils import secure_filename
-from core.playbook_utils import process_playbook, validate_playbook, get_playbook_path
+from core.playbook_utils import (process_playbook, validate_playbook, get_playbook_path, content_hash,
+                                 paginate_playbooks, LIST_PAGE_SIZE)
+from core.playbook_index import playbook_index, DEFAULT_LIMIT
 
 # Create the playbook routes Blueprint
 playbook_routes = Blueprint('playbook_routes', __name__, url_prefix='/api/playbooks')
@@ -21,12 +23,55 @@ os.makedirs(PLAYBOOKS_DIR, exist_ok=True)
 # Store information about shared playbooks
 playbooks = {}
 
+# Cache lifetime of playbook content at its content-addressed URL, which never changes
+CONTENT_MAX_AGE = 365 * 24 * 3600
+
+def load_playbook_file(file_path):
+    """
+    Read a playbook file into the in-memory playbooks and the search index.
+
+    A playbook whose content did not change is left as is.
+    """
+    with open(file_path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    
+    # Determine the relative path of the playbook within PLAYBOOKS_DIR
+    relative_path = os.path.relpath(file_path, PLAYBOOKS_DIR)
+    
+    # Use relative path as stable ID
+    playbook_id = relative_path
+    existing = playbooks.get(playbook_id)
+    if existing is not None and existing['content'] == content:
+        return existing
+    
+    # Process the playbook
+    digest = content_hash(content)
+    playbook_data = process_playbook(content, relative_path, digest)
+    
+    playbook = {
+        'id': playbook_id,
+        'filename': relative_path,
+        'path': file_path,
+        'title': playbook_data.get('title', relative_path),
+        'description': playbook_data.get('description', ''),
+        'content': content,
+        'size': len(content.encode('utf-8')),
+        'hash': digest,
+        'created_at': existing['created_at'] if existing else os.path.getctime(file_path),
+        'updated_at': os.path.getmtime(file_path)
+    }
+    # Replaced whole, so readers never see a half-updated entry
+    playbooks[playbook_id] = playbook
+    playbook_index.add(playbook_id, relative_path, content)
+    return playbook
+
 # Load existing playbooks from the playbooks directory
 def load_playbooks_from_disk():
     """Load existing playbooks from the playbooks directory."""
     try:
-        # Clear the current playbooks dictionary
+        # Clear the current playbooks dictionary and search index
         playbooks.clear()
+        playbook_index.clear()
         
         # Scan the playbooks directory recursively
         for dirpath, dirnames, filenames in os.walk(PLAYBOOKS_DIR):
@@ -34,29 +79,8 @@ def load_playbooks_from_disk():
                 if filename.lower().endswith('.md'):
                     file_path = os.path.join(dirpath, filename)
                     try:
-                        # Read the file content
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            content = f.read()
-                        
-                        # Determine the relative path of the playbook within PLAYBOOKS_DIR
-                        relative_path = os.path.relpath(file_path, PLAYBOOKS_DIR)
-                        
-                        # Process the playbook
-                        playbook_data = process_playbook(content, relative_path)
-                        
-                        # Add to in-memory playbooks: use relative path as stable ID
-                        playbook_id = relative_path
-                        playbooks[playbook_id] = {
-                            'id': playbook_id,
-                            'filename': relative_path,
-                            'path': file_path,
-                            'title': playbook_data.get('title', relative_path),
-                            'description': playbook_data.get('description', ''),
-                            'content': content,
-                            'created_at': os.path.getctime(file_path),
-                            'updated_at': os.path.getmtime(file_path)
-                        }
-                        print(f"Loaded playbook: {playbook_id}")
+                        load_playbook_file(file_path)
+                        print(f"Loaded playbook: {os.path.relpath(file_path, PLAYBOOKS_DIR)}")
                     except Exception as e:
                         print(f"Error loading playbook {file_path}: {str(e)}")
         
@@ -64,6 +88,44 @@ def load_playbooks_from_disk():
     except Exception as e:
         print(f"Error loading playbooks from disk: {str(e)}")
 
+def apply_playbook_changes(updated, removed):
+    """Apply playbook files changed on disk, as reported by the playbook watcher."""
+    for file_path in removed:
+        playbook_id = os.path.relpath(file_path, PLAYBOOKS_DIR)
+        if playbooks.pop(playbook_id, None) is not None:
+            playbook_index.remove(playbook_id)
+            print(f"Removed playbook: {playbook_id}")
+    for file_path in updated:
+        try:
+            load_playbook_file(file_path)
+            print(f"Reloaded playbook: {os.path.relpath(file_path, PLAYBOOKS_DIR)}")
+        except Exception as e:
+            print(f"Error loading playbook {file_path}: {str(e)}")
+
+def find_playbook(filename):
+    """
+    Find a playbook by its path within the playbooks directory, or by its file name alone.
+
+    Playbooks are served from memory. A file the watcher has not reported yet
+    (or any file, when watching is off) is read into memory on first request.
+    """
+    playbook_id = os.path.normpath(filename)
+    playbook = playbooks.get(playbook_id)
+    if playbook is not None:
+        return playbook
+    
+    file_path = os.path.abspath(os.path.join(PLAYBOOKS_DIR, playbook_id))
+    if (file_path.startswith(os.path.abspath(PLAYBOOKS_DIR) + os.sep) and
+            file_path.lower().endswith('.md') and os.path.isfile(file_path)):
+        return load_playbook_file(file_path)
+    
+    if '/' in filename:
+        return None
+    # A bare file name may refer to a playbook in a subdirectory
+    matches = sorted(playbook_id for playbook_id in list(playbooks)
+                     if os.path.basename(playbook_id) == filename)
+    return playbooks[matches[0]] if matches else None
+
 # Load playbooks when the module is imported
 load_playbooks_from_disk()
 
@@ -90,7 +152,8 @@ def import_playbook():
             return jsonify({'success': False, 'error': error}), 400
             
         # Process the playbook
-        playbook_data = process_playbook(content, filename)
+        digest = content_hash(content)
+        playbook_data = process_playbook(content, filename, digest)
         
         # Save the playbook to disk
         file_path = os.path.join(PLAYBOOKS_DIR, filename)
@@ -106,9 +169,12 @@ def import_playbook():
             'title': playbook_data.get('title', filename),
             'description': playbook_data.get('description', ''),
             'content': content,
+            'size': len(content.encode('utf-8')),
+            'hash': digest,
             'created_at': time.time(),
             'updated_at': time.time()
         }
+        playbook_index.add(playbook_id, filename, content)
         
         # Return success response with playbook data
         return jsonify({
@@ -122,24 +188,83 @@ def import_playbook():
 
 @playbook_routes.route('/list', methods=['GET'])
 def list_playbooks():
-    """Get a list of all available playbooks."""
+    """
+    Get one page of playbook summaries, without their content.
+
+    Query parameters: sort (id, title, updated_at or size), order (asc or
+    desc), prefix to filter ids by, limit, and cursor, the next_cursor of the
+    previous page. Content is fetched per playbook from /api/playbooks/<id>, or
+    from the summary's content_url, which can be cached indefinitely.
+    """
     try:
-        return jsonify({
-            'success': True,
-            'playbooks': list(playbooks.values())
-        })
+        order = request.args.get('order', 'asc')
+        if order not in ('asc', 'desc'):
+            return jsonify({'success': False, 'error': 'order must be asc or desc'}), 400
+        
+        page = paginate_playbooks(
+            playbooks,
+            sort=request.args.get('sort', 'id'),
+            descending=order == 'desc',
+            cursor=request.args.get('cursor'),
+            limit=request.args.get('limit', LIST_PAGE_SIZE, type=int),
+            prefix=request.args.get('prefix', '')
+        )
+        for summary in page['playbooks']:
+            summary['content_url'] = playbook_content_url(summary)
+        return jsonify({'success': True, **page})
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
         
+def playbook_content_url(playbook):
+    """Get the URL of a playbook's current content, which changes whenever the content does."""
+    return url_for('playbook_routes.get_playbook_content',
+                   content_hash=playbook['hash'], playbook_id=playbook['id'])
+
+@playbook_routes.route('/content/<content_hash>/<path:playbook_id>', methods=['GET'])
+def get_playbook_content(content_hash, playbook_id):
+    """
+    Get a playbook's content as Markdown, at a URL naming its hash.
+
+    The response at a given URL never changes, so it may be cached for good;
+    once the playbook changes, the old URL returns 404.
+    """
+    playbook = playbooks.get(playbook_id)
+    if playbook is None or playbook.get('hash') != content_hash:
+        return jsonify({'success': False, 'error': 'Playbook version not found'}), 404
+        
+    if request.if_none_match.contains(content_hash):
+        return '', 304, {'ETag': f'"{content_hash}"'}
+        
+    response = current_app.response_class(playbook['content'], mimetype='text/markdown')
+    response.set_etag(content_hash)
+    response.headers['Cache-Control'] = f'public, max-age={CONTENT_MAX_AGE}, immutable'
+    return response
+
 @playbook_routes.route('/<path:playbook_id>', methods=['GET'])
 def get_playbook(playbook_id):
-    """Get a specific playbook by ID."""
+    """
+    Get a specific playbook by ID.
+
+    The ETag is the content hash and modification time recorded when the
+    playbook was last written, so a repeat load with If-None-Match gets 304.
+    """
     try:
         if playbook_id in playbooks:
-            return jsonify({
+            playbook = playbooks[playbook_id]
+            etag = f"{playbook['hash']}-{playbook['updated_at']:.6f}"
+            if request.if_none_match.contains(etag):
+                return '', 304, {'ETag': f'"{etag}"'}
+                
+            response = jsonify({
                 'success': True,
-                'playbook': playbooks[playbook_id]
+                'playbook': playbook,
+                'content_url': playbook_content_url(playbook)
             })
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
         else:
             return jsonify({'success': False, 'error': 'Playbook not found'}), 404
     except Exception as e:
@@ -158,8 +283,9 @@ def delete_playbook(playbook_id):
             if os.path.exists(file_path):
                 os.remove(file_path)
             
-            # Remove from in-memory storage
+            # Remove from in-memory storage and the search index
             del playbooks[playbook_id]
+            playbook_index.remove(playbook_id)
             
             return jsonify({
                 'success': True,
@@ -191,18 +317,27 @@ def update_playbook(playbook_id):
             
         # Process the playbook to extract title, description, etc.
         playbook = playbooks[playbook_id]
-        playbook_data = process_playbook(updated_content, playbook['filename'])
+        digest = content_hash(updated_content)
+        playbook_data = process_playbook(updated_content, playbook['filename'], digest)
         
-        # Update the in-memory playbook
-        playbook['content'] = updated_content
-        playbook['title'] = playbook_data.get('title', playbook['filename'])
-        playbook['description'] = playbook_data.get('description', '')
-        playbook['updated_at'] = time.time()
+        # Update the in-memory playbook, replaced whole so readers never see a
+        # half-updated entry
+        playbook = {
+            **playbook,
+            'content': updated_content,
+            'size': len(updated_content.encode('utf-8')),
+            'hash': digest,
+            'title': playbook_data.get('title', playbook['filename']),
+            'description': playbook_data.get('description', ''),
+            'updated_at': time.time()
+        }
+        playbooks[playbook_id] = playbook
         
         # Update the file on disk
         file_path = playbook['path']
         with open(file_path, 'w', encoding='utf-8') as f:
             f.write(updated_content)
+        playbook_index.add(playbook_id, playbook['filename'], updated_content)
             
         return jsonify({
             'success': True,
@@ -215,30 +350,26 @@ def update_playbook(playbook_id):
 
 @playbook_routes.route('/search', methods=['GET'])
 def search_playbooks():
-    """Search for playbooks by query."""
+    """
+    Search the lines of all playbooks through the full-text index.
+
+    Words match by prefix and must appear in order on one line; a query in
+    double quotes is an exact phrase. Each result carries the offsets of its
+    matches in the line for highlighting.
+    """
     try:
-        query = request.args.get('query', '').lower()
-        if not query:
+        query = request.args.get('query', '')
+        if not query.strip():
             return jsonify({'success': False, 'error': 'Missing search query'}), 400
+        limit = request.args.get('limit', DEFAULT_LIMIT, type=int)
+        if limit <= 0:
+            return jsonify({'success': False, 'error': 'limit must be positive'}), 400
             
-        results = []
-        for playbook in playbooks.values():
-            content = playbook['content'].lower()
-            if query in content:
-                # Find matching lines
-                lines = content.split('\n')
-                for i, line in enumerate(lines):
-                    if query in line.lower():
-                        results.append({
-                            'filename': playbook['filename'],
-                            'id': playbook['id'],
-                            'line_number': i + 1,
-                            'line': lines[i]
-                        })
-        
+        found = playbook_index.search(query, limit)
         return jsonify({
             'success': True,
-            'results': results
+            'results': found['results'],
+            'truncated': found['truncated']
         })
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -274,7 +405,8 @@ def create_playbook():
             return jsonify({'success': False, 'error': error}), 400
 
         # Process and save the playbook
-        playbook_data = process_playbook(content, filename)
+        digest = content_hash(content)
+        playbook_data = process_playbook(content, filename, digest)
         with open(file_path, 'w', encoding='utf-8') as f:
             f.write(content)
 
@@ -286,9 +418,12 @@ def create_playbook():
             'title': playbook_data.get('title', playbook_id),
             'description': playbook_data.get('description', ''),
             'content': content,
+            'size': len(content.encode('utf-8')),
+            'hash': digest,
             'created_at': time.time(),
             'updated_at': time.time()
         }
+        playbook_index.add(playbook_id, playbook_id, content)
 
         return jsonify({'success': True, 'playbook': playbooks[playbook_id]})
     except Exception as e:
@@ -0,0 +1,74 @@
+"""
+routes/proxy_routes.py
+Flask Blueprint proxying terminal traffic to ttyd backends on Unix sockets.
+"""
+
+import logging
+from flask import Blueprint, Response, request, jsonify, current_app
+
+from core.ttyd_proxy import ttyd_proxy, PROXY_PREFIX
+
+# Configure logging
+logger = logging.getLogger('commandwave')
+
+# Create blueprint
+proxy_routes = Blueprint('proxy_routes', __name__, url_prefix=PROXY_PREFIX)
+
+class _DetachedResponse(Response):
+    """
+    Response for a connection the WebSocket relay has taken over.
+
+    The relay already wrote everything the client will see, so the server must
+    not write a response of its own; raising ConnectionError makes Werkzeug drop
+    the connection quietly.
+    """
+
+    def __call__(self, environ, start_response):
+        raise ConnectionError()
+
+def _backend_socket(session):
+    """Get the Unix socket of the ttyd serving a terminal, or None."""
+    app = current_app
+    if not hasattr(app, 'terminals'):
+        return None
+    terminal = app.terminals.get(session)
+    socket_path = terminal.get('socket_path') if terminal else None
+        
+    # Start ttyd on first view, or again after it was stopped while idle
+    if socket_path and hasattr(app, 'start_terminal_ttyd'):
+        running, _ = app.start_terminal_ttyd(session)
+        if not running:
+            return None
+    return socket_path
+
+@proxy_routes.route('/<session>', defaults={'subpath': ''}, methods=['GET', 'POST'])
+@proxy_routes.route('/<session>/', defaults={'subpath': ''}, methods=['GET', 'POST'])
+@proxy_routes.route('/<session>/<path:subpath>', methods=['GET', 'POST'])
+def proxy_terminal(session, subpath):
+    """Forward a request for a terminal to its ttyd backend."""
+    socket_path = _backend_socket(session)
+    if not socket_path:
+        return jsonify({'success': False, 'error': 'Terminal not found'}), 404
+
+    # ttyd runs with the same base path, so the request target is passed through as is
+    target = request.environ.get('RAW_URI') or request.full_path.rstrip('?')
+
+    try:
+        if request.headers.get('Upgrade', '').lower() == 'websocket':
+            if 'werkzeug.socket' not in request.environ:
+                return jsonify({
+                    'success': False,
+                    'error': 'WebSocket proxying requires the built-in server'
+                }), 501
+            ttyd_proxy.relay_websocket(socket_path, request.environ, target)
+            return _DetachedResponse()
+
+        body = request.get_data() if request.method == 'POST' else None
+        headers = [(k, v) for k, v in request.headers.items()]
+        status, response_headers, body_iter = ttyd_proxy.forward(
+            socket_path, request.method, target, headers, body
+        )
+        return Response(body_iter, status=status, headers=response_headers)
+    except Exception as e:
+        logger.error(f"Error proxying to terminal {session}: {e}")
+        return jsonify({'success': False, 'error': 'Terminal backend unavailable'}), 502
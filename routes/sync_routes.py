@@ -7,13 +7,14 @@ import logging
 import json
 import time
 from typing import Dict, Any, Optional
-from flask import Blueprint, request, session
+from flask import Blueprint, request, session, current_app
 from flask_socketio import emit, join_room, leave_room, disconnect
 
 from core.sync_utils import client_tracker, broadcast_to_terminal, broadcast_global
 from routes.variable_routes import get_tab_variables, save_tab_variables
 from core.notes_storage import save_global_notes, save_terminal_notes
 from core.playbook_utils import save_playbook  # Save playbook content to disk
+from core.command_queue import QueueFull
 
 # Configure logging
 logger = logging.getLogger('commandwave')
@@ -169,11 +170,23 @@ def init_socketio_events(socketio):
             logger.warning(f"Invalid terminal data in creation notification from {client_id}")
             return
         
+        # Tell other clients where the terminal's ttyd is actually served from
+        ttyd_port, path = None, None
+        app = current_app
+        if hasattr(app, 'resolve_terminal_id'):
+            resolved = app.resolve_terminal_id(terminal_id)
+            terminal = app.terminals.get(resolved) if resolved is not None else None
+            if terminal is not None:
+                terminal = app.describe_terminal(resolved, terminal)
+                ttyd_port, path = terminal['port'], terminal['path']
+        
         # Broadcast to all clients
         broadcast_global('terminal_created', {
             'terminal_id': terminal_id,
             'name': terminal_name,
             'port': port,
+            'ttyd_port': ttyd_port,
+            'path': path,
             'timestamp': time.time()
         })
         
@@ -217,7 +230,39 @@ def init_socketio_events(socketio):
         })
         
         logger.info(f"Terminal closed broadcast: {terminal_id}")
-    
+
+    @socketio.on('send_command')
+    def handle_send_command(data):
+        """
+        Queue a command for a terminal.
+
+        The return value is the event's acknowledgement: the command's sequence
+        number once it is queued, or an error if the terminal is unknown or its
+        queue is full.
+        """
+        client_id = request.sid
+        terminal_key = (data or {}).get('terminal_id')
+        command = (data or {}).get('command')
+
+        if not terminal_key or not command:
+            return {'success': False, 'error': 'Missing required fields: terminal_id, command'}
+
+        app = current_app
+        if not hasattr(app, 'queue_terminal_input'):
+            return {'success': False, 'error': 'Terminal management not available'}
+
+        terminal_id = app.resolve_terminal_id(terminal_key)
+        try:
+            seq = app.queue_terminal_input(terminal_id, command) if terminal_id else None
+        except QueueFull as e:
+            logger.warning(f"Rejected command from {client_id} for terminal {terminal_key}: {e}")
+            return {'success': False, 'error': str(e)}
+
+        if seq is None:
+            return {'success': False, 'error': f'Terminal {terminal_key} not found'}
+
+        return {'success': True, 'terminal_id': terminal_id, 'seq': seq}
+
     @socketio.on('playbook_updated')
     def handle_playbook_updated(data):
         """Handle notification that a playbook was updated."""
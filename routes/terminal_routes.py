@@ -4,11 +4,13 @@ Flask Blueprint for terminal-related API endpoints.
 """
 
 from flask import Blueprint, request, jsonify, current_app
-import subprocess
 import os
+import re
 import logging
 import time
-import socket
+
+from core.terminal_registry import STATE_CLOSING
+from core.command_queue import QueueFull
 
 # Configure logging
 logger = logging.getLogger('commandwave')
@@ -16,68 +18,35 @@ logger = logging.getLogger('commandwave')
 # Create blueprint
 terminal_routes = Blueprint('terminal_routes', __name__, url_prefix='/api/terminals')
 
+# Most terminals created by one bulk request
+MAX_BULK_TERMINALS = 50
+
 @terminal_routes.route('/new', methods=['POST'])
 def create_terminal():
-    """Create a new terminal session and return its port."""
+    """Create a new terminal session and return its id and location."""
     try:
         # Get terminal name from request
         data = request.get_json()
         tab_name = data.get('name', 'Terminal')
         
-        # Access app's terminals dictionary and process_lock
+        # Access app's terminal registry
         app = current_app
         
-        if not hasattr(app, 'terminals') or not hasattr(app, 'process_lock'):
+        if not hasattr(app, 'terminals'):
             logger.error("App missing required terminal management attributes")
             logger.error(f"Available attributes: {dir(app)}")
             return jsonify({'success': False, 'error': 'Terminal management not available'}), 500
             
-        # Find an available port - similar to the main app's find_available_port
-        start_port = 7682
-        end_port = 7781
-        
-        port = None
-        for test_port in range(start_port, end_port + 1):
-            # Check if port is in use
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                in_use = s.connect_ex(('127.0.0.1', test_port)) == 0
-                
-            if not in_use and test_port not in app.terminals:
-                port = test_port
-                break
-                
-        if not port:
-            logger.error("Could not find available port for new terminal")
-            return jsonify({
-                'success': False,
-                'error': 'No available ports'
-            }), 500
-            
-        # Create new tmux session name
-        tmux_session = f"commandwave-{port}"
-            
-        # Call the app's ttyd process starter function
-        if hasattr(app, 'start_ttyd_process'):
-            logger.error(f"Available attributes on app object: {dir(app)}")
-            # Use default tmux config
-            use_tmux_config = True
-            terminal_process = app.start_ttyd_process(port, tmux_session, use_tmux_config)
+        # Call the app's terminal factory, which claims a pre-warmed backend when one is ready
+        if hasattr(app, 'create_terminal'):
+            terminal_id = app.create_terminal(tab_name)
+            terminal = app.terminals.get(terminal_id) if terminal_id else None
             
-            if terminal_process:
-                # Store information about this terminal
-                with app.process_lock:
-                    app.terminals[port] = {
-                        'process': terminal_process,
-                        'tmux_session': tmux_session,
-                        'created_at': time.time(),
-                        'name': tab_name
-                    }
-                    
-                logger.info(f"Created new terminal on port {port} with name '{tab_name}'")
+            if terminal:
+                terminal = app.describe_terminal(terminal_id, terminal)
                 return jsonify({
                     'success': True,
-                    'port': port,
-                    'name': tab_name
+                    **terminal
                 }), 200
             else:
                 return jsonify({
@@ -85,7 +54,7 @@ def create_terminal():
                     'error': 'Failed to create terminal process'
                 }), 500
         else:
-            logger.error("App missing start_ttyd_process function")
+            logger.error("App missing create_terminal function")
             logger.error(f"Available attributes on app object: {dir(app)}")
             return jsonify({'success': False, 'error': 'Terminal creation not supported'}), 500
     except Exception as e:
@@ -95,13 +64,109 @@ def create_terminal():
             'error': str(e)
         }), 500
 
-@terminal_routes.route('/rename/<int:port>', methods=['POST'])
-def rename_terminal(port):
+@terminal_routes.route('/bulk', methods=['POST'])
+def create_terminals_bulk():
+    """Create several named terminals at once, spawning them concurrently."""
+    try:
+        data = request.get_json(silent=True) or {}
+        names = data.get('names') if isinstance(data, dict) else data
+        
+        if not isinstance(names, list) or not names:
+            return jsonify({'success': False, 'error': 'No terminal names specified'}), 400
+            
+        if len(names) > MAX_BULK_TERMINALS:
+            return jsonify({
+                'success': False,
+                'error': f'At most {MAX_BULK_TERMINALS} terminals can be created at once'
+            }), 400
+            
+        app = current_app
+        if not hasattr(app, 'create_terminals'):
+            return jsonify({'success': False, 'error': 'Terminal creation not supported'}), 500
+            
+        names = [str(name) if name else 'Terminal' for name in names]
+        started = time.time()
+        terminal_ids = app.create_terminals(names)
+        
+        results = []
+        for name, terminal_id in zip(names, terminal_ids):
+            terminal = app.terminals.get(terminal_id) if terminal_id else None
+            if terminal:
+                results.append({'success': True, **app.describe_terminal(terminal_id, terminal)})
+            else:
+                results.append({'success': False, 'name': name, 'error': 'Failed to create terminal process'})
+                
+        created = sum(1 for result in results if result['success'])
+        logger.info(f"Bulk created {created} of {len(names)} terminals in {time.time() - started:.2f}s")
+        
+        # 207 when only some terminals could be created
+        status = 200 if created == len(names) else (207 if created else 500)
+        return jsonify({
+            'success': created == len(names),
+            'created': created,
+            'failed': len(names) - created,
+            'terminals': results
+        }), status
+    except Exception as e:
+        logger.error(f"Error creating terminals in bulk: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@terminal_routes.route('/pool', methods=['GET'])
+def get_pool_stats():
+    """Get size, hit/miss counts and refill latency of the warm terminal pool."""
+    app = current_app
+    if not hasattr(app, 'terminal_pool'):
+        return jsonify({'success': False, 'error': 'Terminal pool not available'}), 500
+        
+    return jsonify({
+        'success': True,
+        'pool': app.terminal_pool.stats()
+    })
+
+@terminal_routes.route('/pool', methods=['POST'])
+def resize_pool():
+    """Change the number of warm terminals kept ready."""
+    try:
+        app = current_app
+        if not hasattr(app, 'terminal_pool'):
+            return jsonify({'success': False, 'error': 'Terminal pool not available'}), 500
+            
+        data = request.get_json() or {}
+        if 'size' not in data:
+            return jsonify({'success': False, 'error': 'Missing required field: size'}), 400
+            
+        app.terminal_pool.resize(int(data['size']))
+        return jsonify({
+            'success': True,
+            'pool': app.terminal_pool.stats()
+        })
+    except Exception as e:
+        logger.error(f"Error resizing terminal pool: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@terminal_routes.route('/ports', methods=['GET'])
+def get_port_stats():
+    """Get free, reserved and foreign-held counts of the terminal port range."""
+    app = current_app
+    if not hasattr(app, 'port_allocator'):
+        return jsonify({'success': False, 'error': 'Port allocator not available'}), 500
+        
+    return jsonify({
+        'success': True,
+        'ports': app.port_allocator.stats()
+    })
+
+@terminal_routes.route('/rename/<terminal_id>', methods=['POST'])
+def rename_terminal(terminal_id):
     """Rename a terminal session."""
     try:
-        # Check if the terminal exists
+        # Check if the terminal exists (legacy port numbers are accepted too)
         app = current_app
-        if not hasattr(app, 'terminals') or port not in app.terminals:
+        terminal_id = app.resolve_terminal_id(terminal_id) if hasattr(app, 'resolve_terminal_id') else None
+        if not hasattr(app, 'terminals') or terminal_id is None:
             return jsonify({
                 'success': False,
                 'error': 'Terminal not found'
@@ -109,13 +174,20 @@ def rename_terminal(port):
         
         # Get the new name from the request
         data = request.get_json()
-        new_name = data.get('name', f'Terminal {port}')
+        new_name = data.get('name', f'Terminal {terminal_id}')
         
         # Update the terminal name
-        with app.process_lock:
-            app.terminals[port]['name'] = new_name
+        if app.terminals.update(terminal_id, name=new_name) is None:
+            return jsonify({
+                'success': False,
+                'error': 'Terminal not found'
+            }), 404
+            
+        # Keep the name across server restarts
+        if hasattr(app, 'persist_terminal_registry'):
+            app.persist_terminal_registry()
             
-        logger.info(f"Renamed terminal on port {port} to '{new_name}'")
+        logger.info(f"Renamed terminal {terminal_id} to '{new_name}'")
         return jsonify({
             'success': True
         })
@@ -126,18 +198,19 @@ def rename_terminal(port):
             'error': str(e)
         }), 500
 
-@terminal_routes.route('/delete/<int:port>', methods=['POST'])
-def delete_terminal_post(port):
+@terminal_routes.route('/delete/<terminal_id>', methods=['POST'])
+def delete_terminal_post(terminal_id):
     """Terminate a terminal session (POST endpoint)."""
-    return delete_terminal(port)
+    return delete_terminal(terminal_id)
 
-@terminal_routes.route('/<int:port>', methods=['DELETE'])
-def delete_terminal(port):
+@terminal_routes.route('/<terminal_id>', methods=['DELETE'])
+def delete_terminal(terminal_id):
     """Terminate a terminal session."""
     try:
-        # Check if the terminal exists
+        # Check if the terminal exists (legacy port numbers are accepted too)
         app = current_app
-        if not hasattr(app, 'terminals') or port not in app.terminals:
+        terminal_id = app.resolve_terminal_id(terminal_id) if hasattr(app, 'resolve_terminal_id') else None
+        if not hasattr(app, 'terminals') or terminal_id is None:
             return jsonify({
                 'success': False,
                 'error': 'Terminal not found'
@@ -146,15 +219,15 @@ def delete_terminal(port):
         # Access the kill_terminal function
         if hasattr(app, 'kill_terminal'):
             # Kill the terminal
-            if app.kill_terminal(port):
-                logger.info(f"Deleted terminal on port {port}")
+            if app.kill_terminal(terminal_id):
+                logger.info(f"Deleted terminal {terminal_id}")
                 return jsonify({
                     'success': True
                 })
             else:
                 return jsonify({
                     'success': False,
-                    'error': f'Failed to delete terminal on port {port}'
+                    'error': f'Failed to delete terminal {terminal_id}'
                 }), 500
         else:
             logger.error("App missing kill_terminal function")
@@ -164,37 +237,170 @@ def delete_terminal(port):
                 'error': 'Terminal deletion not supported'
             }), 500
     except Exception as e:
-        logger.error(f"Error deleting terminal on port {port}: {e}")
+        logger.error(f"Error deleting terminal {terminal_id}: {e}")
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
 
+@terminal_routes.route('/<terminal_id>/view', methods=['POST'])
+def view_terminal(terminal_id):
+    """Make sure a terminal's ttyd is running before it is shown, and return its location."""
+    try:
+        app = current_app
+        terminal_id = app.resolve_terminal_id(terminal_id) if hasattr(app, 'resolve_terminal_id') else None
+        if terminal_id is None:
+            return jsonify({
+                'success': False,
+                'error': 'Terminal not found'
+            }), 404
+            
+        # Starts ttyd if it was never started or was stopped while idle
+        running, started = app.start_terminal_ttyd(terminal_id)
+        if not running:
+            return jsonify({
+                'success': False,
+                'error': f'Failed to start terminal {terminal_id}'
+            }), 500
+            
+        terminal = app.describe_terminal(terminal_id, app.terminals[terminal_id])
+        return jsonify({
+            'success': True,
+            'started': started,
+            **terminal
+        })
+    except KeyError:
+        return jsonify({
+            'success': False,
+            'error': 'Terminal not found'
+        }), 404
+    except Exception as e:
+        logger.error(f"Error preparing terminal {terminal_id} for viewing: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@terminal_routes.route('/idle', methods=['GET'])
+def get_idle_stats():
+    """Get the idle ttyd reaper's timeout and reap count."""
+    app = current_app
+    if not hasattr(app, 'idle_reaper'):
+        return jsonify({'success': False, 'error': 'Idle reaper not available'}), 500
+        
+    return jsonify({
+        'success': True,
+        'idle': app.idle_reaper.stats()
+    })
+
+@terminal_routes.route('/resources', methods=['GET'])
+def get_resource_usage():
+    """Get the latest CPU, memory and open file usage of every terminal's processes."""
+    app = current_app
+    if not hasattr(app, 'resource_monitor'):
+        return jsonify({'success': False, 'error': 'Resource monitor not available'}), 500
+        
+    return jsonify({
+        'success': True,
+        'terminals': app.resource_monitor.all(),
+        'monitor': app.resource_monitor.stats()
+    })
+
+@terminal_routes.route('/themes', methods=['GET'])
+def list_themes():
+    """List the tmux themes terminals can be switched to."""
+    app = current_app
+    if not hasattr(app, 'tmux_themes'):
+        return jsonify({'success': False, 'error': 'tmux themes not available'}), 500
+
+    return jsonify({
+        'success': True,
+        'themes': app.tmux_themes.list_themes()
+    })
+
+@terminal_routes.route('/<terminal_id>/theme', methods=['GET', 'POST'])
+def terminal_theme(terminal_id):
+    """Get a terminal's tmux theme, or switch it live with {"theme": name}."""
+    app = current_app
+    if not hasattr(app, 'tmux_themes'):
+        return jsonify({'success': False, 'error': 'tmux themes not available'}), 500
+
+    terminal_id = app.resolve_terminal_id(terminal_id) if hasattr(app, 'resolve_terminal_id') else None
+    terminal_info = app.terminals.get(terminal_id) if terminal_id is not None else None
+    if terminal_info is None:
+        return jsonify({'success': False, 'error': 'Terminal not found'}), 404
+    tmux_session = terminal_info['tmux_session']
+
+    try:
+        if request.method == 'POST':
+            data = request.get_json(silent=True)
+            theme = data.get('theme') if isinstance(data, dict) else None
+            if not isinstance(theme, str) or not theme:
+                return jsonify({'success': False, 'error': 'No theme provided'}), 400
+            app.tmux_themes.apply(tmux_session, theme)
+        else:
+            theme = app.tmux_themes.session_theme(tmux_session)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error with tmux theme of terminal {terminal_id}: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+    return jsonify({
+        'success': True,
+        'terminal_id': terminal_id,
+        'theme': theme
+    })
+
 @terminal_routes.route('/list', methods=['GET'])
 def list_terminals():
     """Get a list of all active terminals."""
     app = current_app
-    if not hasattr(app, 'terminals') or not hasattr(app, 'process_lock'):
+    if not hasattr(app, 'terminals'):
         return jsonify({
             'success': True,
             'terminals': []
         })
     
-    terminal_list = []
-    with app.process_lock:
-        for port, terminal in app.terminals.items():
-            terminal_list.append({
-                'port': port,
-                'name': terminal.get('name', f'Terminal {port}'),
-                'tmux_session': terminal.get('tmux_session', ''),
-                'created_at': terminal.get('created_at', 0)
-            })
+    # Served from the registry snapshot without locking; terminals being closed are left out
+    terminal_list = [
+        app.describe_terminal(terminal_id, terminal)
+        for terminal_id, terminal in app.terminals.items()
+        if terminal.get('state') != STATE_CLOSING
+    ]
     
     return jsonify({
         'success': True,
         'terminals': terminal_list
     })
 
+@terminal_routes.route('/search', methods=['GET', 'POST'])
+def search_terminals():
+    """Find which terminals printed some text, searching every terminal's scrollback at once."""
+    app = current_app
+    if not hasattr(app, 'search_terminal_output'):
+        return jsonify({'success': False, 'error': 'Search not available'}), 500
+        
+    data = request.get_json(silent=True) or request.args
+    pattern = data.get('q') or data.get('pattern')
+    if not pattern:
+        return jsonify({'success': False, 'error': 'No search pattern specified'}), 400
+        
+    regex = str(data.get('regex', '')).lower() in ('1', 'true')
+    ignore_case = str(data.get('ignore_case', '')).lower() in ('1', 'true')
+    try:
+        search = app.search_terminal_output(pattern, regex=regex, ignore_case=ignore_case)
+    except re.error as e:
+        return jsonify({'success': False, 'error': f'Invalid regular expression: {e}'}), 400
+    except Exception as e:
+        logger.error(f"Error searching terminals: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+        
+    return jsonify({
+        'success': True,
+        **search
+    })
+
 @terminal_routes.route('/send-command', methods=['POST'])
 def send_command():
     """Send a command to a terminal."""
@@ -213,46 +419,167 @@ def send_command():
         if not command:
             return jsonify({'success': False, 'error': 'No command specified'}), 400
         
-        logger.info(f"Sending command to terminal {port}: {command}")
-        
-        # Convert port to int for dictionary lookup
-        port_int = int(port)
+        logger.info(f"Queueing command for terminal {port}: {command}")
         
-        terminal_info = None
-        # Access the terminals dictionary safely through the app context
+        # 'port' may carry a terminal id or a legacy ttyd port number
         app = current_app
-        if hasattr(app, 'terminals') and port_int in app.terminals:
-            terminal_info = app.terminals[port_int]
+        if not hasattr(app, 'queue_terminal_input'):
+            return jsonify({'success': False, 'error': 'Terminal management not available'}), 500
+        terminal_id = app.resolve_terminal_id(port)
         
-        if not terminal_info or 'tmux_session' not in terminal_info:
+        # Queue the command; the dispatcher delivers each terminal's commands in order
+        try:
+            seq = app.queue_terminal_input(terminal_id, command) if terminal_id else None
+        except QueueFull as e:
+            logger.warning(f"Rejected command for terminal {port}: {e}")
+            return jsonify({'success': False, 'error': str(e)}), 429
+            
+        if seq is None:
             logger.error(f"No terminal information found for port {port}")
             return jsonify({
                 'success': False,
                 'error': f'No tmux session found for terminal {port}'
             }), 404
-            
-        tmux_session = terminal_info['tmux_session']
         
-        # Use tmux to send the command to the correct terminal
-        # Escape single quotes in the command to prevent shell injection
-        safe_command = command.replace("'", "'\\''")
-        tmux_command = f"tmux send-keys -t {tmux_session} '{safe_command}' Enter"
+        return jsonify({
+            'success': True,
+            'terminal_id': terminal_id,
+            'seq': seq,
+            'message': f'Command queued for terminal {port}'
+        }), 202
         
-        # Execute the tmux command
-        result = subprocess.run(tmux_command, shell=True, capture_output=True, text=True)
+    except Exception as e:
+        logger.exception(f"Error sending command: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@terminal_routes.route('/send-batch', methods=['POST'])
+def send_command_batch():
+    """Send one command, or the lines of a code block, to many terminals at once."""
+    try:
+        data = request.get_json() or {}
+        terminals = data.get('terminals') or []
+        commands = data.get('commands') or ([data['command']] if data.get('command') else [])
         
-        if result.returncode != 0:
-            logger.error(f"Error sending command: {result.stderr}")
-            return jsonify({
-                'success': False, 
-                'error': f'Failed to send command: {result.stderr}'
-            }), 500
+        if not isinstance(terminals, list) or not terminals:
+            return jsonify({'success': False, 'error': 'No terminals specified'}), 400
+        
+        if not isinstance(commands, list) or not commands:
+            return jsonify({'success': False, 'error': 'No command specified'}), 400
+            
+        app = current_app
+        if not hasattr(app, 'queue_terminal_batch'):
+            return jsonify({'success': False, 'error': 'Terminal management not available'}), 500
+            
+        logger.info(f"Queueing {len(commands)} command(s) for {len(terminals)} terminals")
+        results = app.queue_terminal_batch(terminals, [str(command) for command in commands])
         
         return jsonify({
-            'success': True,
-            'message': f'Command sent to terminal {port}'
-        })
+            'success': all(result['success'] for result in results),
+            'results': results
+        }), 202
+    except Exception as e:
+        logger.exception(f"Error sending command batch: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@terminal_routes.route('/<terminal_id>/commands', methods=['GET'])
+def get_command_status(terminal_id):
+    """Get how many commands a terminal has waiting and the last one delivered."""
+    app = current_app
+    if not hasattr(app, 'command_queue'):
+        return jsonify({'success': False, 'error': 'Command queue not available'}), 500
+        
+    terminal_id = app.resolve_terminal_id(terminal_id)
+    if terminal_id is None:
+        return jsonify({'success': False, 'error': 'Terminal not found'}), 404
         
+    status = app.command_queue.status(terminal_id) or {
+        'queued': 0, 'last_seq': 0, 'delivered_seq': 0, 'failed': 0, 'coalesced': 0
+    }
+    return jsonify({
+        'success': True,
+        'terminal_id': terminal_id,
+        'commands': status
+    })
+
+@terminal_routes.route('/<terminal_id>/output', methods=['GET'])
+def get_terminal_output(terminal_id):
+    """
+    Get a terminal's captured output.
+
+    With ?since=<offset> only output after that offset is returned; pass the
+    previous response's 'next' to follow a terminal. Without it, everything
+    still held in the terminal's buffer is returned, or the last ?tail=<bytes>.
+    """
+    app = current_app
+    if not hasattr(app, 'output_capture') or not app.output_capture.enabled:
+        return jsonify({'success': False, 'error': 'Output capture is not enabled'}), 404
+        
+    terminal_id = app.resolve_terminal_id(terminal_id)
+    if terminal_id is None:
+        return jsonify({'success': False, 'error': 'Terminal not found'}), 404
+        
+    try:
+        since = request.args.get('since', type=int)
+        limit = request.args.get('limit', type=int)
+        tail = request.args.get('tail', type=int)
+        if since is None and tail is not None:
+            result = app.output_capture.read(terminal_id)
+            if result is not None:
+                since = max(result['offset'], result['next'] - max(0, tail))
+        result = app.output_capture.read(terminal_id, since, limit)
     except Exception as e:
-        logger.exception(f"Error sending command: {str(e)}")
+        logger.error(f"Error reading output of terminal {terminal_id}: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
+        
+    if result is None:
+        return jsonify({'success': False, 'error': 'Terminal output is not being captured'}), 404
+        
+    return jsonify({
+        'success': True,
+        'terminal_id': terminal_id,
+        'offset': result['offset'],
+        'next': result['next'],
+        'truncated': result['truncated'],
+        'output': result['data'].decode('utf-8', errors='replace')
+    })
+
+@terminal_routes.route('/<terminal_id>/snapshot', methods=['GET'])
+def get_terminal_snapshot(terminal_id):
+    """
+    Get a terminal's screen and scrollback.
+
+    With ?since=<version>&generation=<generation> only the lines changed
+    after that version are returned, keyed by line number. The ETag is the
+    snapshot generation and version, so a poll with If-None-Match gets 304
+    while nothing has changed, and never from an earlier terminal that had
+    the same id.
+    """
+    app = current_app
+    if not hasattr(app, 'snapshot_cache'):
+        return jsonify({'success': False, 'error': 'Snapshots not available'}), 500
+        
+    terminal_id = app.resolve_terminal_id(terminal_id)
+    terminal = app.terminals.get(terminal_id) if terminal_id else None
+    if terminal is None:
+        return jsonify({'success': False, 'error': 'Terminal not found'}), 404
+        
+    try:
+        since = request.args.get('since', type=int)
+        generation = request.args.get('generation')
+        snapshot = app.snapshot_cache.snapshot(terminal_id, terminal['tmux_session'], since, generation)
+    except Exception as e:
+        logger.error(f"Error capturing snapshot of terminal {terminal_id}: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+        
+    etag = f"{terminal_id}-{snapshot['generation']}-{snapshot['version']}"
+    if request.if_none_match.contains(etag):
+        return '', 304, {'ETag': f'"{etag}"'}
+        
+    response = jsonify({
+        'success': True,
+        'terminal_id': terminal_id,
+        **snapshot
+    })
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
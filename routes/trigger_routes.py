@@ -0,0 +1,85 @@
+"""
+routes/trigger_routes.py
+Flask Blueprint for output trigger API endpoints.
+"""
+
+import logging
+from flask import Blueprint, request, jsonify, current_app
+
+# Configure logging
+logger = logging.getLogger('commandwave')
+
+# Create blueprint
+trigger_routes = Blueprint('trigger_routes', __name__, url_prefix='/api/triggers')
+
+@trigger_routes.route('', methods=['GET'])
+def list_triggers():
+    """List the trigger patterns and how much output they have been matched against."""
+    app = current_app
+    if not hasattr(app, 'output_triggers'):
+        return jsonify({'success': False, 'error': 'Output triggers not available'}), 500
+
+    return jsonify({
+        'success': True,
+        'enabled': bool(app.config.get('OUTPUT_TRIGGERS')),
+        'triggers': app.output_triggers.list_triggers(),
+        'stats': app.output_triggers.stats()
+    })
+
+@trigger_routes.route('', methods=['POST'])
+def add_trigger():
+    """Add a trigger, or replace the trigger with the same id."""
+    app = current_app
+    if not hasattr(app, 'output_triggers'):
+        return jsonify({'success': False, 'error': 'Output triggers not available'}), 500
+
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'success': False, 'error': 'No data provided'}), 400
+
+    try:
+        trigger = app.output_triggers.add_trigger(data)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error adding output trigger: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+    logger.info(f"Added output trigger {trigger['id']} ({trigger['name']})")
+    return jsonify({'success': True, 'trigger': trigger})
+
+@trigger_routes.route('', methods=['PUT'])
+def replace_triggers():
+    """Replace every trigger; nothing changes if any of them is invalid."""
+    app = current_app
+    if not hasattr(app, 'output_triggers'):
+        return jsonify({'success': False, 'error': 'Output triggers not available'}), 500
+
+    data = request.get_json(silent=True)
+    triggers = data.get('triggers') if isinstance(data, dict) else data
+    if not isinstance(triggers, list):
+        return jsonify({'success': False, 'error': 'Expected a list of triggers'}), 400
+
+    try:
+        triggers = app.output_triggers.set_triggers(triggers)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error replacing output triggers: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+    logger.info(f"Replaced output triggers ({len(triggers)} triggers)")
+    return jsonify({'success': True, 'triggers': triggers})
+
+@trigger_routes.route('/<trigger_id>', methods=['DELETE'])
+def delete_trigger(trigger_id):
+    """Remove a trigger."""
+    app = current_app
+    if not hasattr(app, 'output_triggers'):
+        return jsonify({'success': False, 'error': 'Output triggers not available'}), 500
+
+    if not app.output_triggers.remove_trigger(trigger_id):
+        return jsonify({'success': False, 'error': f'Trigger {trigger_id} not found'}), 404
+
+    logger.info(f"Removed output trigger {trigger_id}")
+    return jsonify({'success': True})
@@ -6,6 +6,7 @@ Flask Blueprint for variable-related API endpoints.
 from flask import Blueprint, request, jsonify, render_template
 import os
 import json
+import hashlib
 import logging
 import re
 
@@ -17,6 +18,8 @@ variable_routes = Blueprint('variable_routes', __name__, url_prefix='/api/variab
 
 # In-memory variable storage by tab ID (will persist between requests but not app restarts)
 tab_variables = {}
+# Hash of each tab's variables, updated whenever they are loaded or saved and used as their ETag
+tab_variable_etags = {}
 
 # Define the storage directory for persistent variables
 VARIABLE_STORAGE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'variables')
@@ -41,9 +44,14 @@ def load_tab_variables(tab_id):
             logger.error(f"Error loading variables for tab {tab_id}: {e}")
     return {}
 
+def variables_etag(variables):
+    """Hash a tab's variables, in order, as the rendered list follows their order"""
+    return hashlib.sha1(json.dumps(variables).encode('utf-8')).hexdigest()
+
 def save_tab_variables(tab_id, variables):
     """Save variables for a specific tab to disk"""
     filename = get_variable_filename(tab_id)
+    tab_variable_etags[tab_id] = variables_etag(variables)
     try:
         with open(filename, 'w') as f:
             json.dump(variables, f, indent=2)
@@ -56,6 +64,7 @@ def get_tab_variables(tab_id):
     """Get variables for a specific tab, loading from disk if needed"""
     if tab_id not in tab_variables:
         tab_variables[tab_id] = load_tab_variables(tab_id)
+        tab_variable_etags[tab_id] = variables_etag(tab_variables[tab_id])
     return tab_variables[tab_id]
 
 @variable_routes.route('/create/<tab_id>', methods=['POST'])
@@ -181,6 +190,11 @@ def list_variables(tab_id):
         # Get variables for this tab
         variables = get_tab_variables(tab_id)
         
+        # Unchanged since the client's copy: skip rendering and sending them
+        etag = tab_variable_etags[tab_id]
+        if request.if_none_match.contains(etag):
+            return '', 304, {'ETag': f'"{etag}"'}
+        
         # Generate HTML for variables in the same format as default variables
         html = ""
         for name, variable_data in variables.items():
@@ -196,7 +210,10 @@ def list_variables(tab_id):
             </div>
             '''
         
-        return jsonify({'success': True, 'variables': variables, 'html': html})
+        response = jsonify({'success': True, 'variables': variables, 'html': html})
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
     except Exception as e:
         logger.error(f"Error listing variables for tab {tab_id}: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -217,13 +234,19 @@ def load_variables(tab_id):
     try:
         # Get variables for this tab (will load from disk if needed)
         variables = get_tab_variables(tab_id)
+        etag = tab_variable_etags[tab_id]
+        if request.if_none_match.contains(etag):
+            return '', 304, {'ETag': f'"{etag}"'}
         
         # Convert to simpler format for frontend
         simplified_variables = {}
         for name, variable_data in variables.items():
             simplified_variables[name] = variable_data['value']
         
-        return jsonify({'success': True, 'variables': simplified_variables})
+        response = jsonify({'success': True, 'variables': simplified_variables})
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
     except Exception as e:
         logger.error(f"Error loading variables for tab {tab_id}: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
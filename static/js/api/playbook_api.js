@@ -9,19 +9,26 @@ class PlaybookAPI {
     }
     
     /**
-     * Get all playbooks
-     * @returns {Promise} Promise that resolves to playbook list
+     * Get one page of playbook summaries; content is fetched per playbook with getPlaybook
+     * @param {object} options - sort ('id', 'title', 'updated_at' or 'size'), order ('asc' or 'desc'),
+     *                           prefix, limit, and cursor (next_cursor of the previous page)
+     * @returns {Promise<object>} Promise that resolves to {playbooks, next_cursor, total}
      */
-    async getPlaybooks() {
+    async getPlaybooks(options = {}) {
         try {
-            const response = await fetch(`${this.baseUrl}/list`);
+            const params = new URLSearchParams();
+            Object.entries(options).forEach(([key, value]) => {
+                if (value !== undefined && value !== null) params.set(key, value);
+            });
+            const query = params.toString();
+            const response = await fetch(`${this.baseUrl}/list${query ? `?${query}` : ''}`);
             const data = await response.json();
             
             if (!data.success) {
                 throw new Error(data.error || 'Failed to get playbooks');
             }
             
-            return data.playbooks;
+            return data;
         } catch (error) {
             console.error('Error fetching playbooks:', error);
             throw error;
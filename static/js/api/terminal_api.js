@@ -55,6 +55,30 @@ class TerminalAPI {
         }
     }
     
+    /**
+     * Make sure a terminal's ttyd is running before it is shown
+     * @param {string} terminalId - Terminal id
+     * @returns {Promise} Promise that resolves to the terminal's current location
+     */
+    async viewTerminal(terminalId) {
+        try {
+            const response = await fetch(`${this.baseUrl}/${encodeURIComponent(terminalId)}/view`, {
+                method: 'POST'
+            });
+            
+            const data = await response.json();
+            
+            if (!data.success) {
+                throw new Error(data.error || 'Failed to open terminal');
+            }
+            
+            return data;
+        } catch (error) {
+            console.error('Error opening terminal:', error);
+            throw error;
+        }
+    }
+    
     /**
      * Close a terminal
      * @param {string|number} port - Terminal port
@@ -145,7 +145,7 @@ document.addEventListener('DOMContentLoaded', () => {
                             + `<span class=\"filename\">${r.filename}</span>`
                             + `<span class=\"line-number\">${r.line_number}</span>`
                             + `</div>`
-                            + `<div class=\"result-line-box\"><span class=\"result-line\">${highlightQuery(r.line, query)}</span></div>`
+                            + `<div class=\"result-line-box\"><span class=\"result-line\">${highlightMatches(r.line, r.matches, query)}</span></div>`
                             + `</div>`
                         ).join('');
                     } else {
@@ -158,6 +158,21 @@ document.addEventListener('DOMContentLoaded', () => {
         }
         // --- END SEARCH FUNCTIONALITY PATCH ---
 
+        // Highlight the match offsets returned by the search index
+        function highlightMatches(line, matches, query) {
+            if (!matches || matches.length === 0) return highlightQuery(line, query);
+            // Offsets count code points, not UTF-16 units
+            const chars = Array.from(line);
+            let html = '';
+            let position = 0;
+            for (const [start, end] of matches) {
+                html += chars.slice(position, start).join('')
+                    + `<span class="search-highlight">${chars.slice(start, end).join('')}</span>`;
+                position = end;
+            }
+            return html + chars.slice(position).join('');
+        }
+
         // Highlight query inside results
         function highlightQuery(line, query) {
             if (!query) return line;
@@ -79,6 +79,18 @@ class SyncManager {
             this.handleTerminalClosed(data);
         });
         
+        WebSocketHandler.addEventListener('terminal_health', (data) => {
+            this.handleTerminalHealth(data);
+        });
+        
+        WebSocketHandler.addEventListener('terminal_trigger', (data) => {
+            this.handleTerminalTrigger(data);
+        });
+        
+        WebSocketHandler.addEventListener('terminal_resources', (data) => {
+            this.handleTerminalResources(data);
+        });
+        
         // Variable events
         WebSocketHandler.addEventListener('remote_variable_update', (data) => {
             this.handleVariableChanged(data);
@@ -135,10 +147,20 @@ class SyncManager {
                 }
                 const result = await resp.json();
                 if (result.success && Array.isArray(result.terminals)) {
+                    const resources = {};
                     result.terminals.forEach(term => {
-                        // Use port as terminal_id for state indexing
-                        this.handleTerminalCreated({ terminal_id: String(term.port), port: term.port, name: term.name });
+                        // Use the terminal id (the port on older servers) for state indexing
+                        const key = String(term.id ?? term.port);
+                        this.handleTerminalCreated({
+                            terminal_id: key,
+                            port: key,
+                            name: term.name,
+                            ttyd_port: term.port,
+                            path: term.path
+                        });
+                        if (term.resources) resources[key] = term.resources;
                     });
+                    this.handleTerminalResources({ terminals: resources });
                 }
             } catch (err) {
                 console.error('Error fetching initial terminals:', err);
@@ -458,7 +480,9 @@ class SyncManager {
         // Let the terminal manager handle the UI update if available
         if (this.terminalManager && typeof this.terminalManager.addRemoteTerminal === 'function') {
             // Use new method to integrate remote tab fully
-            this.terminalManager.addRemoteTerminal(data.terminal_id, data.port, data.name);
+            this.terminalManager.addRemoteTerminal(
+                data.terminal_id, data.port, data.name, data.ttyd_port ?? null, data.path ?? null
+            );
         } else {
             // Legacy fallback
             this.createTerminalTab(data.terminal_id, data.port, data.name);
@@ -582,6 +606,84 @@ class SyncManager {
         }
     }
     
+    /**
+     * Handle a terminal health change pushed by the server's process supervisor
+     * @param {object} data - Terminal health event data
+     */
+    handleTerminalHealth(data) {
+        if (!data.terminal_id) return;
+        
+        console.log(`Terminal ${data.terminal_id} health: ${data.status}`);
+        
+        // A restarted ttyd dropped every client connection, so reload the terminal view
+        if (data.status === 'running' && this.terminalManager &&
+            typeof this.terminalManager.reloadTerminal === 'function') {
+            this.terminalManager.reloadTerminal(data.terminal_id);
+        }
+        
+        if (data.status === 'failed' || data.status === 'session_ended') {
+            try {
+                NotificationManager.show(
+                    'Terminal stopped',
+                    data.status === 'failed'
+                        ? `Terminal ${data.terminal_id} keeps crashing and was not restarted`
+                        : `The shell of terminal ${data.terminal_id} has exited`,
+                    'error',
+                    5000
+                );
+            } catch (error) {
+                console.warn('Error showing notification:', error);
+            }
+        }
+    }
+    
+    /**
+     * Handle output of a terminal matching a trigger pattern
+     * @param {object} data - Trigger event data
+     */
+    handleTerminalTrigger(data) {
+        if (!data.terminal_id) return;
+        
+        const terminalInfo = window.state && window.state.terminals
+            ? window.state.terminals[data.terminal_id]
+            : null;
+        const terminalName = (terminalInfo && terminalInfo.name) || data.terminal_id;
+        
+        try {
+            NotificationManager.show(
+                data.name || 'Trigger matched',
+                `${terminalName}: ${data.line || data.match}`,
+                'info',
+                8000
+            );
+        } catch (error) {
+            console.warn('Error showing notification:', error);
+        }
+    }
+    
+    /**
+     * Show each terminal's resource usage as the tooltip of its tab
+     * @param {object} data - Resource usage of the terminals that changed, and the terminals no longer sampled
+     */
+    handleTerminalResources(data) {
+        Object.entries(data.terminals || {}).forEach(([terminalId, stats]) => {
+            const tab = document.querySelector(`.tab-btn[data-port="${terminalId}"]`);
+            if (!tab) return;
+            
+            let usage = `CPU ${stats.cpu_percent}% · ${(stats.rss_bytes / 1048576).toFixed(1)} MB · ` +
+                `${stats.open_fds} open files · ${stats.processes} processes`;
+            if (stats.top) {
+                usage += `\nBusiest: ${stats.top.command} (pid ${stats.top.pid}, CPU ${stats.top.cpu_percent}%)`;
+            }
+            tab.title = usage;
+        });
+        
+        (data.removed || []).forEach((terminalId) => {
+            const tab = document.querySelector(`.tab-btn[data-port="${terminalId}"]`);
+            if (tab) tab.removeAttribute('title');
+        });
+    }
+    
     /**
      * Handle a terminal closed event from a remote client
      * @param {object} data - Terminal closed event data
@@ -156,6 +156,18 @@ class WebSocketHandler {
             this.dispatchEvent('terminal_closed', data);
         });
         
+        this.socket.on('terminal_health', (data) => {
+            this.dispatchEvent('terminal_health', data);
+        });
+        
+        this.socket.on('terminal_trigger', (data) => {
+            this.dispatchEvent('terminal_trigger', data);
+        });
+        
+        this.socket.on('terminal_resources', (data) => {
+            this.dispatchEvent('terminal_resources', data);
+        });
+        
         this.socket.on('terminal_presence_update', (data) => {
             this.dispatchEvent('terminal_presence_update', data);
         });
@@ -298,6 +310,31 @@ class WebSocketHandler {
         });
     }
 
+    /**
+     * Queue a command for a terminal over the WebSocket
+     * @param {string} terminalId - The terminal ID
+     * @param {string} command - The command to type into the terminal
+     * @returns {Promise<Object>} The server's acknowledgement, with the command's sequence number
+     */
+    sendCommand(terminalId, command) {
+        if (!this.connected || !this.socket) {
+            return Promise.reject(new Error('WebSocket not connected'));
+        }
+        
+        return new Promise((resolve, reject) => {
+            this.socket.emit('send_command', {
+                terminal_id: terminalId,
+                command: command
+            }, (ack) => {
+                if (ack && ack.success) {
+                    resolve(ack);
+                } else {
+                    reject(new Error((ack && ack.error) || 'Failed to queue command'));
+                }
+            });
+        });
+    }
+
     /**
      * Notify server about a new terminal being created
      * @param {string|number} portOrTerminalId - The terminal port or ID
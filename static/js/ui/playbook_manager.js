@@ -1647,8 +1647,8 @@ class PlaybookManager {
             this.updateTabPlaybookDisplay();
         } else {
             try {
-                const playbooks = await playbookAPI.getPlaybooks();
-                const newPb = playbooks.find(p => p.filename === filename);
+                // Playbook ids are their paths, so only the one playbook is fetched
+                const newPb = await playbookAPI.getPlaybook(filename);
                 if (newPb) {
                     this.playbooksById[newPb.id] = newPb;
                     if (this.activeTabId && !this.tabPlaybooks[this.activeTabId].includes(newPb.id)) {
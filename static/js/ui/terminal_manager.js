@@ -4,6 +4,7 @@
  */
 
 import terminalAPI from '../api/terminal_api.js';
+import WebSocketHandler from '../sync/websocket_handler.js';
 
 export default class TerminalManager {
     /**
@@ -517,6 +518,7 @@ export default class TerminalManager {
         
         if (selectedIframe) {
             selectedIframe.classList.add('active');
+            this.loadTerminal(port, selectedIframe);
         }
         
         this.activeTerminal = port;
@@ -530,6 +532,41 @@ export default class TerminalManager {
         }));
     }
     
+    /**
+     * Load a terminal's iframe, starting its ttyd on the server if needed.
+     * Background terminals are only loaded when first shown, and reloaded if their
+     * ttyd was stopped while idle and has been restarted since.
+     * @param {string} port - The terminal id
+     * @param {HTMLIFrameElement} iframe - The terminal's iframe
+     */
+    async loadTerminal(port, iframe) {
+        try {
+            const terminal = await terminalAPI.viewTerminal(port);
+            const url = this.buildTerminalUrl(terminal.port, terminal.path);
+            if (!iframe.getAttribute('src') || iframe.dataset.src !== url || terminal.started) {
+                iframe.dataset.src = url;
+                iframe.src = url;
+            }
+        } catch (error) {
+            // Older servers have no view endpoint; fall back to the URL known at creation
+            if (!iframe.getAttribute('src') && iframe.dataset.src) {
+                iframe.src = iframe.dataset.src;
+            }
+        }
+    }
+    
+    /**
+     * Reload a terminal's iframe after its ttyd was restarted, if it was loaded
+     * @param {string} port - The terminal id
+     */
+    reloadTerminal(port) {
+        const iframe = document.querySelector(`.terminal-iframe[data-port="${port}"]`);
+        if (iframe && iframe.getAttribute('src')) {
+            iframe.removeAttribute('src');
+            this.loadTerminal(port, iframe);
+        }
+    }
+    
     /**
      * Create a new terminal
      * @param {string} name - The name for the new terminal
@@ -541,12 +578,13 @@ export default class TerminalManager {
             // Call the API to create a new terminal
             const response = await terminalAPI.createTerminal(name);
             
-            // Expect full response with success, port, and name
+            // Expect full response with success, id, port, path and name
             if (response.success) {
-                const port = response.port;
+                // The terminal id keys the tab; older servers only return the port
+                const port = (response.id ?? response.port).toString();
                 const termName = response.name || name;
                 // Add the terminal to the UI
-                this.addTerminalToUI(port, termName);
+                this.addTerminalToUI(port, termName, response.port, response.path);
                 // Register in global state to avoid duplicate on sync
                 if (window.state && window.state.terminals && !window.state.terminals[port.toString()]) {
                     window.state.terminals[port.toString()] = {
@@ -579,12 +617,28 @@ export default class TerminalManager {
         }
     }
     
+    /**
+     * Build the iframe URL for a terminal
+     * @param {number|string|null} ttydPort - Port of the ttyd serving the terminal
+     * @param {string|null} path - URL path (and query) selecting the terminal on that ttyd
+     * @returns {string} The terminal URL
+     */
+    buildTerminalUrl(ttydPort, path = null) {
+        if (!ttydPort) {
+            // Served from the app's own origin
+            return path || '/';
+        }
+        return `http://${this.hostname}:${ttydPort}${path || '/'}`;
+    }
+    
     /**
      * Add a new terminal tab and iframe to the UI
-     * @param {number|string} port - The port number for the terminal
+     * @param {number|string} port - The terminal id (a port number for legacy terminals)
      * @param {string} name - Display name for the terminal tab
+     * @param {number|string|null} ttydPort - Port of the ttyd serving the terminal, defaults to port
+     * @param {string|null} path - URL path selecting the terminal on that ttyd
      */
-    addTerminalToUI(port, name = 'Terminal') {
+    addTerminalToUI(port, name = 'Terminal', ttydPort = null, path = null) {
         port = port.toString();
         
         // Create new tab button
@@ -627,9 +681,10 @@ export default class TerminalManager {
             newIframe.id = `terminal-${port}`;
             newIframe.setAttribute('data-port', port);
             
-            // Set the iframe src to the new terminal URL
-            const hostname = this.hostname;
-            newIframe.src = `http://${hostname}:${port}`;
+            // Remember the terminal URL; the iframe is only loaded once the tab is shown
+            newIframe.dataset.src = (ttydPort === null && path === null)
+                ? this.buildTerminalUrl(port)
+                : this.buildTerminalUrl(ttydPort, path);
             
             // Append to the terminal container
             terminalContainer.appendChild(newIframe);
@@ -1000,6 +1055,13 @@ export default class TerminalManager {
         try {
             console.log(`Sending command to terminal ${port}: ${command}`);
             
+            // Prefer the WebSocket: commands on one connection are queued in the order sent
+            if (WebSocketHandler.isConnected()) {
+                const ack = await WebSocketHandler.sendCommand(port, command);
+                console.log(`Command queued for terminal ${port} (seq ${ack.seq})`);
+                return true;
+            }
+            
             // Use the API to send the command - this avoids cross-origin issues
             const response = await fetch('/api/terminals/send-command', {
                 method: 'POST',
@@ -1030,7 +1092,7 @@ export default class TerminalManager {
      * @param {string|number} port - Terminal port
      * @param {string} name - Display name for the terminal
      */
-    addRemoteTerminal(terminalId, port, name = 'Terminal') {
+    addRemoteTerminal(terminalId, port, name = 'Terminal', ttydPort = null, path = null) {
         // Ensure port is a string
         port = port.toString();
         // Avoid duplicates
@@ -1038,7 +1100,7 @@ export default class TerminalManager {
         // Track this port
         this.activePorts.push(port);
         // Add UI elements
-        this.addTerminalToUI(port, name);
+        this.addTerminalToUI(port, name, ttydPort, path);
         // Inform other components (e.g., VariableManager) without re-syncing
         document.dispatchEvent(new CustomEvent('terminal-tab-created', {
             detail: { port, name, remote: true }